@@ -0,0 +1,323 @@
+# async_trader.py
+import asyncio
+import contextvars
+import functools
+import time
+import uuid
+import aiohttp
+import robin_stocks.robinhood as r
+from robin_stocks.robinhood import helper as rh_helper
+from metrics import BROKER_LATENCY
+from circuit_breaker import robinhood_breaker
+from trader import SimulatedTrader, option_contract_key, marketable_exit_price, ROBINHOOD_USER, ROBINHOOD_PASS, ROBINHOOD_TIMEOUTS, ROBINHOOD_API_BASE, _LOGIN_KWARGS
+
+API_BASE = ROBINHOOD_API_BASE
+# HTTP statuses that count as upstream failures for the circuit breaker
+_BREAKER_FAILURE_STATUSES = {429, 500, 502, 503, 504}
+
+_call_timeout = contextvars.ContextVar("robinhood_call_timeout", default=None)
+
+def _async_broker_call(func):
+    """Records the latency of an async Robinhood API call under the method's name and applies its timeout."""
+    timeout = ROBINHOOD_TIMEOUTS.get(func.__name__, ROBINHOOD_TIMEOUTS["default"])
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _call_timeout.set(timeout)
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            BROKER_LATENCY.observe(time.perf_counter() - start, call=func.__name__)
+            _call_timeout.reset(token)
+    return wrapper
+
+
+class AsyncRobinhoodTrader:
+    """
+    An asyncio broker adapter with the same interface as RobinhoodTrader.
+    It talks to the Robinhood REST API over one pooled aiohttp session (keep-alive,
+    bounded connections), reusing the token from the robin_stocks login, so
+    independent reads can be fanned out concurrently from the event loop.
+    """
+    def __init__(self, max_connections: int = 10, request_timeout: float = 10.0, keepalive_interval: float = 45.0):
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.keepalive_interval = keepalive_interval
+        self._session = None
+        self._keepalive_task = None
+        self._account_url = None
+        self._chain_ids = {}  # symbol -> options chain ID
+        self._option_ids = {} # contract key -> option instrument ID (instruments never change)
+
+    # --- Session lifecycle ---
+    async def start(self):
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive_interval * 2)
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            headers={"Accept": "application/json"},
+        )
+        self._keepalive_task = asyncio.create_task(self._keepalive_loop())
+        print("✅ Async Robinhood session started.")
+
+    async def close(self):
+        if self._keepalive_task:
+            self._keepalive_task.cancel()
+        if self._session:
+            await self._session.close()
+        self._session = self._keepalive_task = None
+
+    async def _keepalive_loop(self):
+        """Pings a cheap endpoint so pooled connections stay warm between trades."""
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await self._get(f"{API_BASE}/accounts/", {"default_to_all_accounts": "true"})
+            except Exception as e:
+                print(f"⚠️ Async Robinhood keep-alive failed: {e}")
+
+    async def login(self):
+        # The interactive login flow (MFA, device approval) stays in robin_stocks; its token is reused here.
+        await asyncio.to_thread(r.login, ROBINHOOD_USER, ROBINHOOD_PASS, **_LOGIN_KWARGS)
+        await self.start()
+
+    async def reconnect(self):
+        print("⚙️ Attempting to reconnect to Robinhood (async)...")
+        try:
+            await self.login()
+            print("✅ Reconnected to Robinhood successfully.")
+        except Exception as e:
+            print(f"❌ Failed to reconnect to Robinhood: {e}")
+
+    # --- HTTP helpers ---
+    def _auth_headers(self) -> dict:
+        # Read on every request so a robin_stocks reconnect is picked up immediately
+        token = rh_helper.SESSION.headers.get("Authorization")
+        return {"Authorization": token} if token else {}
+
+    def _timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=_call_timeout.get() or self.request_timeout)
+
+    @staticmethod
+    def _record_status(status: int):
+        if status in _BREAKER_FAILURE_STATUSES:
+            robinhood_breaker.record_failure()
+        else:
+            robinhood_breaker.record_success()
+
+    async def _get(self, url: str, params: dict = None) -> dict:
+        if self._session is None:
+            await self.start()
+        robinhood_breaker.check()
+        try:
+            async with self._session.get(url, params=params, headers=self._auth_headers(), timeout=self._timeout()) as resp:
+                data = await resp.json() if resp.status < 400 else None
+        except Exception: # Connection errors and timeouts
+            robinhood_breaker.record_failure()
+            raise
+        self._record_status(resp.status)
+        resp.raise_for_status()
+        return data
+
+    async def _get_paginated(self, url: str, params: dict = None) -> list:
+        data = await self._get(url, params)
+        results = list(data.get("results", []))
+        while data.get("next"):
+            data = await self._get(data["next"])
+            results.extend(data.get("results", []))
+        return results
+
+    async def _post(self, url: str, payload: dict | None = None) -> dict:
+        if self._session is None:
+            await self.start()
+        robinhood_breaker.check()
+        try:
+            async with self._session.post(url, json=payload, headers=self._auth_headers(), timeout=self._timeout()) as resp:
+                body = await resp.json(content_type=None) # Empty bodies (e.g. cancel) decode to None
+        except Exception: # Connection errors and timeouts
+            robinhood_breaker.record_failure()
+            raise
+        self._record_status(resp.status)
+        if resp.status >= 400:
+            print(f"❌ Robinhood rejected POST {url}: {resp.status} {body}")
+        return body or {}
+
+    async def _get_account_url(self) -> str:
+        if not self._account_url:
+            accounts = await self._get(f"{API_BASE}/accounts/", {"default_to_all_accounts": "true"})
+            self._account_url = accounts["results"][0]["url"]
+        return self._account_url
+
+    async def _get_option_id(self, symbol, strike, expiration, opt_type) -> str | None:
+        key = option_contract_key(symbol, strike, expiration, opt_type)
+        if key not in self._option_ids:
+            symbol = str(symbol).upper()
+            if symbol not in self._chain_ids:
+                instruments = await self._get(f"{API_BASE}/instruments/", {"symbol": symbol})
+                self._chain_ids[symbol] = instruments["results"][0]["tradable_chain_id"]
+            options = await self._get_paginated(f"{API_BASE}/options/instruments/", {
+                "chain_id": self._chain_ids[symbol], "expiration_dates": str(expiration),
+                "strike_price": f"{float(strike):.4f}", "type": str(opt_type).lower(), "state": "active",
+            })
+            matches = [option for option in options if option["expiration_date"] == str(expiration)]
+            if not matches:
+                print(f"❌ No option instrument for {symbol} {expiration} {strike}{opt_type}")
+                return None
+            self._option_ids[key] = matches[0]["id"]
+        return self._option_ids[key]
+
+    async def _place_option_order(self, symbol, strike, expiration, opt_type, side, position_effect, direction,
+                                  quantity, order_type, trigger, price, stop_price=None, time_in_force="gtc") -> dict:
+        option_id, account_url = await asyncio.gather(
+            self._get_option_id(symbol, strike, expiration, opt_type), self._get_account_url())
+        if not option_id:
+            return {}
+        payload = {
+            "account": account_url, "direction": direction, "time_in_force": time_in_force,
+            "legs": [{"position_effect": position_effect, "side": side, "ratio_quantity": 1,
+                      "option": f"{API_BASE}/options/instruments/{option_id}/"}],
+            "type": order_type, "trigger": trigger, "price": price, "quantity": quantity,
+            "override_day_trade_checks": False, "override_dtbp_checks": False, "ref_id": str(uuid.uuid4()),
+        }
+        if stop_price is not None:
+            payload["stop_price"] = stop_price
+        return await self._post(f"{API_BASE}/options/orders/", payload)
+
+    # --- RobinhoodTrader interface ---
+    @_async_broker_call
+    async def get_portfolio_value(self) -> float:
+        try:
+            portfolios = await self._get(f"{API_BASE}/portfolios/")
+            return float(portfolios["results"][0].get("equity") or 0.0)
+        except Exception as e:
+            print(f"❌ Error fetching portfolio value: {e}")
+            return 0.0
+
+    @_async_broker_call
+    async def get_open_option_positions(self):
+        return await self._get_paginated(f"{API_BASE}/options/positions/", {"nonzero": "True"})
+
+    @_async_broker_call
+    async def get_all_open_option_orders(self):
+        orders = await self._get_paginated(f"{API_BASE}/options/orders/")
+        return [order for order in orders if order.get("cancel_url") is not None]
+
+    @_async_broker_call
+    async def cancel_option_order(self, order_id):
+        return await self._post(f"{API_BASE}/options/orders/{order_id}/cancel/")
+
+    @_async_broker_call
+    async def get_option_order_info(self, order_id):
+        return await self._get(f"{API_BASE}/options/orders/{order_id}/")
+
+    async def find_open_option_position(self, symbol, strike, expiration, opt_type, positions=None):
+        try:
+            open_positions = positions if positions is not None else await self.get_open_option_positions()
+            for pos in open_positions:
+                if (pos['chain_symbol'].upper() == str(symbol).upper() and
+                        float(pos['strike_price']) == float(strike) and
+                        pos['expiration_date'] == str(expiration) and
+                        pos['type'].lower() == str(opt_type).lower()):
+                    return pos
+            return None
+        except Exception as e:
+            print(f"❌ Error fetching open positions: {e}")
+            return None
+
+    async def get_open_orders_for_contract(self, instrument_url):
+        try:
+            orders = await self.get_all_open_option_orders()
+            return [o for o in orders if o.get('legs', [{}])[0].get('option') == instrument_url]
+        except Exception as e:
+            print(f"❌ Error fetching open orders for instrument {instrument_url}: {e}")
+            return []
+
+    @_async_broker_call
+    async def place_option_buy_order(self, symbol, strike, expiration, opt_type, quantity, limit_price):
+        return await self._place_option_order(
+            symbol, strike, expiration, opt_type, side="buy", position_effect="open", direction="debit",
+            quantity=quantity, order_type="limit", trigger="immediate", price=round(limit_price, 2))
+
+    @_async_broker_call
+    async def place_option_stop_loss_order(self, symbol, strike, expiration, opt_type, quantity, stop_price):
+        return await self._place_option_order(
+            symbol, strike, expiration, opt_type, side="sell", position_effect="close", direction="credit",
+            quantity=quantity, order_type="limit", trigger="stop", price=round(stop_price, 2), stop_price=round(stop_price, 2))
+
+    @_async_broker_call
+    async def place_option_market_sell_order(self, symbol, strike, expiration, opt_type, quantity):
+        # Same order as RobinhoodTrader: a day limit just under the bid, re-priced by the order tracker if unfilled.
+        market_data = await self.get_option_market_data(symbol, expiration, strike, opt_type)
+        return await self._place_option_order(
+            symbol, strike, expiration, opt_type, side="sell", position_effect="close", direction="credit",
+            quantity=quantity, order_type="limit", trigger="immediate", price=marketable_exit_price(market_data),
+            time_in_force="gfd")
+
+    @_async_broker_call
+    async def get_option_market_data(self, symbol, expiration, strike, opt_type):
+        option_id = await self._get_option_id(symbol, strike, expiration, opt_type)
+        if not option_id:
+            return [[None]]
+        data = await self._get(f"{API_BASE}/marketdata/options/", {"ids": option_id})
+        return [data.get("results", [None])]
+
+    # --- Concurrent fan-out ---
+    async def get_account_snapshot(self) -> dict:
+        """Fetches positions, open orders and equity concurrently."""
+        positions, orders, equity = await asyncio.gather(
+            self.get_open_option_positions(), self.get_all_open_option_orders(), self.get_portfolio_value())
+        return {"positions": positions, "orders": orders, "portfolio_value": equity}
+
+
+class AsyncSimulatedTrader(AsyncRobinhoodTrader):
+    """Async counterpart of SimulatedTrader. Simulated state is in memory, so calls complete immediately."""
+    def __init__(self, simulated_trader: SimulatedTrader = None):
+        super().__init__()
+        # Share the sync simulator's state when one is given, so both views agree
+        self._sim = simulated_trader or SimulatedTrader()
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def login(self):
+        pass
+
+    async def reconnect(self):
+        self._sim.reconnect()
+
+    async def get_portfolio_value(self) -> float:
+        return self._sim.get_portfolio_value()
+
+    async def get_open_option_positions(self):
+        return list(self._sim.simulated_positions.values())
+
+    async def get_all_open_option_orders(self):
+        return self._sim.get_all_open_option_orders()
+
+    async def cancel_option_order(self, order_id):
+        return self._sim.cancel_option_order(order_id)
+
+    async def get_option_order_info(self, order_id):
+        return self._sim.get_option_order_info(order_id)
+
+    async def find_open_option_position(self, symbol, strike, expiration, opt_type, positions=None):
+        return self._sim.find_open_option_position(symbol, strike, expiration, opt_type)
+
+    async def get_open_orders_for_contract(self, instrument_url):
+        return self._sim.get_open_orders_for_contract(instrument_url)
+
+    async def place_option_buy_order(self, symbol, strike, expiration, opt_type, quantity, limit_price):
+        return self._sim.place_option_buy_order(symbol, strike, expiration, opt_type, quantity, limit_price)
+
+    async def place_option_stop_loss_order(self, symbol, strike, expiration, opt_type, quantity, stop_price):
+        return self._sim.place_option_stop_loss_order(symbol, strike, expiration, opt_type, quantity, stop_price)
+
+    async def place_option_market_sell_order(self, symbol, strike, expiration, opt_type, quantity):
+        return self._sim.place_option_market_sell_order(symbol, strike, expiration, opt_type, quantity)
+
+    async def get_option_market_data(self, symbol, expiration, strike, opt_type):
+        return self._sim.get_option_market_data(symbol, expiration, strike, opt_type)
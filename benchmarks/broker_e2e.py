@@ -0,0 +1,147 @@
+# benchmarks/broker_e2e.py
+"""
+End-to-end broker benchmark against the local fake Robinhood server: real HTTP,
+real robin_stocks, no network. Each cycle runs the calls a trade makes (quote,
+buy, fill check, stop, position lookup, open orders, cancel, sell, equity) and
+the report shows per-call latency, errors, requests per cycle by endpoint and
+the circuit breaker's final state.
+
+    python -m benchmarks.broker_e2e --cycles 50 --concurrency 4 --latency 0.03 --jitter 0.02
+    python -m benchmarks.broker_e2e --async --error-rate 0.05 --rate-limit 40
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from benchmarks.fake_robinhood import FakeRobinhood, add_fault_arguments
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+EXPIRATION = "2026-12-18"
+
+def _percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * (len(ordered) - 1)))] if ordered else 0.0
+
+class CycleRunner:
+    """Runs trade cycles through a sync trader (on worker threads) or an async trader, timing every call."""
+    def __init__(self, trader, is_async: bool):
+        self.trader = trader
+        self.is_async = is_async
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, name: str, *args):
+        method = getattr(self.trader, name)
+        start = time.perf_counter()
+        try:
+            result = await method(*args) if self.is_async else await asyncio.to_thread(method, *args)
+        except Exception:
+            result = None
+        self.timings[name].append(time.perf_counter() - start)
+        # robin_stocks reports most failures by returning None; cancels legitimately answer with an empty body
+        if result is None or (result == {} and name != "cancel_option_order"):
+            self.errors[name] += 1
+        return result
+
+    async def cycle(self, strike: float):
+        contract = ("SPY", strike, EXPIRATION, "call")
+        quotes = await self.call("get_option_market_data", "SPY", EXPIRATION, strike, "call")
+        quote = quotes[0][0] if quotes and quotes[0] and quotes[0][0] else {}
+        mark = float(quote.get("mark_price") or 1.5)
+        buy = await self.call("place_option_buy_order", *contract, 1, round(mark * 1.02, 2))
+        if buy and buy.get("id"):
+            for _ in range(20):
+                info = await self.call("get_option_order_info", buy["id"])
+                if info and info.get("state") == "filled":
+                    break
+                await asyncio.sleep(0.05)
+        stop = await self.call("place_option_stop_loss_order", *contract, 1, round(mark * 0.65, 2))
+        positions = await self.call("get_open_option_positions")
+        if positions is not None:
+            self.trader_find(contract, positions)
+        await self.call("get_all_open_option_orders")
+        if stop and stop.get("id"):
+            await self.call("cancel_option_order", stop["id"])
+        await self.call("place_option_market_sell_order", *contract, 1)
+        await self.call("get_portfolio_value")
+
+    def trader_find(self, contract, positions):
+        start = time.perf_counter()
+        found = [p for p in positions if p and p.get("chain_symbol") == contract[0]
+                 and float(p.get("strike_price", 0)) == float(contract[1])]
+        self.timings["(local) match position"].append(time.perf_counter() - start)
+        if not found:
+            self.errors["(local) match position"] += 1
+
+async def _run(runner: CycleRunner, cycles: int, concurrency: int) -> float:
+    queue = asyncio.Queue()
+    for i in range(cycles):
+        queue.put_nowait(400 + i) # A distinct strike per cycle keeps cycles independent
+    async def worker():
+        while not queue.empty():
+            await runner.cycle(float(queue.get_nowait()))
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Benchmark the broker path end to end against a fake Robinhood server.")
+    arg_parser.add_argument("--cycles", type=int, default=20)
+    arg_parser.add_argument("--concurrency", type=int, default=1)
+    arg_parser.add_argument("--async", dest="use_async", action="store_true", help="Use AsyncRobinhoodTrader instead of RobinhoodTrader.")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    add_fault_arguments(arg_parser)
+    args = vars(arg_parser.parse_args(argv))
+    cycles, concurrency, use_async, seed = (args.pop(k) for k in ("cycles", "concurrency", "use_async", "seed"))
+
+    server = FakeRobinhood(seed=seed)
+    base_url = server.start_in_thread()
+    # Must be set before the trader modules are imported: they read it once
+    os.environ["ROBINHOOD_API_BASE"] = base_url
+    os.environ.setdefault("ROBINHOOD_USER", "benchmark")
+    os.environ.setdefault("ROBINHOOD_PASS", "benchmark")
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    from trader import RobinhoodTrader
+    from async_trader import AsyncRobinhoodTrader
+    from circuit_breaker import robinhood_breaker
+
+    async def run() -> tuple:
+        if use_async:
+            trader = AsyncRobinhoodTrader(max_connections=max(concurrency, 1) * 2)
+            await trader.login()
+        else:
+            trader = await asyncio.to_thread(RobinhoodTrader)
+        # Faults apply from here on, so a setup failure never skews the run
+        server.faults.update(args)
+        server.stats.clear()
+        runner = CycleRunner(trader, use_async)
+        elapsed = await _run(runner, cycles, concurrency)
+        if use_async:
+            await trader.close()
+        return runner, elapsed
+
+    print(f"⚙️ Fake Robinhood at {base_url} | {'async' if use_async else 'sync'} trader | "
+          f"{cycles} cycles x{concurrency} | latency {args['latency']}s+{args['jitter']}s, "
+          f"errors {args['error_rate']:.0%}, rate limit {args['rate_limit'] or 'off'}")
+    runner, elapsed = asyncio.run(run())
+    server.stop_thread()
+
+    print(f"\n{'call':<34} {'count':>6} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for name, samples in sorted(runner.timings.items()):
+        print(f"{name:<34} {len(samples):>6} {runner.errors[name]:>7} {_percentile(samples, 0.5) * 1e3:>9.1f} "
+              f"{_percentile(samples, 0.95) * 1e3:>9.1f} {max(samples) * 1e3:>9.1f}")
+
+    print(f"\n{'server endpoint':<40} {'requests':>9} {'per cycle':>10}")
+    for endpoint, count in sorted(server.stats.items(), key=lambda item: -item[1]):
+        print(f"{endpoint:<40} {count:>9} {count / max(cycles, 1):>10.1f}")
+    print(f"\n✅ {cycles} cycles in {elapsed:.2f}s ({cycles / elapsed:.1f} cycles/s) | "
+          f"Circuit breaker: {robinhood_breaker.status_line()}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
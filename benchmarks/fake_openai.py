@@ -0,0 +1,216 @@
+# benchmarks/fake_openai.py
+"""
+A local stand-in for the OpenAI chat completions endpoint, for load testing the
+parse path without spending tokens. The real client is used unchanged: point it
+here with OPENAI_BASE_URL. Latency, jitter, error injection and a rate limit are
+configurable, at startup or at runtime through POST /_admin/config.
+
+Replies are derived from the prompt: the last synthetic signal written by
+format_signal() is answered with the matching trade JSON (a plain object, or
+{"signals": [...]} for structured-output requests), anything else with
+{"action": "null"}. Streaming requests are answered as server-sent events.
+
+    python -m benchmarks.fake_openai --port 8766 --latency 0.8 --jitter 0.6
+    OPENAI_BASE_URL=http://127.0.0.1:8766/v1 python live.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from aiohttp import web
+
+DEFAULT_FAULTS = {
+    "latency": 0.0,     # Base delay before every reply (seconds); streamed replies spread it over the chunks
+    "jitter": 0.0,      # Extra uniform random delay, 0..jitter seconds
+    "error_rate": 0.0,  # Fraction of requests answered with 500
+    "rate_limit": 0.0,  # Requests per second before 429s (0 = unlimited); bursts up to one second's worth
+}
+_ACTION_VERBS = {"buy": "BTO", "trim": "TRIM", "exit": "STC"}
+_VERB_ACTIONS = {verb: action for action, verb in _ACTION_VERBS.items()}
+# The #ld reference keeps the worked examples inside the channel prompts from ever matching
+SIGNAL_PATTERN = re.compile(
+    r"\b(BTO|TRIM|STC) \$?([A-Z]+) (\d{2})/(\d{2})/(\d{4}) (\d+(?:\.\d+)?)([CP]) @ (\d+(?:\.\d+)?) #ld(\d+)")
+
+def format_signal(action: str, ticker: str, expiration: str, strike: float, opt_type: str, price: float, ref: int) -> str:
+    """Writes a trade the way a trader would post it, e.g. 'BTO SPY 12/18/2026 512C @ 1.25 #ld7'."""
+    year, month, day = expiration.split("-")
+    return (f"{_ACTION_VERBS[action]} {ticker} {month}/{day}/{year} {strike:g}{opt_type[0].upper()} "
+            f"@ {price:.2f} #ld{ref}")
+
+def parse_signal(text: str) -> dict | None:
+    """The trade JSON a perfect parser would return for the last synthetic signal in `text`."""
+    matches = SIGNAL_PATTERN.findall(text)
+    if not matches:
+        return None
+    verb, ticker, month, day, year, strike, opt_type, price, ref = matches[-1]
+    return {
+        "action": _VERB_ACTIONS[verb], "ticker": ticker, "strike": float(strike),
+        "type": "call" if opt_type == "C" else "put", "expiration": f"{year}-{month}-{day}",
+        "price": float(price), "size": "full",
+    }
+
+
+class FakeOpenAI:
+    """The fake server: answers /v1/chat/completions from the prompt behind an aiohttp app."""
+    def __init__(self, seed: int | None = None, **faults):
+        unknown = set(faults) - set(DEFAULT_FAULTS)
+        if unknown:
+            raise ValueError(f"Unknown fault settings: {', '.join(sorted(unknown))}")
+        self.faults = {**DEFAULT_FAULTS, **faults}
+        self.base_url = ""
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._tokens = float(self.faults["rate_limit"] or 0)
+        self._tokens_at = time.monotonic()
+        self._runner = None
+        self._thread_loop = None
+
+    # --- Lifecycle ---
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.handle_completion)
+        app.router.add_get("/_admin/stats", self.handle_admin_stats)
+        app.router.add_post("/_admin/config", self.handle_admin_config)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving on the running loop and returns the base URL (port 0 picks a free port)."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.base_url = f"http://{host}:{sock.getsockname()[1]}"
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Runs the server on its own event loop in a daemon thread, so it never competes with the caller's loop."""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(host, port))
+            ready.set()
+            loop.run_forever()
+        threading.Thread(target=serve, name="fake-openai", daemon=True).start()
+        if not ready.wait(10):
+            raise RuntimeError("Fake OpenAI server did not start")
+        self._thread_loop = loop
+        return self.base_url
+
+    def stop_thread(self):
+        if self._thread_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._thread_loop).result(5)
+            self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+            self._thread_loop = None
+
+    # --- Faults ---
+    def _take_rate_token(self) -> bool:
+        rate = self.faults["rate_limit"]
+        if not rate:
+            return True
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._tokens_at) * rate)
+        self._tokens_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    # --- Handlers ---
+    def _reply_content(self, body: dict) -> str:
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        signal = parse_signal(prompt)
+        if body.get("response_format", {}).get("type") == "json_schema":
+            return json.dumps({"signals": [signal] if signal else []})
+        return json.dumps(signal or {"action": "null"})
+
+    async def handle_completion(self, request):
+        self.stats["requests"] += 1
+        body = await request.json()
+        if not self._take_rate_token():
+            self.stats["throttled"] += 1
+            return web.json_response({"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                     status=429, headers={"retry-after": "1"})
+        delay = self.faults["latency"] + self._random.uniform(0, self.faults["jitter"])
+        if self.faults["error_rate"] and self._random.random() < self.faults["error_rate"]:
+            await asyncio.sleep(delay)
+            self.stats["errors_injected"] += 1
+            return web.json_response({"error": {"message": "The server had an error", "type": "server_error"}}, status=500)
+
+        content = self._reply_content(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        base = {"id": completion_id, "created": int(time.time()), "model": body.get("model", "gpt-3.5-turbo")}
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return web.json_response({
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunks = [content[i:i + 16] for i in range(0, len(content), 16)]
+        for index, piece in enumerate(chunks):
+            await asyncio.sleep(delay / len(chunks))
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [{
+                "index": 0, "delta": {"role": "assistant", "content": piece} if index == 0 else {"content": piece},
+                "finish_reason": "stop" if index == len(chunks) - 1 else None,
+            }]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def handle_admin_stats(self, request):
+        return web.json_response({"requests": dict(self.stats), "faults": self.faults})
+
+    async def handle_admin_config(self, request):
+        updates = await request.json()
+        unknown = set(updates) - set(DEFAULT_FAULTS)
+        if unknown:
+            return web.json_response({"detail": f"Unknown settings: {', '.join(sorted(unknown))}"}, status=400)
+        self.faults.update(updates)
+        return web.json_response(self.faults)
+
+
+def add_fault_arguments(arg_parser: argparse.ArgumentParser, prefix: str = ""):
+    """Adds one --flag per fault setting (e.g. --error-rate, or --llm-error-rate with prefix 'llm')."""
+    for name, default in DEFAULT_FAULTS.items():
+        flag = f"{prefix}-{name}" if prefix else name
+        arg_parser.add_argument(f"--{flag.replace('_', '-')}", dest=flag.replace("-", "_"), type=type(default), default=default)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run a local fake OpenAI chat completions server.")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8766)
+    arg_parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latency and faults.")
+    add_fault_arguments(arg_parser)
+    args = vars(arg_parser.parse_args(argv))
+    host, port, seed = args.pop("host"), args.pop("port"), args.pop("seed")
+    server = FakeOpenAI(seed=seed, **args)
+
+    async def serve():
+        base_url = await server.start(host, port)
+        print(f"✅ Fake OpenAI listening on {base_url} (set OPENAI_BASE_URL={base_url}/v1)")
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+# benchmarks/fake_robinhood.py
+"""
+A local stand-in for the Robinhood endpoints the bot uses, for offline integration
+and latency testing of the real HTTP path (robin_stocks, RobinhoodTrader and
+AsyncRobinhoodTrader). Latency, jitter, error injection, hung requests and a
+rate limit are configurable, at startup or at runtime through POST /_admin/config.
+
+Run it on its own and point the bot at it:
+    python -m benchmarks.fake_robinhood --port 8765 --latency 0.05 --error-rate 0.02
+    ROBINHOOD_API_BASE=http://127.0.0.1:8765 python live.py
+
+Fill model: limit buys fill at their limit once it is at or above the mark, limit
+sells once it is at or below the mark, and stop orders once the mark falls to the
+stop. Immediate orders wait `fill_delay` seconds first. Set the mark for every
+contract with POST /_admin/config {"mark_price": ...}.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from aiohttp import web
+
+DEFAULT_FAULTS = {
+    "latency": 0.0,        # Base delay added to every request (seconds)
+    "jitter": 0.0,         # Extra uniform random delay, 0..jitter seconds
+    "error_rate": 0.0,     # Fraction of requests answered with 503
+    "hang_rate": 0.0,      # Fraction of requests that stall for hang_seconds (exercises client timeouts)
+    "hang_seconds": 60.0,
+    "rate_limit": 0.0,     # Requests per second before 429s (0 = unlimited); bursts up to one second's worth
+    "fill_delay": 0.0,     # Seconds before a marketable immediate order fills
+    "page_size": 100,      # Results per page on paginated endpoints
+    "mark_price": 1.50,    # Mark for every contract; bid/ask are mark -/+ half_spread
+    "half_spread": 0.05,
+    "starting_cash": 100000.0,
+}
+ACCOUNT_NUMBER = "FAKE00001"
+_ID_NAMESPACE = uuid.UUID("6f1d3c1e-2b7a-4c55-9a43-6d7f0e1b2a99")
+_OPEN_STATES = {"queued", "unconfirmed", "confirmed", "partially_filled"}
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+def _money(value: float) -> str:
+    return f"{value:.4f}"
+
+def _id_from_url(url: str) -> str:
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+
+class FakeRobinhood:
+    """The fake server: in-memory account, positions and orders behind an aiohttp app."""
+    def __init__(self, seed: int | None = None, **faults):
+        unknown = set(faults) - set(DEFAULT_FAULTS)
+        if unknown:
+            raise ValueError(f"Unknown fault settings: {', '.join(sorted(unknown))}")
+        self.faults = {**DEFAULT_FAULTS, **faults}
+        self.base_url = ""
+        self._random = random.Random(seed)
+        self._runner = None
+        self._thread_loop = None
+        self.reset()
+
+    def reset(self):
+        self.cash = float(self.faults["starting_cash"])
+        self.chains = {}      # symbol -> chain ID
+        self.instruments = {} # option ID -> instrument
+        self.positions = {}   # option ID -> position
+        self.orders = OrderedDict() # order ID -> order, oldest first
+        self.stats = Counter()
+        self._tokens = float(self.faults["rate_limit"] or 0)
+        self._tokens_at = time.monotonic()
+
+    # --- Lifecycle ---
+    def build_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._fault_middleware])
+        app.router.add_post("/oauth2/token/", self.handle_login)
+        app.router.add_get("/accounts/", self.handle_accounts)
+        app.router.add_get("/portfolios/", self.handle_portfolios)
+        app.router.add_get("/instruments/", self.handle_instruments)
+        app.router.add_get("/options/instruments/", self.handle_option_instruments)
+        app.router.add_get("/options/instruments/{option_id}/", self.handle_option_instrument)
+        app.router.add_get("/options/positions/", self.handle_positions)
+        app.router.add_get("/options/orders/", self.handle_orders)
+        app.router.add_post("/options/orders/", self.handle_place_order)
+        app.router.add_get("/options/orders/{order_id}/", self.handle_order)
+        app.router.add_post("/options/orders/{order_id}/cancel/", self.handle_cancel_order)
+        app.router.add_get("/marketdata/options/", self.handle_market_data)
+        app.router.add_get("/_admin/stats", self.handle_admin_stats)
+        app.router.add_post("/_admin/config", self.handle_admin_config)
+        app.router.add_post("/_admin/reset", self.handle_admin_reset)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Starts serving on the running loop and returns the base URL (port 0 picks a free port)."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.base_url = f"http://{host}:{sock.getsockname()[1]}"
+        self._runner = web.AppRunner(self.build_app(), access_log=None)
+        await self._runner.setup()
+        await web.SockSite(self._runner, sock).start()
+        return self.base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Runs the server on its own event loop in a daemon thread, for synchronous drivers."""
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(host, port))
+            ready.set()
+            loop.run_forever()
+        threading.Thread(target=serve, name="fake-robinhood", daemon=True).start()
+        if not ready.wait(10):
+            raise RuntimeError("Fake Robinhood server did not start")
+        self._thread_loop = loop
+        return self.base_url
+
+    def stop_thread(self):
+        if self._thread_loop is not None:
+            asyncio.run_coroutine_threadsafe(self.stop(), self._thread_loop).result(5)
+            self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+            self._thread_loop = None
+
+    # --- Faults ---
+    def _take_rate_token(self) -> bool:
+        rate = self.faults["rate_limit"]
+        if not rate:
+            return True
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._tokens_at) * rate)
+        self._tokens_at = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    @web.middleware
+    async def _fault_middleware(self, request, handler):
+        if request.path.startswith("/_admin/"):
+            return await handler(request)
+        route = request.match_info.route.resource
+        self.stats[f"{request.method} {route.canonical if route else request.path}"] += 1
+
+        if not self._take_rate_token():
+            self.stats["throttled"] += 1
+            return web.json_response({"detail": "Request was throttled."}, status=429, headers={"Retry-After": "1"})
+        delay = self.faults["latency"] + self._random.uniform(0, self.faults["jitter"])
+        if delay:
+            await asyncio.sleep(delay)
+        if self.faults["hang_rate"] and self._random.random() < self.faults["hang_rate"]:
+            self.stats["hung"] += 1
+            await asyncio.sleep(self.faults["hang_seconds"])
+        if self.faults["error_rate"] and self._random.random() < self.faults["error_rate"]:
+            self.stats["errors_injected"] += 1
+            return web.json_response({"detail": "Service Unavailable"}, status=503)
+        if request.path != "/oauth2/token/" and not request.headers.get("Authorization"):
+            return web.json_response({"detail": "Authentication credentials were not provided."}, status=401)
+        self._advance_orders()
+        return await handler(request)
+
+    # --- Helpers ---
+    def _paginate(self, request, items: list) -> web.Response:
+        page_size = int(self.faults["page_size"])
+        offset = int(request.query.get("cursor", 0))
+        page = items[offset:offset + page_size]
+        next_url = None
+        if offset + page_size < len(items):
+            next_url = self.base_url + str(request.rel_url.update_query({"cursor": str(offset + page_size)}))
+        return web.json_response({"next": next_url, "previous": None, "results": page})
+
+    def _account_url(self) -> str:
+        return f"{self.base_url}/accounts/{ACCOUNT_NUMBER}/"
+
+    def _chain_id(self, symbol: str) -> str:
+        symbol = symbol.upper()
+        if symbol not in self.chains:
+            self.chains[symbol] = str(uuid.uuid5(_ID_NAMESPACE, f"chain|{symbol}"))
+        return self.chains[symbol]
+
+    def _instrument(self, symbol: str, expiration: str, strike: float, opt_type: str) -> dict:
+        option_id = str(uuid.uuid5(_ID_NAMESPACE, f"{symbol.upper()}|{expiration}|{strike:.4f}|{opt_type}"))
+        if option_id not in self.instruments:
+            self.instruments[option_id] = {
+                "id": option_id, "url": f"{self.base_url}/options/instruments/{option_id}/",
+                "chain_id": self._chain_id(symbol), "chain_symbol": symbol.upper(),
+                "expiration_date": expiration, "strike_price": _money(strike), "type": opt_type,
+                "state": "active", "tradability": "tradable",
+            }
+        return self.instruments[option_id]
+
+    def _quote(self, instrument: dict) -> dict:
+        mark = float(self.faults["mark_price"])
+        half_spread = float(self.faults["half_spread"])
+        return {
+            "instrument": instrument["url"], "instrument_id": instrument["id"],
+            "symbol": instrument["chain_symbol"], "mark_price": _money(mark), "adjusted_mark_price": _money(mark),
+            "bid_price": _money(max(mark - half_spread, 0.01)), "ask_price": _money(mark + half_spread),
+            "bid_size": 10, "ask_size": 10, "last_trade_price": _money(mark), "volume": 1000, "open_interest": 5000,
+            "implied_volatility": "0.2500", "updated_at": _now_iso(),
+        }
+
+    def _advance_orders(self):
+        """Fills every open order whose conditions are met against the current mark."""
+        mark = float(self.faults["mark_price"])
+        now = time.monotonic()
+        for order in self.orders.values():
+            if order["state"] not in _OPEN_STATES:
+                continue
+            leg = order["legs"][0]
+            price = float(order["price"] or 0)
+            if order["trigger"] == "stop":
+                ready = mark <= float(order["stop_price"])
+            elif now - order["_submitted"] < self.faults["fill_delay"]:
+                ready = False
+            elif order["type"] == "market":
+                ready = True
+            else:
+                ready = price >= mark if leg["side"] == "buy" else price <= mark
+            if ready:
+                self._fill(order, price if order["type"] == "limit" else mark)
+
+    def _fill(self, order: dict, price: float):
+        leg = order["legs"][0]
+        quantity = float(order["quantity"])
+        option_id = _id_from_url(leg["option"])
+        instrument = self.instruments[option_id]
+        position = self.positions.get(option_id)
+        if leg["side"] == "buy":
+            self.cash -= price * quantity * 100
+            if position is None:
+                position = self.positions[option_id] = {
+                    "account": self._account_url(), "account_number": ACCOUNT_NUMBER,
+                    "chain_id": instrument["chain_id"], "chain_symbol": instrument["chain_symbol"],
+                    "option": instrument["url"], "option_id": option_id,
+                    # Contract details are included so positions can be matched without an instrument lookup
+                    "strike_price": instrument["strike_price"], "expiration_date": instrument["expiration_date"],
+                    "type": instrument["type"], "quantity": _money(0), "average_price": _money(0),
+                    "created_at": _now_iso(),
+                }
+            old_quantity = float(position["quantity"])
+            cost = old_quantity * float(position["average_price"]) + quantity * price * 100
+            position["quantity"] = _money(old_quantity + quantity)
+            position["average_price"] = _money(cost / (old_quantity + quantity))
+        else:
+            self.cash += price * quantity * 100
+            if position is not None:
+                remaining = float(position["quantity"]) - quantity
+                if remaining <= 0:
+                    position["quantity"] = _money(0)
+                else:
+                    position["quantity"] = _money(remaining)
+        order.update({
+            "state": "filled", "processed_quantity": _money(quantity), "pending_quantity": _money(0),
+            "cancel_url": None, "processed_premium": _money(price * quantity * 100),
+            "average_price": _money(price * 100), "updated_at": _now_iso(),
+        })
+        if position is not None:
+            position["updated_at"] = _now_iso()
+
+    def _public_order(self, order: dict) -> dict:
+        return {key: value for key, value in order.items() if not key.startswith("_")}
+
+    # --- Handlers ---
+    async def handle_login(self, request):
+        await request.post()
+        return web.json_response({
+            "access_token": uuid.uuid4().hex, "refresh_token": uuid.uuid4().hex, "token_type": "Bearer",
+            "expires_in": 31536000, "scope": "internal",
+        })
+
+    async def handle_accounts(self, request):
+        return self._paginate(request, [{
+            "url": self._account_url(), "account_number": ACCOUNT_NUMBER, "type": "margin",
+            "cash": _money(self.cash), "buying_power": _money(self.cash),
+        }])
+
+    async def handle_portfolios(self, request):
+        market_value = sum(float(p["quantity"]) * float(self.faults["mark_price"]) * 100 for p in self.positions.values())
+        return self._paginate(request, [{
+            "url": f"{self.base_url}/portfolios/{ACCOUNT_NUMBER}/", "account": self._account_url(),
+            "equity": _money(self.cash + market_value), "extended_hours_equity": _money(self.cash + market_value),
+            "market_value": _money(market_value),
+        }])
+
+    async def handle_instruments(self, request):
+        symbol = request.query.get("symbol", "").upper()
+        if not symbol:
+            return self._paginate(request, [])
+        return self._paginate(request, [{
+            "id": str(uuid.uuid5(_ID_NAMESPACE, f"equity|{symbol}")), "symbol": symbol,
+            "url": f"{self.base_url}/instruments/{uuid.uuid5(_ID_NAMESPACE, f'equity|{symbol}')}/",
+            "tradable_chain_id": self._chain_id(symbol), "tradeable": True,
+        }])
+
+    async def handle_option_instruments(self, request):
+        query = request.query
+        symbol = next((s for s, chain_id in self.chains.items() if chain_id == query.get("chain_id")), None)
+        expiration = query.get("expiration_dates")
+        if symbol is None or not expiration or not query.get("strike_price"):
+            return self._paginate(request, [])
+        try:
+            strike = float(query["strike_price"])
+        except ValueError:
+            return web.json_response({"detail": "Invalid strike_price."}, status=400)
+        opt_type = query.get("type", "").lower()
+        types = [opt_type] if opt_type in ("call", "put") else ["call", "put"]
+        return self._paginate(request, [self._instrument(symbol, expiration, strike, t) for t in types])
+
+    async def handle_option_instrument(self, request):
+        instrument = self.instruments.get(request.match_info["option_id"])
+        if instrument is None:
+            return web.json_response({"detail": "Not found."}, status=404)
+        return web.json_response(instrument)
+
+    async def handle_positions(self, request):
+        positions = list(self.positions.values())
+        if request.query.get("nonzero", "").lower() == "true":
+            positions = [p for p in positions if float(p["quantity"]) > 0]
+        return self._paginate(request, positions)
+
+    async def handle_orders(self, request):
+        return self._paginate(request, [self._public_order(o) for o in reversed(self.orders.values())])
+
+    async def handle_order(self, request):
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None:
+            return web.json_response({"detail": "Not found."}, status=404)
+        return web.json_response(self._public_order(order))
+
+    async def handle_place_order(self, request):
+        try:
+            body = await request.json()
+            leg = body["legs"][0]
+            instrument = self.instruments[_id_from_url(leg["option"])]
+            quantity = float(body["quantity"])
+            if quantity <= 0:
+                raise ValueError("quantity must be positive")
+            if body.get("trigger") == "stop" and body.get("stop_price") is None:
+                raise ValueError("stop orders need a stop_price")
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return web.json_response({"detail": f"Invalid order: {e}"}, status=400)
+
+        order_id = str(uuid.uuid4())
+        price = body.get("price")
+        order = {
+            "id": order_id, "ref_id": body.get("ref_id"), "account": body.get("account") or self._account_url(),
+            "chain_id": instrument["chain_id"], "chain_symbol": instrument["chain_symbol"],
+            "direction": body.get("direction"), "type": body.get("type", "limit"), "trigger": body.get("trigger", "immediate"),
+            "time_in_force": body.get("time_in_force", "gtc"),
+            "price": _money(float(price)) if price is not None else None,
+            "stop_price": _money(float(body["stop_price"])) if body.get("stop_price") is not None else None,
+            "quantity": _money(quantity), "processed_quantity": _money(0), "pending_quantity": _money(quantity),
+            "premium": _money(float(price or 0) * 100), "processed_premium": _money(0),
+            "state": "confirmed", "cancel_url": f"{self.base_url}/options/orders/{order_id}/cancel/",
+            "legs": [{
+                "id": str(uuid.uuid4()), "option": instrument["url"], "side": leg.get("side"),
+                "position_effect": leg.get("position_effect"), "ratio_quantity": leg.get("ratio_quantity", 1),
+                "strike_price": instrument["strike_price"], "expiration_date": instrument["expiration_date"],
+                "option_type": instrument["type"],
+            }],
+            "created_at": _now_iso(), "updated_at": _now_iso(), "_submitted": time.monotonic(),
+        }
+        self.orders[order_id] = order
+        self._advance_orders()
+        return web.json_response(self._public_order(order), status=201)
+
+    async def handle_cancel_order(self, request):
+        order = self.orders.get(request.match_info["order_id"])
+        if order is None:
+            return web.json_response({"detail": "Not found."}, status=404)
+        if order["state"] not in _OPEN_STATES:
+            return web.json_response({"detail": f"Order is {order['state']} and cannot be canceled."}, status=400)
+        order.update({"state": "cancelled", "cancel_url": None, "pending_quantity": _money(0), "updated_at": _now_iso()})
+        return web.json_response({})
+
+    async def handle_market_data(self, request):
+        ids = [i for i in request.query.get("ids", "").split(",") if i]
+        ids += [_id_from_url(url) for url in request.query.get("instruments", "").split(",") if url]
+        return web.json_response({"results": [
+            self._quote(self.instruments[option_id]) if option_id in self.instruments else None for option_id in ids
+        ]})
+
+    async def handle_admin_stats(self, request):
+        return web.json_response({
+            "requests": dict(self.stats), "orders": len(self.orders),
+            "open_positions": sum(1 for p in self.positions.values() if float(p["quantity"]) > 0),
+            "cash": self.cash, "faults": self.faults,
+        })
+
+    async def handle_admin_config(self, request):
+        updates = await request.json()
+        unknown = set(updates) - set(DEFAULT_FAULTS)
+        if unknown:
+            return web.json_response({"detail": f"Unknown settings: {', '.join(sorted(unknown))}"}, status=400)
+        self.faults.update(updates)
+        return web.json_response(self.faults)
+
+    async def handle_admin_reset(self, request):
+        self.reset()
+        return web.json_response({"reset": True})
+
+
+def add_fault_arguments(arg_parser: argparse.ArgumentParser, prefix: str = ""):
+    """Adds one --flag per fault setting (e.g. --error-rate, or --broker-error-rate with prefix 'broker')."""
+    for name, default in DEFAULT_FAULTS.items():
+        flag = f"{prefix}-{name}" if prefix else name
+        arg_parser.add_argument(f"--{flag.replace('_', '-')}", dest=flag.replace("-", "_"), type=type(default), default=default)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Run a local fake Robinhood API server.")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible fault injection.")
+    add_fault_arguments(arg_parser)
+    args = vars(arg_parser.parse_args(argv))
+    host, port, seed = args.pop("host"), args.pop("port"), args.pop("seed")
+    server = FakeRobinhood(seed=seed, **args)
+
+    async def serve():
+        base_url = await server.start(host, port)
+        print(f"✅ Fake Robinhood listening on {base_url} (set ROBINHOOD_API_BASE={base_url})")
+        await asyncio.Event().wait()
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
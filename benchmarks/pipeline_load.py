@@ -0,0 +1,645 @@
+# benchmarks/pipeline_load.py
+"""
+Synthetic burst load for the whole message pipeline. Synthetic Discord messages
+and embeds for every configured channel are fed to MyClient.on_message, and
+everything behind it runs for real (executor, parsers, PositionManager, order
+aggregator, trader, webhooks) against local fakes: the fake OpenAI server, the
+fake Robinhood server and a webhook sink, each with configurable latency.
+
+The report covers throughput, executor queue growth, end-to-end tail latency,
+a per-stage latency breakdown against an unloaded calibration run, and the
+first stage to saturate.
+
+    python -m benchmarks.pipeline_load --profile market_open --burst 10 --llm-latency 0.8 --llm-jitter 0.6
+    python -m benchmarks.pipeline_load --profile ramp --rate 30 --duration 20 --workers 8
+    python -m benchmarks.pipeline_load --profile all_at_once --burst 20 --webhook-latency 0.3 --broker-latency 0.05
+
+Profiles:
+    steady       Poisson arrivals at --rate messages/s over all channels for --duration seconds
+    market_open  every channel posts --burst messages within the first few seconds, then the steady rate
+    all_at_once  every channel posts --burst messages at the same instant
+    ramp         the arrival rate climbs linearly from 1/s to --rate over --duration
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from aiohttp import web
+
+from benchmarks.fake_openai import FakeOpenAI, format_signal, add_fault_arguments as add_llm_arguments
+from benchmarks.fake_robinhood import FakeRobinhood, add_fault_arguments as add_broker_arguments
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+MARKET_OPEN_SECONDS = 3.0 # How long the opening burst of the market_open profile lasts
+TICKERS = ("SPY", "QQQ", "TSLA", "NVDA", "AMD")
+# Embed titles for the channels that post embeds; the rest post plain text
+EMBED_TITLES = {
+    "Ryan": {"buy": "ENTRY", "trim": "TRIM", "exit": "EXIT"},
+    "Eva": {"buy": "OPEN", "trim": "CLOSE", "exit": "CLOSE"},
+}
+# Stages in the order a message meets them (see StageClock)
+STAGES = ("executor wait", "llm parse", "position lock wait", "position manager", "order coalesce wait",
+          "broker", "storage", "bot code")
+
+def _percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * (len(ordered) - 1)))] if ordered else 0.0
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1e3:.0f}"
+
+
+# --- Load shape ---
+def build_schedule(profile: str, channel_ids: list, rate: float, duration: float, burst: int,
+                   rng: random.Random) -> list[tuple[float, int]]:
+    """Returns (seconds from start, channel ID) for every message, in order."""
+    events = []
+    if profile == "all_at_once":
+        return [(0.0, channel_id) for _ in range(burst) for channel_id in channel_ids]
+    if profile == "market_open":
+        for channel_id in channel_ids:
+            events += [(rng.uniform(0, MARKET_OPEN_SECONDS), channel_id) for _ in range(burst)]
+    offset = MARKET_OPEN_SECONDS if profile == "market_open" else 0.0
+    while True:
+        current_rate = 1 + (rate - 1) * offset / duration if profile == "ramp" else rate
+        offset += rng.expovariate(max(current_rate, 0.01))
+        if offset >= duration:
+            break
+        events.append((offset, rng.choice(channel_ids)))
+    return sorted(events)
+
+
+class SignalScript:
+    """
+    Decides what each channel posts next: new entries, then trims and exits of
+    contracts the channel already holds, so every action path is exercised.
+    `shared_rate` of the entries reuse another channel's latest contract, the
+    case the order aggregator coalesces.
+    """
+    def __init__(self, handlers: dict, rng: random.Random, shared_rate: float):
+        self.handlers = handlers
+        self.rng = rng
+        self.shared_rate = shared_rate
+        self.expiration = (datetime.now(timezone.utc) + timedelta(days=30)).strftime("%Y-%m-%d")
+        self.open_contracts = defaultdict(list) # channel ID -> [[ticker, strike, type, price, trimmed]]
+        self.expected = {} # message ID -> (action, strike) as posted
+        self._last_entry = None
+        self._next_strike = 400
+        self._sequence = 0
+
+    def _next_signal(self, channel_id: int) -> tuple[str, list]:
+        held = self.open_contracts[channel_id]
+        if held and self.rng.random() < 0.5:
+            contract = held[0]
+            if not contract[4] and self.rng.random() < 0.5:
+                contract[4] = True
+                return "trim", contract
+            held.pop(0)
+            return "exit", contract
+        if self._last_entry and self.rng.random() < self.shared_rate:
+            contract = list(self._last_entry)
+        else:
+            self._next_strike += 1
+            contract = [self.rng.choice(TICKERS), self._next_strike, self.rng.choice(("call", "put")),
+                        round(self.rng.uniform(0.8, 3.0), 2), False]
+        self._last_entry = contract
+        held.append(contract)
+        return "buy", contract
+
+    def next_message(self, channel_id: int):
+        action, (ticker, strike, opt_type, price, _) = self._next_signal(channel_id)
+        self._sequence += 1
+        text = format_signal(action, ticker, self.expiration, strike, opt_type, price, self._sequence)
+        name = self.handlers[channel_id].name
+        message = SyntheticMessage(channel_id, self._sequence, text, EMBED_TITLES.get(name, {}).get(action))
+        self.expected[message.id] = (action, float(strike))
+        return message
+
+
+class SyntheticMessage:
+    """Just the discord.Message attributes the pipeline reads; channels in EMBED_TITLES get an embed instead of content."""
+    def __init__(self, channel_id: int, sequence: int, text: str, embed_title: str | None):
+        import discord
+        self.created_at = datetime.now(timezone.utc)
+        self.id = discord.utils.time_snowflake(self.created_at) + (sequence & 0x3FFFFF) # Unique within a millisecond
+        self.channel = SimpleNamespace(id=channel_id)
+        self.author = SimpleNamespace(id=0, name="load-generator", bot=False)
+        self.content = "" if embed_title else text
+        self.embeds = [discord.Embed(title=embed_title, description=text)] if embed_title else []
+
+
+# --- Instrumentation ---
+class StageClock:
+    """
+    Exclusive time per pipeline stage for each message, measured on the trade
+    threads. Stages nest: while a traced call runs, its caller's stage is paused,
+    so the broker calls inside the order aggregator count as broker time, not as
+    coalesce wait. Time not inside any traced call is "bot code".
+
+    A buy hands its order to the aggregator and its thread moves on, so the message
+    only finishes once the aggregator's callback has reported it. Its coalesce wait
+    runs from submit to flush, and the flush's broker time is booked to every buy in
+    the batch.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.messages = {} # message ID -> {"dispatched", "started", "finished", stage totals}
+
+    def dispatched(self, message_id: int):
+        with self._lock:
+            self.messages[message_id] = {"dispatched": time.perf_counter(), "stages": Counter(),
+                                         "pending": 0, "thread_done": False}
+
+    def completed(self) -> int:
+        with self._lock:
+            return sum(1 for record in self.messages.values() if "finished" in record)
+
+    @contextmanager
+    def _attached(self, totals: Counter):
+        """Books this thread's time to `totals` ("bot code" unless a traced call runs) until the block exits."""
+        saved = getattr(self._local, "stack", None), getattr(self._local, "totals", None)
+        started = time.perf_counter()
+        self._local.stack, self._local.totals = [["bot code", started]], totals
+        try:
+            yield
+        finally:
+            name, started = self._local.stack.pop()
+            now = time.perf_counter()
+            totals[name] += now - started
+            self._local.stack, self._local.totals = saved
+            if saved[0]: # The caller's stage was paused, not running
+                saved[0][-1][1] = now
+
+    def _finish(self, record: dict, thread_done: bool = False):
+        """The message is finished once its thread returned and no aggregator callback is pending."""
+        with self._lock:
+            record["thread_done"] = record["thread_done"] or thread_done
+            if record["thread_done"] and not record["pending"]:
+                record["finished"] = time.perf_counter()
+
+    def trace_message(self, handle_trade):
+        """Wraps _blocking_handle_trade so each message's stage totals are collected."""
+        @functools.wraps(handle_trade)
+        def traced(loop, handler, message_meta, raw_msg, is_sim_mode_on, message_id=None, message_age=None):
+            record = self.messages.get(message_id)
+            if record is None: # Not ours (e.g. a backfill)
+                return handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on, message_id, message_age)
+            record["started"] = time.perf_counter()
+            self._local.record = record
+            try:
+                with self._attached(record["stages"]):
+                    return handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on, message_id, message_age)
+            finally:
+                self._local.record = None
+                self._finish(record, thread_done=True)
+        return traced
+
+    def trace_aggregator(self, aggregator):
+        """Wraps the order aggregator so each buy is timed through to its batch's callback."""
+        submit_buy, submit = aggregator.submit_buy, aggregator._submit
+
+        def traced_submit(*args, **kwargs):
+            # Runs on the thread that flushes the batch: the timer thread, or the trade thread with no window
+            flush = self._local.flush = {"started": time.perf_counter(), "stages": Counter()}
+            with self._attached(flush["stages"]):
+                return submit(*args, **kwargs)
+
+        def traced_submit_buy(*args, on_result=None, **kwargs):
+            record = getattr(self._local, "record", None)
+            if record is None or on_result is None:
+                return submit_buy(*args, on_result=on_result, **kwargs)
+            submitted = time.perf_counter()
+            def on_batch(result):
+                flush = self._local.flush
+                record["stages"]["order coalesce wait"] += flush["started"] - submitted
+                record["stages"].update(flush["stages"])
+                try:
+                    with self._attached(record["stages"]):
+                        on_result(result)
+                finally:
+                    with self._lock:
+                        record["pending"] -= 1
+                    self._finish(record)
+            with self._lock:
+                record["pending"] += 1
+            return submit_buy(*args, on_result=on_batch, **kwargs)
+
+        aggregator._submit, aggregator.submit_buy = traced_submit, traced_submit_buy
+
+    @contextmanager
+    def stage(self, name: str):
+        stack = getattr(self._local, "stack", None)
+        if stack is None: # Called outside a traced message (e.g. by the order tracker)
+            yield
+            return
+        now = time.perf_counter()
+        self._local.totals[stack[-1][0]] += now - stack[-1][1]
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._local.totals[name] += now - stack.pop()[1]
+            stack[-1][1] = now
+
+    def wrap(self, name: str, function):
+        @functools.wraps(function)
+        def traced(*args, **kwargs):
+            with self.stage(name):
+                return function(*args, **kwargs)
+        return traced
+
+    def wrap_methods(self, name: str, obj, method_names):
+        for method_name in method_names:
+            setattr(obj, method_name, self.wrap(name, getattr(obj, method_name)))
+
+
+class TimedLock:
+    """Drop-in for a threading.Lock that books the time spent waiting for it to a stage."""
+    def __init__(self, lock, clock: StageClock, stage: str):
+        self._inner = lock
+        self._clock = clock
+        self._stage = stage
+
+    def acquire(self, *args, **kwargs):
+        with self._clock.stage(self._stage):
+            return self._inner.acquire(*args, **kwargs)
+
+    def release(self):
+        self._inner.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class WebhookSink:
+    """Accepts webhook posts the way Discord does, with configurable latency and a 429 rate limit."""
+    def __init__(self, latency: float, jitter: float, rate_limit: float, seed: int | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.stats = Counter()
+        self.first_throttled = None # perf_counter() of the first 429
+        self.base_url = ""
+        self._random = random.Random(seed)
+        self._tokens = float(rate_limit or 0)
+        self._tokens_at = time.monotonic()
+        self._runner = None
+        self._thread_loop = None
+
+    async def handle_post(self, request):
+        await request.read()
+        self.stats["requests"] += 1
+        if self.rate_limit:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._tokens_at) * self.rate_limit)
+            self._tokens_at = now
+            if self._tokens < 1:
+                self.stats["throttled"] += 1
+                self.first_throttled = self.first_throttled or time.perf_counter()
+                return web.json_response({"message": "You are being rate limited.", "retry_after": 1.0}, status=429)
+            self._tokens -= 1
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        return web.Response(status=204)
+
+    def start_in_thread(self) -> str:
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        async def start():
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.bind(("127.0.0.1", 0))
+            self.base_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+            app = web.Application()
+            app.router.add_post("/webhooks/{name}", self.handle_post)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.SockSite(self._runner, sock).start()
+        def serve():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(start())
+            ready.set()
+            loop.run_forever()
+        threading.Thread(target=serve, name="webhook-sink", daemon=True).start()
+        if not ready.wait(10):
+            raise RuntimeError("Webhook sink did not start")
+        self._thread_loop = loop
+        return self.base_url
+
+    def stop_thread(self):
+        if self._thread_loop is not None:
+            asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._thread_loop).result(5)
+            self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+            self._thread_loop = None
+
+
+class LoopMonitor:
+    """Samples event loop lag, executor queue depth and webhooks in flight every `interval` seconds."""
+    def __init__(self, queue_depth, interval: float = 0.05):
+        self.queue_depth = queue_depth
+        self.interval = interval
+        self.webhooks_in_flight = 0
+        self.webhook_latencies = [] # (queued at, seconds until delivered)
+        self.samples = [] # (time, loop lag, queue depth, webhooks in flight)
+
+    def wrap_webhooks(self, send_webhook):
+        """Wraps MyClient.send_webhook_helper; timing starts when a trade thread queues the webhook."""
+        async def deliver(url, payload, queued):
+            self.webhooks_in_flight += 1
+            try:
+                await send_webhook(url, payload)
+            finally:
+                self.webhooks_in_flight -= 1
+                self.webhook_latencies.append((queued, time.perf_counter() - queued))
+        def send(url, payload):
+            return deliver(url, payload, time.perf_counter())
+        return send
+
+    async def run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.samples.append((now, max(0.0, now - expected), self.queue_depth.value(), self.webhooks_in_flight))
+
+
+# --- Analysis ---
+def stage_samples(records: list) -> dict:
+    """
+    stage -> [(dispatched, seconds)] over the completed messages that went through
+    the stage (simulated trades never reach the broker, non-buys never wait to coalesce).
+    """
+    samples = defaultdict(list)
+    for record in records:
+        if "finished" not in record:
+            continue
+        samples["executor wait"].append((record["dispatched"], record["started"] - record["dispatched"]))
+        for stage in STAGES[1:]:
+            if record["stages"].get(stage):
+                samples[stage].append((record["dispatched"], record["stages"][stage]))
+    return samples
+
+def first_saturation(samples: list, baseline: float, start: float, window: float, factor: float, floor: float):
+    """
+    The first window (by dispatch time) whose median exceeds `factor` x the unloaded
+    median and the unloaded median plus `floor`. Returns (window offset, median) or None.
+    """
+    buckets = defaultdict(list)
+    for at, seconds in samples:
+        buckets[int((at - start) / window)].append(seconds)
+    limit = max(baseline * factor, baseline + floor)
+    for index in sorted(buckets):
+        median = statistics.median(buckets[index])
+        if median > limit:
+            return index * window, median
+    return None
+
+
+# --- Driver ---
+async def _send_and_wait(client, clock: StageClock, message, timeout: float = 60.0):
+    clock.dispatched(message.id)
+    await client.on_message(message)
+    deadline = time.perf_counter() + timeout
+    while "finished" not in clock.messages[message.id] and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+async def calibrate(client, clock: StageClock, script: SignalScript, rounds: int = 2) -> dict:
+    """One message at a time through every channel; the last round's stage times are the unloaded baseline."""
+    for _ in range(rounds):
+        records = []
+        for channel_id in script.handlers:
+            for _ in range(2): # An entry, then whatever the script picks next
+                message = script.next_message(channel_id)
+                await _send_and_wait(client, clock, message)
+                records.append(clock.messages.pop(message.id))
+    samples = stage_samples(records)
+    return {stage: statistics.median([s for _, s in values]) for stage, values in samples.items()}
+
+async def run_load(client, clock: StageClock, script: SignalScript, schedule: list, drain_timeout: float) -> dict:
+    start = time.perf_counter()
+    for offset, channel_id in schedule:
+        delay = start + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        message = script.next_message(channel_id)
+        clock.dispatched(message.id)
+        await client.on_message(message)
+    dispatched_at = time.perf_counter()
+    deadline = dispatched_at + drain_timeout
+    while clock.completed() < len(clock.messages) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    return {"start": start, "dispatched": dispatched_at, "end": time.perf_counter()}
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Drive the full on_message pipeline with synthetic burst load.")
+    arg_parser.add_argument("--profile", choices=("steady", "market_open", "all_at_once", "ramp"), default="market_open")
+    arg_parser.add_argument("--rate", type=float, default=5.0, help="Messages per second (steady, market_open tail, ramp peak).")
+    arg_parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load (not used by all_at_once).")
+    arg_parser.add_argument("--burst", type=int, default=10, help="Messages per channel in a burst.")
+    arg_parser.add_argument("--shared-rate", type=float, default=0.2, help="Fraction of entries that reuse another channel's contract.")
+    arg_parser.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                            help="Executor threads (default: Python's default executor size).")
+    arg_parser.add_argument("--sim", action="store_true", help="Keep global simulation mode on (no broker traffic).")
+    arg_parser.add_argument("--no-background", action="store_true", help="Don't run the order tracker and reconciler.")
+    arg_parser.add_argument("--drain-timeout", type=float, default=120.0)
+    arg_parser.add_argument("--saturation-factor", type=float, default=2.0)
+    arg_parser.add_argument("--saturation-floor", type=float, default=0.05, help="Seconds a stage must slow down by to count.")
+    arg_parser.add_argument("--seed", type=int, default=1)
+    arg_parser.add_argument("--verbose", action="store_true", help="Show the bot's own output.")
+    add_llm_arguments(arg_parser, prefix="llm")
+    add_broker_arguments(arg_parser, prefix="broker")
+    arg_parser.add_argument("--webhook-latency", type=float, default=0.1)
+    arg_parser.add_argument("--webhook-jitter", type=float, default=0.05)
+    arg_parser.add_argument("--webhook-rate-limit", type=float, default=0.0, help="Webhook posts per second before 429s (0 = unlimited).")
+    arg_parser.set_defaults(llm_latency=0.8, llm_jitter=0.6, broker_latency=0.03, broker_jitter=0.02)
+    args = arg_parser.parse_args(argv)
+
+    llm_faults = {name[len("llm_"):]: value for name, value in vars(args).items() if name.startswith("llm_")}
+    broker_faults = {name[len("broker_"):]: value for name, value in vars(args).items() if name.startswith("broker_")}
+    llm = FakeOpenAI(seed=args.seed, **llm_faults)
+    broker = FakeRobinhood(seed=args.seed)
+    webhooks = WebhookSink(args.webhook_latency, args.webhook_jitter, args.webhook_rate_limit, seed=args.seed)
+    llm_url, broker_url, webhook_url = llm.start_in_thread(), broker.start_in_thread(), webhooks.start_in_thread()
+
+    # live.py reads all of this at import time. Explicit values also keep a local .env from pointing anywhere real.
+    os.environ.update({
+        "OPENAI_API_KEY": "load-test", "OPENAI_BASE_URL": f"{llm_url}/v1",
+        "ROBINHOOD_API_BASE": broker_url, "ROBINHOOD_USER": "load-test", "ROBINHOOD_PASS": "load-test",
+        "LIVE_PLAY_WEBHOOK": f"{webhook_url}/webhooks/play", "TEST_LOGGING_WEBHOOK": f"{webhook_url}/webhooks/test",
+        "LIVE_LOGGING_WEBHOOK": f"{webhook_url}/webhooks/log", "LIVE_COMMAND_CHANNEL_ID": "1", "METRICS_PORT": "",
+        "DISCORD_USER_TOKEN": "",
+    })
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    workdir = tempfile.TemporaryDirectory()
+    original_cwd = os.getcwd()
+    os.chdir(workdir.name) # The bot's state files (positions, signal store, cursors, feedback CSV) stay out of the repo
+    output = sys.stdout if args.verbose else open(os.devnull, "w")
+    try:
+        with redirect_stdout(output):
+            import live
+            report = asyncio.run(_run(live, args, llm, broker, webhooks, broker_faults))
+    finally:
+        os.chdir(original_cwd)
+        for server in (llm, broker, webhooks):
+            server.stop_thread()
+    _print_report(args, report, llm, broker, webhooks)
+    if output is not sys.stdout:
+        output.close()
+    return 0
+
+async def _run(live, args, llm, broker, webhooks, broker_faults) -> dict:
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="trade")
+    loop.set_default_executor(executor)
+    live.SIM_MODE = args.sim
+    clock = StageClock()
+    monitor = LoopMonitor(live.EXECUTOR_QUEUE_DEPTH)
+
+    # Instrument the pipeline in place; every stage still runs its real code
+    live._blocking_handle_trade = clock.trace_message(live._blocking_handle_trade)
+    for handler in live.CHANNEL_HANDLERS.values():
+        handler.parse_message = clock.wrap("llm parse", handler.parse_message)
+    trader_methods = [name for name in dir(live.RobinhoodTrader) if not name.startswith("_")
+                      and callable(getattr(live.RobinhoodTrader, name)) and name not in ("login", "reconnect")]
+    clock.wrap_methods("broker", live.live_trader, trader_methods)
+    clock.wrap_methods("position manager", live.position_manager, ("add_position", "find_position", "clear_position", "update_position"))
+    live.position_manager._lock = TimedLock(live.position_manager._lock, clock, "position lock wait")
+    clock.trace_aggregator(live.order_aggregator)
+    clock.wrap_methods("storage", live.feedback_logger, ("log",))
+    record_execution = clock.wrap("storage", live.signal_store.record_execution)
+    executed = {} # message ID -> (action, strike) as executed
+    def checked_record_execution(message_id, channel_name, trade_obj, *args, **kwargs):
+        action = "exit" if trade_obj.get("action") == "stop" else trade_obj.get("action")
+        executed[message_id] = (action, float(trade_obj.get("strike") or 0))
+        return record_execution(message_id, channel_name, trade_obj, *args, **kwargs)
+    live.signal_store.record_execution = checked_record_execution
+    live.MyClient.send_webhook_helper = staticmethod(monitor.wrap_webhooks(live.MyClient.send_webhook_helper))
+
+    client = live.MyClient()
+    client.loop = loop # Normally set when the client connects to the gateway
+    background = [loop.create_task(monitor.run())]
+    if not args.no_background:
+        background.append(loop.create_task(live.order_tracker.run(loop, live.MyClient.log_and_print_helper)))
+        background.append(loop.create_task(live.reconciler.run(loop, live.MyClient.log_and_print_helper)))
+
+    broker.faults.update(broker_faults) # Applied after the login at import, so a setup failure never skews the run
+    script = SignalScript(live.CHANNEL_HANDLERS, random.Random(args.seed), args.shared_rate)
+    baseline = await calibrate(client, clock, script)
+    calibration_lag = [lag for _, lag, _, _ in monitor.samples]
+    monitor.samples.clear()
+    monitor.webhook_latencies.clear()
+    expected_before = set(script.expected)
+    for server in (llm, broker, webhooks):
+        server.stats.clear()
+
+    schedule = build_schedule(args.profile, list(live.CHANNEL_HANDLERS), args.rate, args.duration, args.burst,
+                              random.Random(args.seed))
+    timing = await run_load(client, clock, script, schedule, args.drain_timeout)
+    await asyncio.sleep(1.0) # Let the last webhooks land
+    for task in background:
+        task.cancel()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    mismatches = [message_id for message_id, posted in script.expected.items()
+                  if message_id not in expected_before and message_id in executed and executed[message_id] != posted]
+    return {
+        "timing": timing, "baseline": baseline, "records": list(clock.messages.values()),
+        "loop_samples": list(monitor.samples), "webhook_latencies": list(monitor.webhook_latencies),
+        "calibration_lag": statistics.median(calibration_lag) if calibration_lag else 0.0,
+        "mismatches": len(mismatches), "executed": sum(1 for m in executed if m not in expected_before),
+        "workers": args.workers, "breakers": (live.openai_breaker.status_line(), live.robinhood_breaker.status_line()),
+        "webhook_failures": live.WEBHOOK_FAILURES.value(reason="exception") + live.WEBHOOK_FAILURES.value(reason="http_429"),
+    }
+
+def _print_report(args, report: dict, llm, broker, webhooks):
+    timing, records, baseline = report["timing"], report["records"], report["baseline"]
+    start, dispatch_span = timing["start"], max(timing["dispatched"] - timing["start"], 1e-9)
+    finished = [r for r in records if "finished" in r]
+    end_to_end = [r["finished"] - r["dispatched"] for r in finished]
+    last_finish = max((r["finished"] for r in finished), default=timing["end"])
+    print(f"\n⚙️ Profile {args.profile}: {len(records)} messages | {report['workers']} executor workers | "
+          f"LLM {args.llm_latency}s+{args.llm_jitter}s | broker {args.broker_latency}s+{args.broker_jitter}s | "
+          f"webhooks {args.webhook_latency}s+{args.webhook_jitter}s | {'simulated' if args.sim else 'live'} trading")
+    print(f"Throughput: {len(records) / dispatch_span:.1f} msg/s offered over {dispatch_span:.1f}s, "
+          f"{len(finished) / max(last_finish - start, 1e-9):.1f} msg/s completed "
+          f"({len(finished)}/{len(records)} done, drained {max(last_finish - timing['dispatched'], 0):.1f}s after the last message)")
+
+    loop_samples = report["loop_samples"]
+    depths = [(at, depth) for at, _, depth, _ in loop_samples if at <= timing["dispatched"]]
+    if depths:
+        growth = (depths[-1][1] - depths[0][1]) / max(depths[-1][0] - depths[0][0], 1e-9)
+        print(f"Executor queue: peak {max(d for _, d in depths):.0f} in flight, {growth:+.1f}/s while messages arrived")
+    if end_to_end:
+        print(f"End-to-end (on_message -> trade done) ms: p50 {_ms(_percentile(end_to_end, 0.5))} | "
+              f"p95 {_ms(_percentile(end_to_end, 0.95))} | p99 {_ms(_percentile(end_to_end, 0.99))} | max {_ms(max(end_to_end))}")
+
+    # Per-stage table and saturation, by dispatch-time windows
+    window = max(1.0, (max(last_finish, timing["dispatched"]) - start) / 15)
+    samples = stage_samples(records)
+    samples["webhook delivery"] = report["webhook_latencies"]
+    samples["event loop lag"] = [(at, lag) for at, lag, _, _ in loop_samples]
+    baseline = {**baseline, "event loop lag": report["calibration_lag"]}
+    baseline.setdefault("webhook delivery", args.webhook_latency + args.webhook_jitter / 2)
+    saturated = []
+    print(f"\n{'stage':<22} {'unloaded':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'x p50':>7}  saturated at")
+    for stage in (*STAGES, "webhook delivery", "event loop lag"):
+        values = [seconds for _, seconds in samples.get(stage, [])]
+        if not values:
+            continue
+        reference = baseline.get(stage, 0.0)
+        p50 = _percentile(values, 0.5)
+        first = first_saturation(samples[stage], reference, start, window, args.saturation_factor, args.saturation_floor)
+        if first:
+            saturated.append((first[0], -(first[1] / max(reference, 1e-3)), stage, first[1], reference))
+        ratio = f"{p50 / reference:.1f}" if reference >= 1e-3 else "-"
+        print(f"{stage:<22} {_ms(reference):>9} {_ms(p50):>8} {_ms(_percentile(values, 0.95)):>8} "
+              f"{_ms(_percentile(values, 0.99)):>8} {ratio:>7}  {f't+{first[0]:.0f}s' if first else '-'}")
+
+    if webhooks.first_throttled and webhooks.first_throttled >= start:
+        # A 429 fails fast, so it shows up as lost alerts rather than as slower delivery
+        saturated.append((webhooks.first_throttled - start, 0.0, "webhook delivery (429 rate limit)", 0.0, 0.0))
+
+    print(f"\n{'t (s)':>6} {'sent':>5} {'done':>5} {'queue':>6} {'loop lag ms':>12} {'webhooks':>9}")
+    for index in range(int((max(last_finish, timing['dispatched']) - start) / window) + 1):
+        low, high = start + index * window, start + (index + 1) * window
+        window_samples = [s for s in loop_samples if low <= s[0] < high]
+        print(f"{index * window:>6.0f} {sum(1 for r in records if low <= r['dispatched'] < high):>5} "
+              f"{sum(1 for r in finished if low <= r['finished'] < high):>5} "
+              f"{max((s[2] for s in window_samples), default=0):>6.0f} "
+              f"{_ms(max((s[1] for s in window_samples), default=0)):>12} "
+              f"{max((s[3] for s in window_samples), default=0):>9}")
+
+    print(f"\nLLM requests: {llm.stats['requests']} ({llm.stats['throttled']} throttled, {llm.stats['errors_injected']} failed) | "
+          f"broker requests: {sum(v for k, v in broker.stats.items() if ' /' in k)} | "
+          f"webhooks: {webhooks.stats['requests']} ({webhooks.stats['throttled']} throttled, {report['webhook_failures']:.0f} failures)")
+    print(f"Circuit breakers: {report['breakers'][0]}; {report['breakers'][1]}")
+    if report["mismatches"]:
+        print(f"⚠️ {report['mismatches']}/{report['executed']} executed signals did not match the message that was posted "
+              f"(parser state shared between concurrent messages of the same channel)")
+    if saturated:
+        offset, _, stage, median, reference = min(saturated)
+        detail = f"median {_ms(median)} ms vs {_ms(reference)} ms unloaded" if median else f"{webhooks.stats['throttled']} posts rejected"
+        print(f"🔥 First stage to saturate: {stage} at t+{offset:.0f}s ({detail})")
+    else:
+        print("✅ No stage saturated under this load.")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline microbenchmarks for the bot's hot-path functions, gated against a stored baseline.
+No network, Discord, OpenAI or Robinhood access is needed.
+
+Run from the repo root:
+    python -m benchmarks.run_benchmarks                   # compare against benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --save-baseline   # record the current numbers as the baseline
+    python -m benchmarks.run_benchmarks --threshold 0.5 -k position
+
+Exits non-zero when any benchmark is slower than its baseline by more than the threshold.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_THRESHOLD = 0.25 # Fail when more than 25% slower than the baseline
+TRACKED_POSITIONS = 5000 # Positions pre-loaded into the PositionManager benchmarks
+
+BENCHMARKS = {} # name -> (setup function, calls per round)
+
+def benchmark(name: str, number: int):
+    """
+    Registers a benchmark. The decorated setup function receives the total number
+    of calls that will be made and a scratch directory, and returns the
+    zero-argument callable to time.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+# --- Sample inputs ---
+SAMPLE_AI_OUTPUT = {
+    "Action": "buy", "Ticker": "$spx", "Strike": 6425, "Option Type": "call",
+    "Entry Price": 2.35, "Expiration": "2026-10-19", "Size": "half",
+}
+
+SAMPLE_MESSAGES = {
+    "Ryan": ("ENTRY", "$SPX 6425c @ 2.35 adding a small starter here"),
+    "Eva": ("Open", "SPY 580P 10/24 @ 1.12"),
+    "Will": "Starter $TSLA 250c 10/24 @ 3.10, small size",
+    "Sean": "Bought some NVDA 140 calls exp 10/25 at 1.77",
+    "FiFi": "in $AMD 160c 10/24 @ .95 lotto",
+}
+
+SAMPLE_ENTRIES = {
+    "Ryan": {"action": "buy", "ticker": "SPX", "strike": 6425, "type": "call", "price": 2.35, "expiration": "2026-10-19"},
+    "Eva": {"action": "buy", "ticker": "SPY", "strike": 580, "type": "P", "price": 1.12},
+    "Will": {"action": "exit", "ticker": "TSLA", "strike": 250, "type": "call", "price": 3.10, "size": "starter"},
+    "Sean": {"action": "trim", "ticker": "NVDA", "strike": 140, "type": "call", "price": 1.77},
+    "FiFi": {"action": "buy", "ticker": "AMD", "strike": 160, "type": "call", "price": 0.95, "size": "lotto"},
+}
+
+def _parsers() -> dict:
+    """One parser per channel personality, built the way live.py builds them (without an OpenAI client)."""
+    from config import CHANNELS_CONFIG
+    from channels.ryan import RyanParser
+    from channels.eva import EvaParser
+    from channels.will import WillParser
+    from channels.sean import SeanParser
+    from channels.fifi import FiFiParser
+    classes = {"Ryan": RyanParser, "Eva": EvaParser, "Will": WillParser, "Sean": SeanParser, "FiFi": FiFiParser}
+    parsers = {}
+    for channel_id, config in CHANNELS_CONFIG.items():
+        if config["name"] in classes and config["name"] not in parsers:
+            parsers[config["name"]] = classes[config["name"]](None, channel_id, config)
+    return parsers
+
+def _tracked_positions_file(directory: str, count: int) -> str:
+    """Writes a tracking file with `count` positions spread over the live channels, as PositionManager persists them."""
+    from config import CHANNELS_CONFIG
+    channel_ids = [str(channel_id) for channel_id in CHANNELS_CONFIG]
+    positions = {}
+    for i in range(count):
+        positions.setdefault(channel_ids[i % len(channel_ids)], []).append({
+            "trade_id": f"seed-{i}", "symbol": "SPX", "strike": 5000 + i, "type": "call",
+            "expiration": "2026-10-19", "purchase_price": 1.5, "size": "full",
+        })
+    path = os.path.join(directory, f"tracked_{count}_{time.perf_counter_ns()}.json")
+    with open(path, "w") as f:
+        json.dump(positions, f, indent=2)
+    return path
+
+# --- Benchmarks ---
+@benchmark("normalize_keys", number=50000)
+def bench_normalize_keys(total_calls, workdir):
+    from channels.trade_signal import normalize_keys
+    return lambda: normalize_keys(SAMPLE_AI_OUTPUT)
+
+def _register_parser_benchmarks():
+    for name in SAMPLE_MESSAGES:
+        def build_prompt_setup(total_calls, workdir, name=name):
+            parser = _parsers()[name]
+            parser._current_message_meta = SAMPLE_MESSAGES[name]
+            return parser.build_prompt
+
+        def normalize_entry_setup(total_calls, workdir, name=name):
+            parser = _parsers()[name]
+            parser._current_message_meta = SAMPLE_MESSAGES[name]
+            entry = SAMPLE_ENTRIES[name]
+            return lambda: parser._normalize_entry(dict(entry))
+
+        BENCHMARKS[f"parser.{name}.build_prompt"] = (build_prompt_setup, 200000)
+        BENCHMARKS[f"parser.{name}._normalize_entry"] = (normalize_entry_setup, 100000)
+
+_register_parser_benchmarks()
+
+@benchmark(f"position_manager.add_position[{TRACKED_POSITIONS}]", number=20)
+def bench_add_position(total_calls, workdir):
+    from config import CHANNELS_CONFIG
+    from position_manager import PositionManager
+    manager = PositionManager(_tracked_positions_file(workdir, TRACKED_POSITIONS))
+    channel_id = next(iter(CHANNELS_CONFIG))
+    trade = {"ticker": "SPX", "strike": 6425, "type": "call", "expiration": "2026-10-19", "price": 2.35, "size": "half"}
+    return lambda: manager.add_position(channel_id, trade)
+
+@benchmark(f"position_manager.find_position[{TRACKED_POSITIONS}]", number=2000)
+def bench_find_position(total_calls, workdir):
+    from config import CHANNELS_CONFIG
+    from position_manager import PositionManager
+    manager = PositionManager(_tracked_positions_file(workdir, TRACKED_POSITIONS))
+    channel_id = next(iter(CHANNELS_CONFIG))
+    # The oldest position in the channel: the worst case for the newest-first scan
+    trade = {"ticker": "SPX", "strike": 5000, "type": "call", "expiration": "2026-10-19"}
+    return lambda: manager.find_position(channel_id, trade)
+
+@benchmark(f"position_manager.clear_position[{TRACKED_POSITIONS}]", number=20)
+def bench_clear_position(total_calls, workdir):
+    from config import CHANNELS_CONFIG
+    from position_manager import PositionManager
+    channel_count = len(CHANNELS_CONFIG)
+    # Extra positions so every timed call clears a different trade and the book stays near TRACKED_POSITIONS
+    manager = PositionManager(_tracked_positions_file(workdir, TRACKED_POSITIONS + total_calls * channel_count))
+    channel_id = next(iter(CHANNELS_CONFIG))
+    trade_ids = iter(f"seed-{i}" for i in range(0, total_calls * channel_count, channel_count))
+    return lambda: manager.clear_position(channel_id, next(trade_ids))
+
+@benchmark("feedback_logger.log", number=2000)
+def bench_feedback_log(total_calls, workdir):
+    from feedback_logger import FeedbackLogger
+    logger = FeedbackLogger(os.path.join(workdir, "parsing_feedback_bench.csv"))
+    message = f"{SAMPLE_MESSAGES['Ryan'][0]}: {SAMPLE_MESSAGES['Ryan'][1]}"
+    parsed = [SAMPLE_ENTRIES["Ryan"]]
+    return lambda: logger.log("Ryan", message, parsed)
+
+@benchmark("simulated_trader.buy_sell_cycle", number=2000)
+def bench_sim_cycle(total_calls, workdir):
+    from trader import SimulatedTrader
+    trader = SimulatedTrader()
+    def cycle():
+        trader.place_option_buy_order("SPX", 6425, "2026-10-19", "call", 2, 2.35)
+        trader.place_option_market_sell_order("SPX", 6425, "2026-10-19", "call", 2)
+    return cycle
+
+# --- Runner ---
+def run_benchmark(name: str, repeat: int, workdir: str) -> float:
+    """Returns the best seconds per call over `repeat` rounds (like timeit, the minimum is the least noisy estimate)."""
+    setup, number = BENCHMARKS[name]
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        fn = setup(number * repeat + 1, workdir)
+        fn() # Warm-up call (imports, caches, file handles)
+        rounds = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable() # As timeit does, keep collector pauses out of the measurement
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                rounds.append((time.perf_counter() - start) / number)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return min(rounds)
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds * 1e6:.2f} µs"
+
+def main(argv=None) -> int:
+    arg_parser = argparse.ArgumentParser(description="Run the hot-path microbenchmarks.")
+    arg_parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline.")
+    arg_parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file to compare against.")
+    arg_parser.add_argument("--threshold", type=float,
+                            default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", DEFAULT_THRESHOLD)),
+                            help="Allowed slowdown as a fraction of the baseline (default: %(default)s).")
+    arg_parser.add_argument("--repeat", type=int, default=7, help="Rounds per benchmark; the best round is reported.")
+    arg_parser.add_argument("-k", dest="filter", default=None, help="Only run benchmarks whose name contains this text.")
+    args = arg_parser.parse_args(argv)
+
+    if str(REPO_ROOT) not in sys.path:
+        sys.path.insert(0, str(REPO_ROOT))
+    baseline = {}
+    if args.baseline.exists() and not args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()).get("results", {})
+
+    names = [name for name in BENCHMARKS if not args.filter or args.filter in name]
+    results, regressions = {}, []
+    print(f"{'benchmark':<52} {'per call':>12} {'baseline':>12} {'change':>9}")
+    with tempfile.TemporaryDirectory() as workdir:
+        original_cwd = os.getcwd()
+        os.chdir(workdir) # Keep module-level side effects (e.g. the global feedback CSV) out of the repo
+        try:
+            for name in names:
+                results[name] = run_benchmark(name, args.repeat, workdir)
+                reference = baseline.get(name)
+                if reference:
+                    change = results[name] / reference - 1
+                    flag = " ❌" if change > args.threshold else ""
+                    if flag:
+                        regressions.append(name)
+                    print(f"{name:<52} {_format_time(results[name]):>12} {_format_time(reference):>12} {change:>+8.1%}{flag}")
+                else:
+                    print(f"{name:<52} {_format_time(results[name]):>12} {'-':>12} {'new':>9}")
+        finally:
+            os.chdir(original_cwd)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "results": results,
+        }, indent=2) + "\n")
+        print(f"✅ Saved baseline for {len(results)} benchmarks to {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"❌ {len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print(f"✅ No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
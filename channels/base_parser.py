@@ -1,8 +1,119 @@
 # channels/base_parser.py
 import json
+import os
+import re
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from threading import Event, Lock
 from datetime import datetime, timezone
-from openai import OpenAI
+from openai import OpenAI, APITimeoutError, APIConnectionError, RateLimitError, InternalServerError
+from metrics import LLM_LATENCY, PARSE_OUTCOMES, HEDGED_REQUESTS
+from circuit_breaker import openai_breaker
+from .trade_signal import TradeSignal, TRADE_SIGNAL_RESPONSE_FORMAT, STRUCTURED_OUTPUT_INSTRUCTIONS
+
+DEFAULT_MODEL = "gpt-3.5-turbo"
+# Strict json_schema outputs need a model that supports structured outputs.
+DEFAULT_STRUCTURED_MODEL = "gpt-4o-mini"
+# Per-request timeout so a hung call cannot hold a trade worker indefinitely (overridable per channel via "timeout").
+DEFAULT_TIMEOUT_SECONDS = 15.0
+# Errors that mean OpenAI is unavailable and count toward the circuit breaker. Anything else
+# (e.g. a 400 for a bad request) is our problem, not an outage, and must not trip it.
+_BREAKER_FAILURES = (APITimeoutError, APIConnectionError, RateLimitError, InternalServerError)
+
+# --- Hedging defaults (overridable per channel via the "hedge" config block) ---
+HEDGE_DEFAULTS = {
+    "enabled": False,
+    "percentile": 0.90,          # Hedge once the primary exceeds this latency percentile
+    "alternate_model": None,     # Optional faster model for the duplicate request
+    "max_extra_fraction": 0.10,  # Hedges may add at most this fraction of extra requests
+    "min_budget_seconds": 1.0,   # Never hedge sooner than this
+    "default_budget_seconds": 2.5, # Budget used until enough latency samples exist
+    "min_samples": 20,
+}
+
+# Matches a completed string value for one of the fields needed for early dispatch.
+_EARLY_FIELD_PATTERN = re.compile(r'"(action|ticker)"\s*:\s*"([^"]*)"')
+_ACTION_KEY_PATTERN = re.compile(r'"action"\s*:')
+
+def _first_signal_text(partial_json: str) -> str | None:
+    """
+    The first signal object (the one holding the first "action" key) of a partially received
+    reply, cut at its closing brace once that has arrived, or None before any action is seen.
+    """
+    action_key = _ACTION_KEY_PATTERN.search(partial_json)
+    if not action_key:
+        return None
+    opened = [] # Start offsets of the objects still open at the current position
+    signal_start = None
+    in_string = escaped = False
+    for index, char in enumerate(partial_json):
+        if index == action_key.start():
+            signal_start = opened[-1] if opened else 0
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            opened.append(index)
+        elif char == "}" and opened:
+            if opened.pop() == signal_start:
+                return partial_json[signal_start:index + 1]
+    return partial_json[signal_start:]
+
+def _scan_early_fields(partial_json: str) -> dict | None:
+    """
+    Returns the first signal's action and ticker from a partially received JSON reply,
+    or None until both values have been fully streamed. Only the first signal object is
+    scanned, so a first signal without a ticker never borrows the next signal's.
+    """
+    signal_text = _first_signal_text(partial_json)
+    if signal_text is None:
+        return None
+    found = {}
+    for match in _EARLY_FIELD_PATTERN.finditer(signal_text):
+        found.setdefault(match.group(1), match.group(2))
+        if len(found) == 2:
+            return found
+    return None
+
+# Shared pool for hedged requests. Hedged requests are streamed so the loser can be
+# aborted mid-flight by closing its stream, which frees its worker and stops its tokens.
+# Sized for a primary and a hedge per worker of the event loop's default executor (which
+# runs the trade threads), so one channel's primaries never queue behind another's.
+_HEDGE_EXECUTOR = ThreadPoolExecutor(max_workers=2 * min(32, (os.cpu_count() or 1) + 4), thread_name_prefix="llm-hedge")
+
+class _HedgedRequest:
+    """Lets the winning hedged request abort the loser by closing its stream from another thread."""
+    def __init__(self):
+        self.cancelled = Event()
+        self._stream = None
+        self._lock = Lock()
+
+    def attach(self, stream):
+        with self._lock:
+            self._stream = stream
+        if self.cancelled.is_set():
+            self.close()
+
+    def cancel(self):
+        self.cancelled.set()
+        self.close()
+
+    def close(self):
+        with self._lock:
+            stream, self._stream = self._stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
 
 class BaseParser(ABC):
     """
@@ -10,10 +121,21 @@ class BaseParser(ABC):
     It handles the common logic of calling the OpenAI API, parsing JSON,
     and basic error handling, leaving channel-specific logic to subclasses.
     """
-    def __init__(self, openai_client: OpenAI, channel_id: int, name: str):
+    def __init__(self, openai_client: OpenAI, channel_id: int, name: str, config: dict | None = None):
         self.client = openai_client
         self.channel_id = channel_id
         self.name = name
+        self.config = config or {}
+        # Channels opt in to schema-constrained output one at a time via CHANNELS_CONFIG.
+        self.structured_output = self.config.get("structured_output", False)
+        self.model = self.config.get("model") or (DEFAULT_STRUCTURED_MODEL if self.structured_output else DEFAULT_MODEL)
+        self.streaming = self.config.get("streaming", False)
+        self.timeout = self.config.get("timeout", DEFAULT_TIMEOUT_SECONDS)
+        self.hedge_config = {**HEDGE_DEFAULTS, **self.config.get("hedge", {})}
+        self._latency_samples = deque(maxlen=200)
+        self._hedge_lock = Lock()
+        self._requests_sent = 0
+        self._hedges_sent = 0
         self._current_message_meta = None
 
     @abstractmethod
@@ -24,19 +146,68 @@ class BaseParser(ABC):
         """
         pass
 
-    def _call_openai(self, prompt: str) -> dict | list | None:
-        """Makes the API call to OpenAI and parses the JSON response."""
+    def _call_openai(self, prompt: str, on_partial=None) -> dict | list | None:
+        """
+        Makes the API call to OpenAI. Streaming channels parse the reply as it arrives
+        (hedging does not apply to them); otherwise the request is hedged if enabled.
+        """
+        if self.streaming:
+            return self._call_openai_streaming(prompt, on_partial)
+        if self.hedge_config["enabled"]:
+            return self._call_openai_hedged(prompt)
+        return self._request_completion(prompt, self.model)
+
+    def _request_kwargs(self, prompt: str, model: str) -> dict:
+        """
+        Builds the chat completion arguments. In structured output mode the reply is
+        constrained to the TradeSignal JSON schema.
+        """
+        if self.structured_output:
+            return {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt + STRUCTURED_OUTPUT_INSTRUCTIONS}],
+                "temperature": 0,
+                "response_format": TRADE_SIGNAL_RESPONSE_FORMAT,
+                "timeout": self.timeout,
+            }
+        return {"model": model, "messages": [{"role": "user", "content": prompt}], "temperature": 0, "timeout": self.timeout}
+
+    def _decode_content(self, content: str | None) -> dict | list | None:
+        """
+        Parses the model's reply. Structured replies are guaranteed to match the schema,
+        so they are converted straight into canonical trade dicts without any key repair.
+        """
+        content = (content or "").strip()
+        if not content:
+            print(f"❌ [{self.name}] Parsing failed: Empty response from OpenAI")
+            return None
+        data = json.loads(content)
+        if self.structured_output:
+            return [TradeSignal.from_dict(signal).to_dict() for signal in data["signals"]]
+        return data
+
+    def _request_completion(self, prompt: str, model: str) -> dict | list | None:
+        """Makes a single API call to OpenAI and parses the JSON response."""
+        if not openai_breaker.allow_request():
+            print(f"⛔ [{self.name}] OpenAI circuit open, skipping request")
+            return None
+        content = None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-            content = response.choices[0].message.content.strip()
-            if not content:
-                print(f"❌ [{self.name}] Parsing failed: Empty response from OpenAI")
+            try:
+                response = self.client.chat.completions.create(**self._request_kwargs(prompt, model))
+            except _BREAKER_FAILURES:
+                openai_breaker.record_failure()
+                raise
+            except Exception:
+                openai_breaker.record_success() # OpenAI answered; a half-open probe still has to report back
+                raise
+            openai_breaker.record_success()
+            message = response.choices[0].message
+            if getattr(message, "refusal", None):
+                print(f"❌ [{self.name}] Parsing failed: OpenAI refused the request: {message.refusal}")
                 return None
-            return json.loads(content)
+            content = message.content
+            return self._decode_content(content)
         except json.JSONDecodeError as e:
             print(f"❌ [{self.name}] JSON parse error: {e}\nRaw content: {content}")
             return None
@@ -44,15 +215,195 @@ class BaseParser(ABC):
             print(f"❌ [{self.name}] OpenAI API error: {e}")
             return None
 
-    def parse_message(self, message_meta) -> list[dict]:
+    def _request_cancellable(self, prompt: str, model: str, request: _HedgedRequest) -> dict | list | None:
+        """
+        Streams a single API call so it can be aborted: `request.cancel()` closes the
+        stream, which drops the connection and stops generation, and None is returned.
+        """
+        if request.cancelled.is_set():
+            return None
+        if not openai_breaker.allow_request():
+            print(f"⛔ [{self.name}] OpenAI circuit open, skipping request")
+            return None
+        content = ""
+        refusal = ""
+        try:
+            try:
+                stream = self.client.chat.completions.create(**self._request_kwargs(prompt, model), stream=True)
+                request.attach(stream)
+                for chunk in stream:
+                    if request.cancelled.is_set():
+                        break
+                    delta = chunk.choices[0].delta if chunk.choices else None
+                    if delta is None:
+                        continue
+                    content += delta.content or ""
+                    refusal += getattr(delta, "refusal", None) or ""
+            except Exception:
+                if request.cancelled.is_set():
+                    return None # Closed by the winner mid-read; not an OpenAI failure
+                raise
+            finally:
+                request.close()
+        except _BREAKER_FAILURES as e:
+            openai_breaker.record_failure()
+            print(f"❌ [{self.name}] OpenAI API error: {e}")
+            return None
+        except Exception as e:
+            openai_breaker.record_success() # OpenAI answered; a half-open probe still has to report back
+            print(f"❌ [{self.name}] OpenAI API error: {e}")
+            return None
+        openai_breaker.record_success()
+        if request.cancelled.is_set():
+            return None
+        if refusal:
+            print(f"❌ [{self.name}] Parsing failed: OpenAI refused the request: {refusal}")
+            return None
+        try:
+            return self._decode_content(content)
+        except json.JSONDecodeError as e:
+            print(f"❌ [{self.name}] JSON parse error: {e}\nRaw content: {content}")
+            return None
+        except Exception as e:
+            print(f"❌ [{self.name}] OpenAI API error: {e}")
+            return None
+
+    def _call_openai_streaming(self, prompt: str, on_partial=None) -> dict | list | None:
+        """
+        Streams the reply and scans it as tokens arrive. Once the first signal's
+        `action` and `ticker` are known, `on_partial` is called with an early partial
+        signal so the caller can start resolving the position while the rest of
+        the reply is still arriving. The full result is returned as usual.
+        """
+        if not openai_breaker.allow_request():
+            print(f"⛔ [{self.name}] OpenAI circuit open, skipping request")
+            return None
+        content = ""
+        emitted = on_partial is None
+        try:
+            try:
+                stream = self.client.chat.completions.create(**self._request_kwargs(prompt, self.model), stream=True)
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    content += delta
+                    if not emitted:
+                        early_fields = _scan_early_fields(content)
+                        if early_fields:
+                            emitted = True
+                            self._emit_partial(early_fields, on_partial)
+            except _BREAKER_FAILURES:
+                openai_breaker.record_failure()
+                raise
+            except Exception:
+                openai_breaker.record_success() # OpenAI answered; a half-open probe still has to report back
+                raise
+            openai_breaker.record_success()
+            return self._decode_content(content)
+        except json.JSONDecodeError as e:
+            print(f"❌ [{self.name}] JSON parse error: {e}\nRaw content: {content}")
+            return None
+        except Exception as e:
+            print(f"❌ [{self.name}] OpenAI streaming error: {e}")
+            return None
+
+    def _emit_partial(self, early_fields: dict, on_partial):
+        action = early_fields["action"].lower()
+        if action == "null":
+            return
+        partial = {
+            "action": action,
+            "ticker": early_fields["ticker"].replace('$', '').upper(),
+            "channel_id": self.channel_id,
+        }
+        try:
+            on_partial(partial)
+        except Exception as e:
+            print(f"❌ [{self.name}] Early dispatch callback failed: {e}")
+
+    def _hedge_budget(self) -> float:
+        """Seconds to wait for the primary request: the channel's latency percentile."""
+        cfg = self.hedge_config
+        samples = sorted(self._latency_samples)
+        if len(samples) < cfg["min_samples"]:
+            return cfg["default_budget_seconds"]
+        index = min(len(samples) - 1, int(cfg["percentile"] * (len(samples) - 1)))
+        return max(cfg["min_budget_seconds"], samples[index])
+
+    def _record_latency(self, future, started: float):
+        """Only completed replies are sampled: instant Nones (e.g. an open breaker) would drag the budget down."""
+        if not future.cancelled() and future.result() is not None:
+            self._latency_samples.append(time.perf_counter() - started)
+
+    def _reserve_hedge(self) -> bool:
+        """
+        Enforces the extra-spend cap: hedges stay under max_extra_fraction of all requests.
+        The budget is seeded with one hedge so a fresh process can hedge its first slow request.
+        """
+        with self._hedge_lock:
+            if self._hedges_sent + 1 <= max(1.0, self.hedge_config["max_extra_fraction"] * self._requests_sent):
+                self._hedges_sent += 1
+                return True
+            return False
+
+    def _call_openai_hedged(self, prompt: str) -> dict | list | None:
+        """
+        Sends the request and, if it has not returned within the latency budget,
+        sends a duplicate (optionally to a faster model). The first valid result wins
+        and the other request is aborted.
+        """
+        with self._hedge_lock:
+            self._requests_sent += 1
+        started = time.perf_counter()
+        requests = {"primary": _HedgedRequest(), "hedge": _HedgedRequest()}
+        primary = _HEDGE_EXECUTOR.submit(self._request_cancellable, prompt, self.model, requests["primary"])
+        primary.add_done_callback(lambda future: self._record_latency(future, started))
+
+        try:
+            return primary.result(timeout=self._hedge_budget())
+        except FuturesTimeout:
+            pass
+
+        if not self._reserve_hedge():
+            HEDGED_REQUESTS.inc(channel=self.name, winner="capped")
+            return primary.result()
+
+        hedge_model = self.hedge_config["alternate_model"] or self.model
+        print(f"⏱️ [{self.name}] Primary request slow, sending hedge to {hedge_model}")
+        hedge = _HEDGE_EXECUTOR.submit(self._request_cancellable, prompt, hedge_model, requests["hedge"])
+        pending = {primary: "primary", hedge: "hedge"}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                result = future.result()
+                if result is not None:
+                    for loser in pending.values():
+                        requests[loser].cancel()
+                    HEDGED_REQUESTS.inc(channel=self.name, winner=winner)
+                    return result
+        HEDGED_REQUESTS.inc(channel=self.name, winner="none")
+        return None
+
+    def _record_outcome(self, outcome: str, on_outcome):
+        PARSE_OUTCOMES.inc(channel=self.name, outcome=outcome)
+        if on_outcome:
+            on_outcome(outcome)
+
+    def parse_message(self, message_meta, on_partial=None, on_outcome=None) -> list[dict]:
         """
         Main parsing method to be called by the bot.
         It orchestrates the prompt building, API call, and normalization.
+        For streaming channels, `on_partial` receives an early partial signal.
+        `on_outcome` receives the parse outcome: "signal", "no_signal" or "error".
         """
         self._current_message_meta = message_meta
         prompt = self.build_prompt()
-        parsed_data = self._call_openai(prompt)
+        with LLM_LATENCY.time(channel=self.name):
+            parsed_data = self._call_openai(prompt, on_partial)
         if parsed_data is None:
+            self._record_outcome("error", on_outcome)
             return []
 
         results = parsed_data if isinstance(parsed_data, list) else [parsed_data]
@@ -71,6 +422,7 @@ class BaseParser(ABC):
             entry = self._normalize_entry(entry)
             normalized_results.append(entry)
 
+        self._record_outcome("signal" if normalized_results else "no_signal", on_outcome)
         return normalized_results
 
     def _normalize_entry(self, entry: dict) -> dict:
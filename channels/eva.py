@@ -4,7 +4,7 @@ from .base_parser import BaseParser
 
 class EvaParser(BaseParser):
     def __init__(self, openai_client, channel_id, config):
-        super().__init__(openai_client, channel_id, config["name"])
+        super().__init__(openai_client, channel_id, config["name"], config)
 
     def build_prompt(self) -> str:
         title, description = self._current_message_meta
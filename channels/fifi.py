@@ -3,7 +3,7 @@ from .base_parser import BaseParser
 
 class FiFiParser(BaseParser):
     def __init__(self, openai_client, channel_id, config):
-        super().__init__(openai_client, channel_id, config["name"])
+        super().__init__(openai_client, channel_id, config["name"], config)
 
     def build_prompt(self) -> str:
         message_text = self._current_message_meta[0] if isinstance(self._current_message_meta, tuple) else self._current_message_meta
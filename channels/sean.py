@@ -8,7 +8,7 @@ class SeanParser(BaseParser):
     # The __init__ method now receives the config directly
     def __init__(self, openai_client, channel_id, config):
         # It no longer needs to look it up itself
-        super().__init__(openai_client, channel_id, config["name"])
+        super().__init__(openai_client, channel_id, config["name"], config)
 
     def build_prompt(self) -> str:
         message_text = f"{self._current_message_meta[0]}\n{self._current_message_meta[1]}" if isinstance(self._current_message_meta, tuple) else self._current_message_meta
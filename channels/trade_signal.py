@@ -0,0 +1,112 @@
+# channels/trade_signal.py
+from dataclasses import dataclass, fields
+
+# --- Strict JSON schema for OpenAI structured outputs ---
+# Strict mode requires every property to be listed in "required" and forbids
+# extra keys, so optional fields are expressed as nullable types instead.
+TRADE_SIGNAL_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "required": ["action", "ticker", "strike", "type", "price", "expiration", "size"],
+    "properties": {
+        "action": {"type": "string", "enum": ["buy", "trim", "exit", "stop", "null"]},
+        "ticker": {"type": ["string", "null"], "description": "Underlying symbol without '$', e.g. SPX"},
+        "strike": {"type": ["number", "null"], "description": "Option strike price, never the contract price"},
+        "type": {"type": ["string", "null"], "enum": ["call", "put", None]},
+        "price": {
+            "anyOf": [{"type": "number"}, {"type": "string", "enum": ["BE"]}, {"type": "null"}],
+            "description": "Contract price, or \"BE\" for a breakeven exit",
+        },
+        "expiration": {"type": ["string", "null"], "description": "Expiration date in YYYY-MM-DD format"},
+        "size": {"type": ["string", "null"], "enum": ["full", "half", "small", "lotto", None]},
+    },
+}
+
+TRADE_SIGNAL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "trade_signals",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "additionalProperties": False,
+            "required": ["signals"],
+            "properties": {"signals": {"type": "array", "items": TRADE_SIGNAL_SCHEMA}},
+        },
+    },
+}
+
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+--- OUTPUT SCHEMA ---
+Return every trade action as an element of the `signals` array. Use null for any field
+that is not explicitly present in the message. If the message is not actionable,
+return a single signal with "action": "null".
+"""
+
+
+@dataclass(slots=True)
+class TradeSignal:
+    """
+    A typed, compact representation of one parsed trade action.
+    Produced by the structured output mode, whose schema already guarantees
+    canonical keys, so no key repair pass is needed downstream.
+    """
+    action: str
+    ticker: str | None = None
+    strike: float | None = None
+    type: str | None = None
+    price: float | str | None = None
+    expiration: str | None = None
+    size: str | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TradeSignal":
+        ticker = data.get("ticker")
+        if isinstance(ticker, str):
+            ticker = ticker.replace('$', '').upper()
+        return cls(
+            action=data.get("action") or "null",
+            ticker=ticker,
+            strike=data.get("strike"),
+            type=data.get("type"),
+            price=data.get("price"),
+            expiration=data.get("expiration"),
+            size=data.get("size"),
+        )
+
+    def to_dict(self) -> dict:
+        """Returns the signal as a trade dict, omitting fields that were not present."""
+        return {name: value for name in _FIELD_NAMES if (value := getattr(self, name)) is not None}
+
+
+_FIELD_NAMES = tuple(f.name for f in fields(TradeSignal))
+
+
+# --- Safety net for free-form (non-schema) AI output ---
+def normalize_keys(data: dict) -> dict:
+    """
+    Acts as a safety net to convert keys in a dictionary to a standard format:
+    lowercase, snake_case, and standardizes common variations.
+    """
+    if not isinstance(data, dict): return data
+    
+    cleaned_data = {k.lower().replace(' ', '_'): v for k, v in data.items()}
+    
+    # --- CRITICAL FIX: Handle more variations from the AI ---
+    # Standardize 'option_type' or 'optiontype' to 'type'
+    if 'option_type' in cleaned_data:
+        cleaned_data['type'] = cleaned_data.pop('option_type')
+    if 'optiontype' in cleaned_data:
+        cleaned_data['type'] = cleaned_data.pop('optiontype')
+
+    # Standardize 'entry_price' or 'entryprice' to 'price'
+    if 'entry_price' in cleaned_data:
+        cleaned_data['price'] = cleaned_data.pop('entry_price')
+    if 'entryprice' in cleaned_data:
+        cleaned_data['price'] = cleaned_data.pop('entryprice')
+
+    # Clean the ticker symbol
+    if 'ticker' in cleaned_data and isinstance(cleaned_data['ticker'], str):
+        cleaned_data['ticker'] = cleaned_data['ticker'].replace('$', '').upper()
+        
+    return cleaned_data
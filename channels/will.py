@@ -8,7 +8,7 @@ class WillParser(BaseParser):
     # The __init__ method now receives the config directly
     def __init__(self, openai_client, channel_id, config):
         # It no longer needs to look it up itself
-        super().__init__(openai_client, channel_id, config["name"])
+        super().__init__(openai_client, channel_id, config["name"], config)
 
 
     def build_prompt(self) -> str:
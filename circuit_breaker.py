@@ -0,0 +1,154 @@
+# circuit_breaker.py
+import time
+from collections import deque
+from threading import Lock
+from metrics import CIRCUIT_STATE, CIRCUIT_REJECTIONS
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    A thread-safe circuit breaker for one upstream dependency.
+    The breaker opens when at least `failure_rate` of the calls in the last
+    `window` seconds failed (given at least `min_calls` calls). While open, calls
+    fail fast. After `reset_timeout` seconds it goes half-open and lets
+    `half_open_probes` calls through; a successful probe closes it again and a
+    failed one re-opens it. Listeners are called as (breaker, old_state, new_state).
+    """
+    def __init__(self, name: str, failure_rate: float = 0.5, min_calls: int = 5, window: float = 60.0,
+                 reset_timeout: float = 30.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self._lock = Lock()
+        self._state = CLOSED
+        self._outcomes = deque() # (monotonic time, succeeded) within the window
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_started_at = 0.0
+        self._listeners = []
+        CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], upstream=self.name)
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _trim(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _transition(self, new_state: str) -> tuple[str, str] | None:
+        """Changes state under the lock; returns the (old, new) pair for listeners, or None."""
+        old_state = self._state
+        if old_state == new_state:
+            return None
+        self._state = new_state
+        if new_state == OPEN:
+            self._opened_at = time.monotonic()
+        if new_state != HALF_OPEN:
+            self._probes_in_flight = 0
+        if new_state == CLOSED:
+            self._outcomes.clear()
+        CIRCUIT_STATE.set(_STATE_VALUES[new_state], upstream=self.name)
+        return old_state, new_state
+
+    def _notify(self, change: tuple[str, str] | None):
+        if change is None:
+            return
+        print(f"⚡ Circuit breaker [{self.name}]: {change[0]} -> {change[1]}")
+        for listener in self._listeners:
+            try:
+                listener(self, *change)
+            except Exception as e:
+                print(f"❌ Circuit breaker listener failed: {e}")
+
+    def allow_request(self) -> bool:
+        """Returns True if a call may go out now. Every allowed call must be followed by record_success/record_failure."""
+        change = None
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                change = self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN and time.monotonic() - self._probe_started_at >= self.reset_timeout:
+                self._probes_in_flight = 0 # A probe that never reported back must not wedge the breaker
+            if self._state == CLOSED:
+                allowed = True
+            elif self._state == HALF_OPEN and self._probes_in_flight < self.half_open_probes:
+                self._probes_in_flight += 1
+                self._probe_started_at = time.monotonic()
+                allowed = True
+            else:
+                allowed = False
+        self._notify(change)
+        if not allowed:
+            CIRCUIT_REJECTIONS.inc(upstream=self.name)
+        return allowed
+
+    def check(self):
+        """Like allow_request(), but raises CircuitOpenError when the call must not go out."""
+        if not self.allow_request():
+            raise CircuitOpenError(f"{self.name} circuit is open; failing fast (retry in {self.retry_in():.0f}s)")
+
+    def record_success(self):
+        with self._lock:
+            if self._state == HALF_OPEN:
+                change = self._transition(CLOSED)
+            else:
+                change = None
+                now = time.monotonic()
+                self._outcomes.append((now, True))
+                self._trim(now)
+        self._notify(change)
+
+    def record_failure(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._state == HALF_OPEN:
+                change = self._transition(OPEN)
+            else:
+                self._outcomes.append((now, False))
+                self._trim(now)
+                failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+                tripped = (self._state == CLOSED and len(self._outcomes) >= self.min_calls
+                           and failures / len(self._outcomes) >= self.failure_rate)
+                change = self._transition(OPEN) if tripped else None
+        self._notify(change)
+
+    def retry_in(self) -> float:
+        """Seconds until an open breaker will let a probe through."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": self._state,
+                "calls": len(self._outcomes),
+                "failures": sum(1 for _, succeeded in self._outcomes if not succeeded),
+            }
+
+    def status_line(self) -> str:
+        snap = self.snapshot()
+        line = f"{self.name}: {snap['state']} ({snap['failures']}/{snap['calls']} failed in {self.window:.0f}s)"
+        if snap["state"] == OPEN:
+            line += f", probe in {self.retry_in():.0f}s"
+        return line
+
+
+# Create one global breaker per upstream, shared by every parser and trader
+openai_breaker = CircuitBreaker("OpenAI")
+robinhood_breaker = CircuitBreaker("Robinhood")
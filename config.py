@@ -6,28 +6,71 @@ BUY_PRICE_PADDING = 0.02
 
 POSITION_SIZE_MULTIPLIERS = { "lotto": 0.10, "small": 0.25, "half": 0.50, "full": 1.00 }
 
+# Background broker reconciliation (live account only)
+RECONCILE_INTERVAL_SECONDS = 30
+RECONCILE_MAX_AGE_SECONDS = 60 # Exits fall back to a full broker lookup when the synced view is older
+
+# Fill watcher: stops are placed only once entries fill; stale entries are cancelled
+ORDER_POLL_INTERVAL_SECONDS = 2
+ENTRY_FILL_TIMEOUT_SECONDS = 300
+# Trim/exit sells are day limits just under the bid; unfilled ones are re-priced off a fresh bid
+EXIT_REPRICE_SECONDS = 15
+EXIT_MAX_REPRICES = 3
+# Same-contract buys from different channels within this window become one order (0 disables coalescing).
+# A timer submits the batch, so trade threads never wait out the window.
+ORDER_COALESCE_WINDOW_SECONDS = 0.15
+
+# Catch-up backfill of messages missed while the bot was down or disconnected
+BACKFILL_ENABLED = True
+BACKFILL_MAX_MESSAGES = 50 # Per channel, per backfill
+BACKFILL_MAX_AGE_SECONDS = 900 # Missed messages older than this are not replayed at all
+BACKFILL_MAX_BUY_AGE_SECONDS = 120 # Missed buys older than this are skipped; trims and exits still replay
+
+# !profile sampling profiler: collapsed stacks are written to PROFILE_OUTPUT_DIR
+PROFILE_SAMPLE_INTERVAL_SECONDS = 0.005
+PROFILE_MAX_SECONDS = 300
+PROFILE_OUTPUT_DIR = "profiles"
+
+# Lean Discord gateway: no member chunking, no member cache, small message cache,
+# and events from unmonitored channels are dropped before any objects are built
+LEAN_GATEWAY = True
+LEAN_MESSAGE_CACHE_SIZE = 100
+
+# Per-channel options:
+#   "structured_output": request schema-constrained JSON (TradeSignal) instead of free-form text.
+#   "model": optional OpenAI model override for the channel's parser.
+#   "streaming": stream the LLM reply and start broker lookups as soon as action and ticker are known.
+#   "timeout": per-request OpenAI timeout in seconds (default DEFAULT_TIMEOUT_SECONDS in channels/base_parser.py).
+#   "hedge": optional dict enabling hedged LLM requests, e.g.
+#            {"enabled": True, "percentile": 0.90, "alternate_model": "gpt-4o-mini", "max_extra_fraction": 0.10}
+#            (see HEDGE_DEFAULTS in channels/base_parser.py for every option).
 CHANNELS_CONFIG = {
     # --- LIVE CHANNELS ---
     1072559822366576780: { # Ryan's Live ID
         "name": "Ryan", "mode": "live", "multiplier": 1.0,
         "initial_stop_loss": 0.35, "trailing_stop_loss_pct": 0.20,
+        "structured_output": False,
     },
     1072556084662902846: { # Eva's Live ID
         "name": "Eva", "mode": "live", "multiplier": 0.7,
         "initial_stop_loss": 0.35, "trailing_stop_loss_pct": 0.20,
+        "structured_output": False,
     },
 
     # --- TEST CHANNELS ---
     1257442835465244732: { # Will's Live ID (set to test mode)
         "name": "Will", "mode": "test", "multiplier": 1.0,
         "initial_stop_loss": 0.35, "trailing_stop_loss_pct": 0.20,
+        "structured_output": False,
     },
     1072555808832888945: { # Sean's Live ID (set to test mode)
         "name": "Sean", "mode": "test", "multiplier": 1.0,
         "initial_stop_loss": 0.35, "trailing_stop_loss_pct": 0.20,
+        "structured_output": False,
     },
     1368713891072315483: { # FiFi's Live ID (set to test mode)
         "name": "FiFi", "mode": "test", "multiplier": 1.0,
         "initial_stop_loss": 0.30, "trailing_stop_loss_pct": 0.15,
+        "structured_output": False,
     },
 }
\ No newline at end of file
@@ -1,14 +1,22 @@
 # live.py
 import os
 import json
+import time
 import asyncio
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import Dict, Any
 from dotenv import load_dotenv
 import discord
 import aiohttp
 from openai import OpenAI
 
+PROCESS_START = time.perf_counter()
+try:
+    import resource # Unix only; used to report peak memory
+except ImportError:
+    resource = None
+
 # --- Load Environment & Config ---
 load_dotenv()
 DISCORD_TOKEN = os.getenv("DISCORD_USER_TOKEN")
@@ -17,23 +25,57 @@ LIVE_PLAY_WEBHOOK = os.getenv("LIVE_PLAY_WEBHOOK")
 TEST_LOGGING_WEBHOOK = os.getenv("TEST_LOGGING_WEBHOOK")
 LIVE_LOGGING_WEBHOOK = os.getenv("LIVE_LOGGING_WEBHOOK")
 LIVE_COMMAND_CHANNEL_ID = int(os.getenv("LIVE_COMMAND_CHANNEL_ID"))
+METRICS_PORT = os.getenv("METRICS_PORT") # Optional: serve /metrics on this local port
 
 from config import *
-from position_manager import PositionManager
-from trader import RobinhoodTrader, SimulatedTrader
+from position_manager import PositionManager, sellable_quantity
+from trader import RobinhoodTrader, SimulatedTrader, option_contract_key
+from async_trader import AsyncRobinhoodTrader
+from reconciler import BrokerReconciler
+from order_tracker import OrderTracker
+from order_aggregator import OrderAggregator
+from signal_store import SignalStore, parse_range
+from message_cursor import MessageCursor
+from profiler import SamplingProfiler
+from channels.trade_signal import normalize_keys
 from channels.sean import SeanParser
 from channels.will import WillParser
 from channels.eva import EvaParser
 from channels.ryan import RyanParser
 from channels.fifi import FiFiParser
 from feedback_logger import feedback_logger
+from circuit_breaker import openai_breaker, robinhood_breaker, OPEN, CLOSED
+from metrics import metrics, MESSAGES_RECEIVED, EXECUTOR_QUEUE_DEPTH, WEBHOOK_FAILURES, OPEN_POSITIONS, GATEWAY_EVENTS_FILTERED
 
 # --- Global State & Initializations ---
 SIM_MODE = True # Bot starts in simulation mode by default for safety
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=1) # Parsers set per-request timeouts; one retry keeps the worst case bounded
 live_trader = RobinhoodTrader()
 sim_trader = SimulatedTrader()
+async_live_trader = AsyncRobinhoodTrader() # Pooled session for reads/commands on the event loop
 position_manager = PositionManager("tracked_contracts_live.json")
+signal_store = SignalStore("signal_history.db")
+message_cursor = MessageCursor("channel_cursors.json")
+order_tracker = OrderTracker(poll_interval=ORDER_POLL_INTERVAL_SECONDS, fill_timeout=ENTRY_FILL_TIMEOUT_SECONDS,
+                             exit_reprice_after=EXIT_REPRICE_SECONDS, exit_max_reprices=EXIT_MAX_REPRICES)
+reconciler = BrokerReconciler(
+    live_trader, position_manager,
+    live_channel_ids=[channel_id for channel_id, cfg in CHANNELS_CONFIG.items() if cfg['mode'] == 'live'],
+    is_active=lambda: not SIM_MODE,
+    interval=RECONCILE_INTERVAL_SECONDS, max_age=RECONCILE_MAX_AGE_SECONDS,
+)
+order_tracker.on_orders_changed = reconciler.mark_dirty
+order_aggregator = OrderAggregator(order_tracker, window=ORDER_COALESCE_WINDOW_SECONDS)
+
+def _record_fill(allocation: dict, filled: int):
+    """Attributes a channel's share of a (possibly shared) entry fill to its tracked position."""
+    if allocation.get("trade_id"):
+        updates = {"filled_quantity": filled}
+        if allocation.get("shared"):
+            updates["shared_stop_price"] = allocation["stop_price"] # Trims and exits then sell only this share
+        position_manager.update_position(allocation["channel_id"], allocation["trade_id"], updates)
+
+order_tracker.on_fill = _record_fill
 
 CHANNEL_HANDLERS = {
     channel_id: globals()[f"{config['name']}Parser"](openai_client, channel_id, config)
@@ -41,46 +83,98 @@ CHANNEL_HANDLERS = {
 }
 print(f"✅ Bot is listening to channels: {list(CHANNEL_HANDLERS.keys())}")
 
-# --- Helper function to clean AI output ---
-def normalize_keys(data: dict) -> dict:
+def _open_position_counts() -> dict:
+    """Collected at scrape time so the hot path never touches the position gauge."""
+    return {
+        (CHANNELS_CONFIG.get(int(channel_id), {}).get("name", channel_id),): count
+        for channel_id, count in position_manager.count_positions().items()
+    }
+
+OPEN_POSITIONS.set_function(_open_position_counts)
+
+# --- Early Dispatch Prefetch (streaming parsers) ---
+_PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+def _start_prefetch(trader, partial: dict) -> dict:
     """
-    Acts as a safety net to convert keys in a dictionary to a standard format:
-    lowercase, snake_case, and standardizes common variations.
+    Starts the broker reads a trade will need as soon as a streaming parser knows
+    its action and ticker, overlapping them with the rest of the LLM reply. Trims and
+    exits also resolve the channel's tracked position in that ticker, and through its
+    broker position the contract's instrument and open orders.
     """
-    if not isinstance(data, dict): return data
-    
-    cleaned_data = {k.lower().replace(' ', '_'): v for k, v in data.items()}
-    
-    # --- CRITICAL FIX: Handle more variations from the AI ---
-    # Standardize 'option_type' or 'optiontype' to 'type'
-    if 'option_type' in cleaned_data:
-        cleaned_data['type'] = cleaned_data.pop('option_type')
-    if 'optiontype' in cleaned_data:
-        cleaned_data['type'] = cleaned_data.pop('optiontype')
-
-    # Standardize 'entry_price' or 'entryprice' to 'price'
-    if 'entry_price' in cleaned_data:
-        cleaned_data['price'] = cleaned_data.pop('entry_price')
-    if 'entryprice' in cleaned_data:
-        cleaned_data['price'] = cleaned_data.pop('entryprice')
-
-    # Clean the ticker symbol
-    if 'ticker' in cleaned_data and isinstance(cleaned_data['ticker'], str):
-        cleaned_data['ticker'] = cleaned_data['ticker'].replace('$', '').upper()
-        
-    return cleaned_data
+    positions = _PREFETCH_EXECUTOR.submit(trader.get_open_option_positions)
+    prefetch = {"positions": positions}
+    if partial["action"] == "buy":
+        prefetch["portfolio_value"] = _PREFETCH_EXECUTOR.submit(trader.get_portfolio_value)
+        return prefetch
+    position = position_manager.find_position(partial["channel_id"], {"ticker": partial["ticker"]}) or {}
+    contract = [position.get(field) for field in ("symbol", "strike", "expiration", "type")]
+    if contract[0] == partial["ticker"] and all(contract):
+        prefetch[f"open_orders:{option_contract_key(*contract)}"] = _PREFETCH_EXECUTOR.submit(
+            _fetch_contract_orders, trader, contract, positions)
+    return prefetch
+
+def _instrument_url(pos_on_broker: dict) -> str | None:
+    """The option instrument of a broker position (options/positions rows carry it as "option")."""
+    return pos_on_broker.get('option') or (pos_on_broker.get('legs') or [{}])[0].get('option')
+
+def _fetch_contract_orders(trader, contract: list, positions) -> list:
+    """Open orders on a contract, found through the instrument of its broker position."""
+    pos_on_broker = trader.find_open_option_position(*contract, positions=positions.result())
+    instrument_url = _instrument_url(pos_on_broker or {})
+    return trader.get_open_orders_for_contract(instrument_url) if instrument_url else []
+
+def _take_prefetched(prefetch: dict, key: str, fallback):
+    """Returns a prefetched result (each is used once), or calls `fallback` if none is available."""
+    future = prefetch.pop(key, None)
+    if future is not None:
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"⚠️ Prefetch of {key} failed, fetching again: {e}")
+    return fallback()
 
 # --- BLOCKING Trade Logic (Designed to be run in a separate thread) ---
-def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on):
+def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on, message_id=None, message_age=None):
+    """
+    Parses one message and executes its signals. `message_age` (seconds) is set only for
+    backfilled messages; stale buys among them are skipped. Returns the number skipped.
+    """
     def log_sync(msg):
         asyncio.run_coroutine_threadsafe(MyClient.log_and_print_helper(msg), loop)
 
+    def report_execution(trade_obj, action, title_tag, play_webhook, use_real_trader, result_summary, trade_id=None, order_id=None):
+        if use_real_trader:
+            reconciler.mark_dirty() # Our own orders invalidate the synced broker view
+
+        log_sync(f"Execution Summary: {result_summary}")
+
+        signal_store.record_execution(message_id, handler.name, trade_obj, result_summary,
+                                      mode=title_tag.strip("[]"), trade_id=trade_id, order_id=order_id)
+
+        alert = {"username": "TradeBot", "embeds": [{ "title": f"{title_tag} [{handler.name}] {action.upper()}", "fields": [{"name": "Original Message", "value": raw_msg[:1024]}, {"name": "Parsed Message", "value": f"```json\n{json.dumps(trade_obj, indent=2)}```"}, {"name": "Execution Summary", "value": f"```{result_summary}```"}], "timestamp": datetime.utcnow().isoformat()}]}
+        asyncio.run_coroutine_threadsafe(MyClient.send_webhook_helper(play_webhook, alert), loop)
+
+    prefetch = {}
+    def on_partial(partial):
+        # Only the real broker is worth prefetching; orders still wait for the complete parse.
+        if CHANNELS_CONFIG[handler.channel_id]['mode'] == 'live' and not is_sim_mode_on:
+            prefetch.update(_start_prefetch(live_trader, partial))
+            print(f"⚡ Early dispatch for {handler.name}: {partial['action']} {partial['ticker']}")
+
+    stale_buys = 0
     try:
-        parsed_results = handler.parse_message(message_meta)
-        if not parsed_results: return
+        outcomes = []
+        try:
+            parsed_results = handler.parse_message(message_meta, on_partial=on_partial, on_outcome=outcomes.append)
+        finally:
+            if message_id is not None: # A parse that raised is recorded as an error too
+                signal_store.record_parse_outcome(message_id, outcomes[-1] if outcomes else "error")
+        if not parsed_results: return stale_buys
 
         for raw_trade_obj in parsed_results:
-            trade_obj = normalize_keys(raw_trade_obj)
+            # Structured output already matches the TradeSignal schema, so the key repair pass is skipped.
+            trade_obj = raw_trade_obj if handler.structured_output else normalize_keys(raw_trade_obj)
 
             # --- FINAL SAFETY CHECK ---
             # If the AI hallucinates a small strike price for a large index like SPX, treat it as a price.
@@ -109,6 +203,17 @@ def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on)
             play_webhook = LIVE_PLAY_WEBHOOK if is_channel_live else TEST_LOGGING_WEBHOOK
             use_real_trader = is_channel_live and not is_sim_mode_on
             trader = live_trader if use_real_trader else sim_trader
+
+            title_tag = "[LIVE]" if use_real_trader else "[SIMULATED]"
+            if not is_channel_live:
+                title_tag = "[TEST-MODE]"
+
+            if action == "buy" and message_age is not None and message_age > BACKFILL_MAX_BUY_AGE_SECONDS:
+                stale_buys += 1
+                log_sync(f"⏭️ [{handler.name}] Skipped stale backfilled buy ({message_age:.0f}s old): {trade_obj}")
+                signal_store.record_execution(message_id, handler.name, trade_obj, "⏭️ Skipped: stale buy from backfill.",
+                                              mode=title_tag.strip("[]"))
+                continue
             
             log_sync(f"🕠 Handling trade for {handler.name}: {trade_obj} (Mode: {config['mode'].upper()}, Global Sim: {is_sim_mode_on})")
             
@@ -123,19 +228,23 @@ def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on)
 
             if not all([symbol, strike, expiration, opt_type]):
                 log_sync(f"❌ Aborted: Missing critical contract info after fallback. Details: {trade_obj}")
+                signal_store.record_execution(message_id, handler.name, trade_obj, "❌ Aborted: Missing critical contract info.",
+                                              mode=title_tag.strip("[]"), trade_id=active_position_in_memory.get("trade_id"))
                 continue
 
             price_val = trade_obj.get("price")
             price = 'BE' if isinstance(price_val, str) and price_val.upper() == 'BE' else float(price_val or 0.0)
             size = trade_obj.get("size", "full")
             result_summary = "Action not executed."
+            order_id = None
+            trade_id = active_position_in_memory.get("trade_id")
 
             if action == "buy":
                 try:
                     if not isinstance(price, (int, float)) or price <= 0:
                         result_summary = "❌ Aborted: Invalid price for a buy order."
                     else:
-                        portfolio_value = trader.get_portfolio_value()
+                        portfolio_value = _take_prefetched(prefetch, "portfolio_value", trader.get_portfolio_value)
                         allocation = MAX_PCT_PORTFOLIO * POSITION_SIZE_MULTIPLIERS.get(size, 1.0) * config["multiplier"]
                         max_amount = min(allocation * portfolio_value, MAX_DOLLAR_AMOUNT)
                         padded_price = price * (1 + BUY_PRICE_PADDING)
@@ -143,16 +252,39 @@ def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on)
                         stop_price = round(price * (1 - config["initial_stop_loss"]), 2)
                         
                         # --- MODIFIED LOGIC FOR AVERAGING ---
-                        existing_pos = trader.find_open_option_position(symbol, strike, expiration, opt_type)
-                        
-                        trader.place_option_buy_order(symbol, strike, expiration, opt_type, contracts, padded_price)
-                        
-                        # If we are averaging, we don't place a new stop. This should be managed manually.
+                        existing_pos = trader.find_open_option_position(
+                            symbol, strike, expiration, opt_type,
+                            positions=_take_prefetched(prefetch, "positions", lambda: None))
+
                         if not existing_pos:
-                            trader.place_option_stop_loss_order(symbol, strike, expiration, opt_type, contracts, stop_price)
-                            result_summary = f"Placed BUY: {contracts}x {symbol} {strike}{opt_type} @ {padded_price:.2f} with stop @ {stop_price}"
-                            position_manager.add_position(channel_id, trade_obj)
+                            # New entries go through the aggregator, which nets same-contract buys from other
+                            # channels into one order and reports back once it is submitted, so this thread
+                            # moves on. The order tracker places the stop once the buy fills.
+                            trade_id = position_manager.add_position(channel_id, trade_obj)["trade_id"]
+                            placed = f"Placed BUY: {contracts}x {symbol} {strike}{opt_type} @ {padded_price:.2f}, stop @ {stop_price} on fill"
+                            def on_batch(batch, trade_obj=trade_obj, action=action, title_tag=title_tag, play_webhook=play_webhook,
+                                         use_real_trader=use_real_trader, channel_id=channel_id, trade_id=trade_id, placed=placed):
+                                order_id = batch["order_id"]
+                                if not order_id:
+                                    position_manager.clear_position(channel_id, trade_id)
+                                    trade_id = None
+                                    result_summary = f"❌ BUY not accepted by broker: {batch['response']}"
+                                else:
+                                    result_summary = placed
+                                    partners = [a["label"] for a in batch["allocations"] if a.get("trade_id") != trade_id]
+                                    if partners:
+                                        result_summary += (f" (coalesced with {', '.join(partners)} into one {batch['quantity']}x order"
+                                                           f" @ {batch['limit_price']:.2f}, stop @ {batch['stop_price']})")
+                                report_execution(trade_obj, action, title_tag, play_webhook, use_real_trader, result_summary, trade_id, order_id)
+                            order_aggregator.submit_buy(
+                                trader, symbol, strike, expiration, opt_type, contracts, padded_price, stop_price,
+                                allocation={"channel_id": channel_id, "trade_id": trade_id, "label": handler.name},
+                                on_result=on_batch)
+                            result_summary = None
                         else:
+                            # If we are averaging, we don't place a new stop. This should be managed manually.
+                            buy_order = trader.place_option_buy_order(symbol, strike, expiration, opt_type, contracts, padded_price)
+                            order_id = (buy_order or {}).get("id")
                             result_summary = f"Averaged BUY: {contracts}x {symbol} {strike}{opt_type} @ {padded_price:.2f}. New total may need manual stop adjustment."
                             # Position manager does not need to be updated as it tracks the initial entry.
                             
@@ -161,54 +293,161 @@ def _blocking_handle_trade(loop, handler, message_meta, raw_msg, is_sim_mode_on)
 
             elif action in ("trim", "exit", "stop"):
                 try:
-                    # --- CRITICAL FIX: Always get the REAL quantity from the broker ---
-                    pos_on_broker = trader.find_open_option_position(symbol, strike, expiration, opt_type)
+                    # Decisions use the reconciled in-memory view when it is fresh. Anything missing
+                    # from it is confirmed with the broker before memory is cleared.
+                    use_synced_view = use_real_trader and reconciler.is_fresh()
+                    pos_on_broker = reconciler.find_position(symbol, strike, expiration, opt_type) if use_synced_view else None
+                    if not pos_on_broker:
+                        use_synced_view = False
+                        # --- CRITICAL FIX: Always get the REAL quantity from the broker ---
+                        pos_on_broker = trader.find_open_option_position(
+                            symbol, strike, expiration, opt_type,
+                            positions=_take_prefetched(prefetch, "positions", lambda: None))
 
                     if not pos_on_broker or float(pos_on_broker.get('quantity', 0)) == 0:
                         result_summary = f"Position {symbol} not found on broker. Clearing from memory if exists."
                         if active_position_in_memory:
+                            order_tracker.reduce(active_position_in_memory['trade_id'])
                             position_manager.clear_position(channel_id, active_position_in_memory['trade_id'])
                     else:
-                        instrument_url = pos_on_broker.get('legs', [{}])[0].get('option')
-                        for order in trader.get_open_orders_for_contract(instrument_url):
+                        instrument_url = _instrument_url(pos_on_broker)
+                        open_orders = (reconciler.get_open_orders_for_contract(instrument_url) if use_synced_view
+                                       else _take_prefetched(prefetch, f"open_orders:{option_contract_key(symbol, strike, expiration, opt_type)}",
+                                                             lambda: trader.get_open_orders_for_contract(instrument_url)))
+                        for order in open_orders:
                             trader.cancel_option_order(order['id'])
                         log_sync(f"✅ Canceled open orders for {symbol}.")
-                        
-                        # Use the quantity from the broker, not from memory
-                        qty = int(float(pos_on_broker['quantity']))
 
-                        if action == "trim":
+                        if use_synced_view:
+                            # Re-check right before the sell so the quantity is never stale
+                            pos_on_broker = trader.find_open_option_position(symbol, strike, expiration, opt_type) or {}
+
+                        # Use the quantity from the broker, not from memory
+                        held = int(float(pos_on_broker.get('quantity', 0)))
+                        # A coalesced entry shares the broker position with other channels, so only this channel's fill is sold
+                        shared_stop_price = active_position_in_memory.get("shared_stop_price")
+                        qty = sellable_quantity(active_position_in_memory, held)
+                        sold = 0
+                        tracked = False # The order tracker re-places the stop while the entry is still filling
+
+                        if held == 0:
+                            result_summary = f"Position {symbol} closed on broker before the {action}. Clearing from memory if exists."
+                            if active_position_in_memory:
+                                order_tracker.reduce(active_position_in_memory['trade_id'])
+                                position_manager.clear_position(channel_id, active_position_in_memory['trade_id'])
+                        elif qty == 0:
+                            result_summary = f"No filled contracts of the shared {symbol} entry belong to {handler.name}. Nothing sold."
+                            if action != "trim":
+                                tracked = order_tracker.reduce(trade_id)
+                                position_manager.clear_position(channel_id, trade_id)
+                        elif action == "trim":
                             trim_qty = max(1, qty // 4)
                             remaining = qty - trim_qty
-                            trader.place_option_market_sell_order(symbol, strike, expiration, opt_type, trim_qty)
+                            # An entry still filling keeps its stop off the contracts sold here
+                            if trade_id:
+                                tracked = order_tracker.reduce(trade_id, trim_qty)
+                            sell_order = trader.place_option_market_sell_order(symbol, strike, expiration, opt_type, trim_qty)
+                            order_id = (sell_order or {}).get("id")
+                            if order_id:
+                                order_tracker.track_exit(trader, order_id, symbol, strike, expiration, opt_type, trim_qty, label=handler.name)
+                            sold = trim_qty
+                            if shared_stop_price is not None:
+                                position_manager.record_sale(channel_id, trade_id, trim_qty)
                             # (Trailing stop logic is unchanged)
                             result_summary = f"Trimmed {trim_qty}, placed new stop on {remaining}."
                         else: # Full Exit
-                            trader.place_option_market_sell_order(symbol, strike, expiration, opt_type, qty)
+                            if trade_id:
+                                tracked = order_tracker.reduce(trade_id)
+                            sell_order = trader.place_option_market_sell_order(symbol, strike, expiration, opt_type, qty)
+                            order_id = (sell_order or {}).get("id")
+                            if order_id:
+                                order_tracker.track_exit(trader, order_id, symbol, strike, expiration, opt_type, qty, label=handler.name)
+                            sold = qty
                             if active_position_in_memory:
                                 position_manager.clear_position(channel_id, active_position_in_memory['trade_id'])
                             result_summary = f"Exited {qty} contracts of {symbol}."
+
+                        # The cancel above also took down the shared stop; put it back over what the other channels hold
+                        if shared_stop_price is not None and held - sold > 0 and not tracked:
+                            stop_order = trader.place_option_stop_loss_order(symbol, strike, expiration, opt_type, held - sold, shared_stop_price)
+                            if (stop_order or {}).get("id"):
+                                result_summary += f" Re-placed the shared stop on {held - sold} @ {shared_stop_price}."
+                            else:
+                                result_summary += f" ❌ Shared stop on {held - sold} not accepted: {stop_order}"
                 except Exception as e:
                     result_summary = f"❌ API Error on {action.upper()}: {e}"
-            
-            log_sync(f"Execution Summary: {result_summary}")
-            
-            title_tag = "[LIVE]" if use_real_trader else "[SIMULATED]"
-            if not is_channel_live:
-                title_tag = "[TEST-MODE]"
 
-            alert = {"username": "TradeBot", "embeds": [{ "title": f"{title_tag} [{handler.name}] {action.upper()}", "fields": [{"name": "Original Message", "value": raw_msg[:1024]}, {"name": "Parsed Message", "value": f"```json\n{json.dumps(trade_obj, indent=2)}```"}, {"name": "Execution Summary", "value": f"```{result_summary}```"}], "timestamp": datetime.utcnow().isoformat()}]}
-            asyncio.run_coroutine_threadsafe(MyClient.send_webhook_helper(play_webhook, alert), loop)
+            if result_summary is not None: # Coalesced buys report from the aggregator once their batch is submitted
+                report_execution(trade_obj, action, title_tag, play_webhook, use_real_trader, result_summary, trade_id, order_id)
 
     except Exception as e:
         log_sync(f"❌ An unhandled error occurred in the trade processing thread: {e}")
+    finally:
+        EXECUTOR_QUEUE_DEPTH.dec()
+    return stale_buys
 
         
+def _peak_memory_mb() -> float | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # ru_maxrss is in KB on Linux
+
+# Gateway events that carry a channel_id and would otherwise build message/reaction objects
+CHANNEL_SCOPED_EVENTS = (
+    "MESSAGE_CREATE", "MESSAGE_UPDATE", "MESSAGE_DELETE", "MESSAGE_DELETE_BULK", "MESSAGE_ACK",
+    "MESSAGE_REACTION_ADD", "MESSAGE_REACTION_REMOVE", "MESSAGE_REACTION_REMOVE_ALL",
+    "MESSAGE_REACTION_REMOVE_EMOJI", "TYPING_START",
+)
+
 # --- Discord Bot Class (The Main Async Thread) ---
 class MyClient(discord.Client):
     def __init__(self, *args, **kwargs):
+        if LEAN_GATEWAY:
+            # Skip member chunking and keep only a small message cache. Guild subscriptions stay on:
+            # without them large guilds can stop dispatching on_message for the signal channels.
+            kwargs.setdefault("chunk_guilds_at_startup", False)
+            kwargs.setdefault("member_cache_flags", discord.MemberCacheFlags.none())
+            kwargs.setdefault("max_messages", LEAN_MESSAGE_CACHE_SIZE)
         super().__init__(*args, **kwargs)
         MyClient.static_logger_webhook = LIVE_LOGGING_WEBHOOK
+        self.reconcile_task = None
+        self.order_tracker_task = None
+        self.startup_seconds = None
+        self.backfill_lock = asyncio.Lock()
+        # Cursors taken before live dispatch (re)starts, so a live message can't move a cursor past the gap
+        self.backfill_cursors = message_cursor.snapshot()
+        self.active_profiler = None
+        for breaker in (openai_breaker, robinhood_breaker):
+            breaker.add_listener(self._on_breaker_change)
+        if LEAN_GATEWAY:
+            self._install_channel_filter()
+
+    def _on_breaker_change(self, breaker, old_state, new_state):
+        """Alerts through the logger webhook when an upstream trips or recovers. Called from any thread."""
+        if new_state == OPEN:
+            msg = f"🚨 **{breaker.name} circuit OPEN** ({breaker.status_line()}). Calls fail fast until a probe succeeds."
+        elif new_state == CLOSED:
+            msg = f"✅ **{breaker.name} circuit closed.** Probe succeeded, calls resumed."
+        else:
+            return
+        asyncio.run_coroutine_threadsafe(MyClient.log_and_print_helper(msg), self.loop)
+
+    def _install_channel_filter(self):
+        """
+        Drops gateway events from channels we don't monitor before discord.py builds
+        any Message or Reaction objects for them, by wrapping the connection's parsers.
+        """
+        allowed = {str(channel_id) for channel_id in CHANNEL_HANDLERS} | {str(LIVE_COMMAND_CHANNEL_ID)}
+        parsers = self._connection.parsers
+        for event in CHANNEL_SCOPED_EVENTS:
+            original = parsers.get(event)
+            if original is None:
+                continue
+            def filtered(data, original=original):
+                if data.get("channel_id") in allowed: # Raw payloads carry snowflakes as strings
+                    return original(data)
+                GATEWAY_EVENTS_FILTERED.inc()
+            parsers[event] = filtered
 
     @staticmethod
     async def send_webhook_helper(url, payload):
@@ -217,8 +456,10 @@ class MyClient(discord.Client):
             try:
                 async with session.post(url, json=payload) as resp:
                     if resp.status not in (200, 204):
+                        WEBHOOK_FAILURES.inc(reason=f"http_{resp.status}")
                         print(f"⚠️ Webhook error {resp.status}: {await resp.text()}")
             except Exception as e:
+                WEBHOOK_FAILURES.inc(reason="exception")
                 print(f"❌ Webhook exception: {e}")
     
     @staticmethod
@@ -228,17 +469,104 @@ class MyClient(discord.Client):
 
     async def get_positions_string(self) -> str:
         try:
-            positions = await self.loop.run_in_executor(None, live_trader.get_open_option_positions)
+            # Positions, open orders and equity are fetched concurrently
+            snapshot = await async_live_trader.get_account_snapshot()
+            positions = snapshot["positions"]
+            summary = f"Open orders: {len(snapshot['orders'])} | Equity: ${snapshot['portfolio_value']:,.2f}"
             if not positions:
-                return "No open option positions."
+                return f"No open option positions.\n{summary}"
             holdings = [f"• {p['chain_symbol']} {p['expiration_date']} {p['strike_price']}{p['type'].upper()[0]} x{int(float(p['quantity']))}" for p in positions]
-            return "\n".join(holdings)
+            return "\n".join(holdings + [summary])
         except Exception as e:
             return f"Error retrieving holdings: {e}"
 
     async def on_ready(self):
         await MyClient.log_and_print_helper(f"✅ Logged in as {self.user} (Unified Bot)")
         await MyClient.log_and_print_helper(f"Bot starting in default SIMULATION MODE. Use !sim off to enable live trading.")
+        if self.startup_seconds is None:
+            self.startup_seconds = time.perf_counter() - PROCESS_START
+            peak_mb = _peak_memory_mb()
+            await MyClient.log_and_print_helper(
+                f"📊 Gateway ready in {self.startup_seconds:.1f}s | Lean mode: {'ON' if LEAN_GATEWAY else 'OFF'} | "
+                f"Guilds: {len(self.guilds)} | Peak memory: {f'{peak_mb:.0f} MB' if peak_mb is not None else 'n/a'}"
+            )
+        if METRICS_PORT:
+            try:
+                await metrics.start_server("127.0.0.1", int(METRICS_PORT))
+            except Exception as e:
+                await MyClient.log_and_print_helper(f"❌ Failed to start metrics endpoint: {e}")
+        await async_live_trader.start()
+        if self.reconcile_task is None:
+            self.reconcile_task = self.loop.create_task(reconciler.run(self.loop, MyClient.log_and_print_helper))
+        if self.order_tracker_task is None:
+            self.order_tracker_task = self.loop.create_task(order_tracker.run(self.loop, MyClient.log_and_print_helper))
+        self.loop.create_task(self.backfill_missed_messages("ready"))
+
+    async def on_disconnect(self):
+        # Keep the oldest snapshot if a backfill has not consumed it yet
+        if self.backfill_cursors is None:
+            self.backfill_cursors = message_cursor.snapshot()
+
+    async def on_resumed(self):
+        self.loop.create_task(self.backfill_missed_messages("resume"))
+
+    async def backfill_missed_messages(self, reason: str):
+        """
+        Fetches what was posted in every monitored channel since its last processed
+        message, concurrently, and replays it through the normal pipeline in order.
+        Each channel is backfilled from its cursor as it was before live dispatch started.
+        """
+        if not BACKFILL_ENABLED or self.backfill_lock.locked():
+            return
+        cursors = self.backfill_cursors if self.backfill_cursors is not None else message_cursor.snapshot()
+        self.backfill_cursors = None
+        async with self.backfill_lock:
+            started = time.perf_counter()
+            channel_ids = list(CHANNEL_HANDLERS)
+            results = await asyncio.gather(*(self._backfill_channel(channel_id, cursors.get(str(channel_id)))
+                                             for channel_id in channel_ids), return_exceptions=True)
+
+            lines = []
+            for channel_id, result in zip(channel_ids, results):
+                name = CHANNEL_HANDLERS[channel_id].name
+                if isinstance(result, Exception):
+                    lines.append(f"• {name}: ❌ {result}")
+                elif result and result["fetched"]:
+                    line = (f"• {name}: {result['replayed']} replayed ({result['stale_buys']} stale buys skipped), "
+                            f"{result['too_old']} too old, {result['ignored']} duplicate/empty")
+                    if result["fetched"] >= BACKFILL_MAX_MESSAGES:
+                        line += f" — hit the {BACKFILL_MAX_MESSAGES}-message limit"
+                    lines.append(line)
+            elapsed = time.perf_counter() - started
+            if lines:
+                await MyClient.log_and_print_helper(f"**Backfill ({reason}) finished in {elapsed:.1f}s:**\n" + "\n".join(lines))
+            else:
+                await MyClient.log_and_print_helper(f"✅ Backfill ({reason}): no missed messages ({elapsed:.1f}s).")
+
+    async def _backfill_channel(self, channel_id: int, after_id: int | None) -> dict | None:
+        if after_id is None:
+            return None # Nothing processed in this channel yet, so there is no gap to fill
+        # Never fetch further back than the replay age limit
+        cutoff = discord.utils.time_snowflake(discord.utils.utcnow() - timedelta(seconds=BACKFILL_MAX_AGE_SECONDS))
+        channel = self.get_channel(channel_id) or await self.fetch_channel(channel_id)
+        missed = [message async for message in channel.history(
+            limit=BACKFILL_MAX_MESSAGES, after=discord.Object(id=max(after_id, cutoff)), oldest_first=True)]
+
+        stats = {"fetched": len(missed), "replayed": 0, "stale_buys": 0, "too_old": 0, "ignored": 0}
+        for message in missed:
+            age = (discord.utils.utcnow() - message.created_at).total_seconds()
+            if age > BACKFILL_MAX_AGE_SECONDS:
+                message_cursor.mark_processed(channel_id, message.id)
+                stats["too_old"] += 1
+                continue
+            future = self.dispatch_channel_message(message, message_age=age)
+            if future is None:
+                stats["ignored"] += 1
+                continue
+            # Replay one message at a time so each channel's signals execute in the order they were posted
+            stats["stale_buys"] += await future or 0
+            stats["replayed"] += 1
+        return stats
 
     async def on_message(self, message):
       #  if message.author == self.user: return
@@ -248,23 +576,36 @@ class MyClient(discord.Client):
             return
 
         if message.channel.id in CHANNEL_HANDLERS:
-            handler = CHANNEL_HANDLERS[message.channel.id]
-            content = message.content or ""
-            embed_description = ""
-            embed_title = ""
-            if message.embeds:
-                embed = message.embeds[0]
-                embed_description = embed.description or ""
-                embed_title = embed.title or ""
-            
-            if not content and not embed_description:
-                return
-
-            raw_msg = f"Title: {embed_title}\nDesc: {embed_description}" if embed_title else content
-            message_meta = (embed_title, embed_description) if embed_title else content
-            self.loop.run_in_executor(None, _blocking_handle_trade, self.loop, handler, message_meta, raw_msg, SIM_MODE)
+            self.dispatch_channel_message(message)
             return
 
+    def dispatch_channel_message(self, message, message_age=None):
+        """
+        Hands a monitored-channel message to the trade pipeline. Returns the executor
+        future, or None if the message is empty or has already been processed.
+        """
+        if not message_cursor.mark_processed(message.channel.id, message.id):
+            return None
+        handler = CHANNEL_HANDLERS[message.channel.id]
+        MESSAGES_RECEIVED.inc(channel=handler.name)
+        content = message.content or ""
+        embed_description = ""
+        embed_title = ""
+        if message.embeds:
+            embed = message.embeds[0]
+            embed_description = embed.description or ""
+            embed_title = embed.title or ""
+
+        if not content and not embed_description:
+            return None
+
+        raw_msg = f"Title: {embed_title}\nDesc: {embed_description}" if embed_title else content
+        message_meta = (embed_title, embed_description) if embed_title else content
+        signal_store.record_message(message.id, message.channel.id, handler.name, raw_msg, message.created_at.timestamp())
+        EXECUTOR_QUEUE_DEPTH.inc()
+        return self.loop.run_in_executor(None, _blocking_handle_trade, self.loop, handler, message_meta, raw_msg, SIM_MODE,
+                                         message.id, message_age)
+
     async def handle_command(self, message: discord.Message):
         global SIM_MODE
         parts = message.content.lower().split()
@@ -284,14 +625,64 @@ class MyClient(discord.Client):
             sim_status = "ON" if SIM_MODE else "OFF"
             live_channels = [cfg['name'] for cfg in CHANNELS_CONFIG.values() if cfg['mode'] == 'live']
             test_channels = [cfg['name'] for cfg in CHANNELS_CONFIG.values() if cfg['mode'] == 'test']
+            sync_age = reconciler.last_sync_age()
+            sync_status = f"{sync_age:.0f}s ago" if sync_age is not None else "never"
             status_msg = (
                 f"**Bot Status: OPERATIONAL**\n"
                 f"**Global Simulation Mode:** `{sim_status}`\n"
                 f"**Live-Mode Channels:** `{'`, `'.join(live_channels) or 'None'}`\n"
-                f"**Test-Mode Channels:** `{'`, `'.join(test_channels) or 'None'}`"
+                f"**Test-Mode Channels:** `{'`, `'.join(test_channels) or 'None'}`\n"
+                f"**Last Broker Sync:** `{sync_status}`\n"
+                f"**Entries Awaiting Fill:** `{order_tracker.pending_count()}`\n"
+                f"**Circuit Breakers:** `{openai_breaker.status_line()}`, `{robinhood_breaker.status_line()}`\n"
+                f"**Gateway:** `{'lean' if LEAN_GATEWAY else 'default'}, startup {self.startup_seconds or 0:.1f}s, "
+                f"peak memory {_peak_memory_mb() or 0:.0f} MB, {GATEWAY_EVENTS_FILTERED.value():.0f} events filtered`"
             )
             await message.channel.send(status_msg)
         
+        elif command == "!stats":
+            if len(parts) < 2:
+                await message.channel.send("Usage: `!stats <channel> [today|month|all|7d|12h|4w]`")
+                return
+            channel_name = next((cfg['name'] for cfg in CHANNELS_CONFIG.values() if cfg['name'].lower() == parts[1]), None)
+            if not channel_name:
+                await message.channel.send(f"❌ Unknown channel `{parts[1]}`.")
+                return
+            try:
+                since, range_label = parse_range(parts[2] if len(parts) > 2 else None)
+            except ValueError as e:
+                await message.channel.send(f"❌ {e}")
+                return
+            stats = await self.loop.run_in_executor(None, signal_store.get_stats, channel_name, since)
+            counts = ", ".join(f"{action}: {count}" for action, count in sorted(stats['counts'].items())) or "none"
+            outcomes = ", ".join(f"{outcome}: {count}" for outcome, count in sorted(stats['outcomes'].items())) or "none"
+            performance = (
+                f"{stats['closed_trades']} closed, win rate {stats['win_rate']:.0%}, avg return {stats['avg_return']:+.1%}"
+                if stats['closed_trades'] else "no closed trades"
+            )
+            await message.channel.send(
+                f"**{channel_name} Stats ({range_label}):**\n"
+                f"**Messages:** `{stats['messages']}` (`{outcomes}`)\n"
+                f"**Signals:** `{counts}`\n"
+                f"**Parse Errors:** `{stats['errors']}`\n"
+                f"**Performance:** `{performance}`"
+            )
+
+        elif command == "!history":
+            if len(parts) < 2:
+                await message.channel.send("Usage: `!history <ticker>`")
+                return
+            rows = await self.loop.run_in_executor(None, signal_store.get_history, parts[1])
+            if not rows:
+                await message.channel.send(f"No signal history for `{parts[1].upper()}`.")
+                return
+            lines = [
+                f"{datetime.utcfromtimestamp(created_at):%m-%d %H:%M} {channel} {action.upper()} {strike or ''}{(opt_type or '')[:1].upper()} "
+                f"{expiration or ''} @ {price if price is not None else '-'} [{mode}] {(summary or '')[:60]}"
+                for created_at, channel, action, strike, opt_type, expiration, price, mode, order_id, summary in rows
+            ]
+            await message.channel.send(f"**History for {parts[1].upper()}:**\n```\n" + "\n".join(lines) + "\n```")
+
         elif command == "!positions":
             await message.channel.send("⏳ Fetching live account positions...")
             pos_string = await self.get_positions_string()
@@ -299,7 +690,7 @@ class MyClient(discord.Client):
 
         elif command == "!portfolio":
             await message.channel.send("⏳ Fetching live account portfolio value...")
-            portfolio_value = await self.loop.run_in_executor(None, live_trader.get_portfolio_value)
+            portfolio_value = await async_live_trader.get_portfolio_value()
             await message.channel.send(f"💰 **Total Portfolio Value:** ${portfolio_value:,.2f}")
 
         elif command == "!reconnect":
@@ -309,16 +700,40 @@ class MyClient(discord.Client):
         elif command == "!cancel_all":
             await message.channel.send("⏳ Canceling ALL open orders on the live account...")
             try:
-                orders = await self.loop.run_in_executor(None, live_trader.get_all_open_option_orders)
+                orders = await async_live_trader.get_all_open_option_orders()
                 if not orders:
                     await message.channel.send("✅ No open orders to cancel.")
                     return
-                for order in orders:
-                    await self.loop.run_in_executor(None, live_trader.cancel_option_order, order['id'])
+                await asyncio.gather(*(async_live_trader.cancel_option_order(order['id']) for order in orders))
                 await message.channel.send(f"✅ Canceled {len(orders)} open order(s).")
             except Exception as e:
                 await message.channel.send(f"❌ Error canceling orders: {e}")
 
+        elif command == "!profile":
+            try:
+                seconds = float(parts[1]) if len(parts) > 1 else 30.0
+            except ValueError:
+                await message.channel.send("Usage: `!profile <seconds>`")
+                return
+            if not 0 < seconds <= PROFILE_MAX_SECONDS:
+                await message.channel.send(f"❌ Profile duration must be between 0 and {PROFILE_MAX_SECONDS} seconds.")
+                return
+            if self.active_profiler:
+                await message.channel.send("⏳ A profile is already running.")
+                return
+            self.active_profiler = SamplingProfiler(interval=PROFILE_SAMPLE_INTERVAL_SECONDS)
+            await message.channel.send(f"🔬 Profiling all threads for {seconds:.0f}s...")
+            try:
+                self.active_profiler.start()
+                await asyncio.sleep(seconds)
+                await self.loop.run_in_executor(None, self.active_profiler.stop)
+                path = await self.loop.run_in_executor(None, self.active_profiler.write_collapsed, PROFILE_OUTPUT_DIR)
+                summary = self.active_profiler.summary()
+            finally:
+                self.active_profiler.stop()
+                self.active_profiler = None
+            await message.channel.send(f"**Profile ({path}):**\n```\n{summary[:1800]}\n```")
+
 # --- Main Entrypoint ---
 if __name__ == "__main__":
     discord_client = MyClient()
@@ -0,0 +1,59 @@
+# message_cursor.py
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+class MessageCursor:
+    """
+    A thread-safe, persisted record of the last processed message ID in each
+    monitored channel, used to backfill whatever was missed while the bot was
+    down or disconnected. It also remembers recently processed message IDs so a
+    message seen both live and in a backfill is only handled once.
+    """
+    def __init__(self, track_file: str, recent_limit: int = 2000):
+        self.track_file = track_file
+        self.recent_limit = recent_limit
+        self._lock = Lock()
+        self._cursors = self._load() # channel ID string -> last processed message ID
+        self._recent = OrderedDict() # message ID -> None, oldest first
+
+    def _load(self) -> dict:
+        if os.path.exists(self.track_file):
+            with open(self.track_file, 'r') as f:
+                try:
+                    return {channel_id: int(message_id) for channel_id, message_id in json.load(f).items()}
+                except (json.JSONDecodeError, AttributeError, TypeError, ValueError):
+                    return {}
+        return {}
+
+    def _save(self):
+        with open(self.track_file, 'w') as f:
+            json.dump(self._cursors, f, indent=2)
+
+    def get(self, channel_id: int) -> int | None:
+        with self._lock:
+            return self._cursors.get(str(channel_id))
+
+    def snapshot(self) -> dict:
+        """Returns a copy of every channel's cursor (channel ID string -> message ID)."""
+        with self._lock:
+            return dict(self._cursors)
+
+    def mark_processed(self, channel_id: int, message_id: int) -> bool:
+        """
+        Records a message as processed and advances the channel's cursor.
+        Returns False if the message was already processed (a duplicate).
+        """
+        channel_id_str = str(channel_id)
+        with self._lock:
+            if message_id in self._recent:
+                return False
+            self._recent[message_id] = None
+            if len(self._recent) > self.recent_limit:
+                self._recent.popitem(last=False)
+            # Snowflake IDs increase over time, so the cursor only ever moves forward
+            if message_id > self._cursors.get(channel_id_str, 0):
+                self._cursors[channel_id_str] = message_id
+                self._save()
+        return True
@@ -0,0 +1,201 @@
+# metrics.py
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from aiohttp import web
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """
+    Common base for all metric types. Values are keyed by a tuple of label values,
+    and every update is a single dict operation under a short lock so recording
+    from the trade threads costs next to nothing.
+    """
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def set_function(self, function):
+        """
+        Computes the gauge at scrape time instead of on the hot path.
+        `function` returns a dict mapping label-value tuples to values.
+        """
+        self._function = function
+
+    def _render_samples(self) -> list[str]:
+        if self._function is None:
+            return super()._render_samples()
+        try:
+            items = self._function().items()
+        except Exception as e:
+            print(f"❌ Metrics: Failed to collect gauge {self.name}: {e}")
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (last slot is +Inf), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            items = [(key, (list(state[0]), state[1], state[2])) for key, state in self._values.items()]
+        lines = []
+        for key, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric and renders them in the Prometheus text exposition format."""
+    def __init__(self):
+        self._metrics = []
+        self._runner = None
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+    async def _handle_metrics(self, request):
+        return web.Response(text=self.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start_server(self, host: str, port: int):
+        """Serves GET /metrics on the running event loop. Safe to call more than once."""
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        print(f"✅ Metrics endpoint listening on http://{host}:{port}/metrics")
+
+
+# Create a single, global registry and the pipeline metrics used by the bot
+metrics = MetricsRegistry()
+
+MESSAGES_RECEIVED = metrics.register(Counter(
+    "rhtb_messages_received_total", "Messages received from monitored channels.", ("channel",)))
+PARSE_OUTCOMES = metrics.register(Counter(
+    "rhtb_parse_outcomes_total", "Parser results by outcome (signal, no_signal, error).", ("channel", "outcome")))
+LLM_LATENCY = metrics.register(Histogram(
+    "rhtb_llm_call_seconds", "Latency of LLM parse calls.", ("channel",)))
+HEDGED_REQUESTS = metrics.register(Counter(
+    "rhtb_llm_hedged_requests_total", "Hedged LLM requests by winning request (primary, hedge, none, capped).", ("channel", "winner")))
+BROKER_LATENCY = metrics.register(Histogram(
+    "rhtb_broker_call_seconds", "Latency of Robinhood API calls.", ("call",)))
+EXECUTOR_QUEUE_DEPTH = metrics.register(Gauge(
+    "rhtb_executor_queue_depth", "Trade tasks submitted to the executor and not yet finished."))
+WEBHOOK_FAILURES = metrics.register(Counter(
+    "rhtb_webhook_failures_total", "Discord webhook posts that failed.", ("reason",)))
+GATEWAY_EVENTS_FILTERED = metrics.register(Counter(
+    "rhtb_gateway_events_filtered_total", "Gateway events from unmonitored channels dropped before parsing."))
+OPEN_POSITIONS = metrics.register(Gauge(
+    "rhtb_open_positions", "Positions tracked by the PositionManager.", ("channel",)))
+CIRCUIT_STATE = metrics.register(Gauge(
+    "rhtb_circuit_breaker_state", "Circuit breaker state per upstream (0 closed, 1 half-open, 2 open).", ("upstream",)))
+CIRCUIT_REJECTIONS = metrics.register(Counter(
+    "rhtb_circuit_breaker_rejections_total", "Calls failed fast because the upstream's circuit breaker was open.", ("upstream",)))
@@ -0,0 +1,95 @@
+# order_aggregator.py
+from threading import Event, Lock, Timer
+from trader import option_contract_key
+
+class _Batch:
+    def __init__(self):
+        self.requests = []
+        self.callbacks = []
+        self.done = Event()
+        self.result = None
+
+class OrderAggregator:
+    """
+    Nets same-contract buys from different channels that arrive within `window`
+    seconds into one broker order and one protective stop. The first buy for a
+    contract opens a batch that a timer thread submits when the window closes, so
+    no trade thread sits out the window; the combined order is registered with the
+    OrderTracker, which allocates fills back to each channel in proportion to the
+    size it asked for.
+    """
+    def __init__(self, order_tracker, window: float = 0.15):
+        self.order_tracker = order_tracker
+        self.window = window
+        self._lock = Lock()
+        self._batches = {} # (trader id, contract key) -> open _Batch
+
+    def submit_buy(self, trader, symbol, strike, expiration, opt_type, quantity: int, limit_price: float,
+                   stop_price: float, allocation: dict, on_result=None) -> dict | None:
+        """
+        Joins (or opens) the batch for this contract. The shared result is
+        {"order_id", "response", "quantity", "limit_price", "stop_price", "allocations"}.
+        With `on_result`, returns at once and the callback receives the result from the
+        thread that submits the batch; without it, blocks until the batch is submitted.
+        `allocation` identifies the requesting channel (e.g. channel_id, trade_id, label).
+        """
+        allocation = {**allocation, "quantity": int(quantity)}
+        request = {"limit_price": limit_price, "stop_price": stop_price, "allocation": allocation}
+        key = (id(trader), option_contract_key(symbol, strike, expiration, opt_type))
+
+        with self._lock:
+            batch = self._batches.get(key)
+            is_leader = batch is None
+            if is_leader:
+                batch = self._batches[key] = _Batch()
+            batch.requests.append(request)
+            if on_result:
+                batch.callbacks.append(on_result)
+
+        if is_leader:
+            args = (key, batch, trader, symbol, strike, expiration, opt_type)
+            if self.window > 0:
+                timer = Timer(self.window, self._flush, args)
+                timer.daemon = True
+                timer.start()
+            else:
+                self._flush(*args)
+        if on_result:
+            return None
+        batch.done.wait()
+        return batch.result
+
+    def _flush(self, key, batch: _Batch, trader, symbol, strike, expiration, opt_type):
+        with self._lock:
+            del self._batches[key] # Later arrivals open a new batch; this one can no longer grow
+        try:
+            batch.result = self._submit(trader, symbol, strike, expiration, opt_type, batch.requests)
+        except Exception as e:
+            batch.result = {"order_id": None, "response": f"{e}", "allocations": [r["allocation"] for r in batch.requests]}
+        finally:
+            batch.done.set()
+        for callback in batch.callbacks:
+            try:
+                callback(batch.result)
+            except Exception as e:
+                print(f"❌ Coalesced order callback failed: {e}")
+
+    def _submit(self, trader, symbol, strike, expiration, opt_type, requests: list) -> dict:
+        allocations = [request["allocation"] for request in requests]
+        quantity = sum(allocation["quantity"] for allocation in allocations)
+        # The highest limit keeps every participant's fill chance; the highest stop is the tightest protection.
+        limit_price = max(request["limit_price"] for request in requests)
+        stop_price = max(request["stop_price"] for request in requests)
+        label = "+".join(allocation.get("label", "?") for allocation in allocations)
+        for allocation in allocations:
+            allocation.update(shared=len(allocations) > 1, stop_price=stop_price)
+        if len(requests) > 1:
+            print(f"🔗 Coalesced {len(requests)} buys for {symbol} {strike}{opt_type} ({label}) into {quantity}x @ {limit_price:.2f}")
+
+        response = trader.place_option_buy_order(symbol, strike, expiration, opt_type, quantity, limit_price)
+        order_id = (response or {}).get("id")
+        if order_id:
+            self.order_tracker.track_entry(trader, order_id, symbol, strike, expiration, opt_type, quantity,
+                                           stop_price, label=label, allocations=allocations)
+        return {"order_id": order_id, "response": response, "quantity": quantity, "limit_price": limit_price,
+                "stop_price": stop_price, "allocations": allocations}
@@ -0,0 +1,271 @@
+# order_tracker.py
+import asyncio
+import time
+from threading import Lock
+
+# Robinhood order states after which an order will never fill further
+TERMINAL_STATES = {"filled", "cancelled", "rejected", "failed", "expired"}
+# Rejected stops are retried every cycle; after this many in a row the fill is reported unprotected
+MAX_STOP_ATTEMPTS = 5
+
+def allocate_fills(filled: int, quantities: list[int]) -> list[int]:
+    """Splits `filled` contracts in proportion to `quantities` (largest remainder, so the parts sum to `filled`)."""
+    total = sum(quantities)
+    if not total:
+        return [0] * len(quantities)
+    shares = [filled * quantity / total for quantity in quantities]
+    allocated = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: shares[i] - allocated[i], reverse=True)
+    for i in by_remainder[:filled - sum(allocated)]:
+        allocated[i] += 1
+    return allocated
+
+class OrderTracker:
+    """
+    Watches submitted entry orders and places protective stops only against
+    contracts that actually filled. All pending orders are checked with one
+    batched open-orders call per trader per cycle; an order is looked up on its
+    own only once it has left the open list. Partial fills resize the stop, and
+    entries still unfilled after `fill_timeout` seconds are cancelled. Trims and
+    exits are reported through reduce(), so the stop never covers contracts a
+    channel has already sold. Exit sells are tracked too: one still unfilled after
+    `exit_reprice_after` seconds is cancelled and re-sent at a fresh price off the bid.
+    """
+    def __init__(self, poll_interval: float = 2.0, fill_timeout: float = 300.0, on_orders_changed=None, on_fill=None,
+                 exit_reprice_after: float = 15.0, exit_max_reprices: int = 3):
+        self.poll_interval = poll_interval
+        self.fill_timeout = fill_timeout
+        self.exit_reprice_after = exit_reprice_after
+        self.exit_max_reprices = exit_max_reprices
+        self.on_orders_changed = on_orders_changed # Called after we place or cancel orders
+        self.on_fill = on_fill # Called with (allocation, filled quantity) when a channel's share of the fill grows
+        self._lock = Lock()
+        self._pending = {} # entry order ID -> tracking state
+        self._exits = {} # exit sell order ID -> tracking state
+
+    def track_entry(self, trader, order_id: str, symbol, strike, expiration, opt_type, quantity: int, stop_price: float,
+                    label: str = "", allocations: list[dict] = None):
+        """
+        Registers a submitted buy; its stop will be placed as it fills.
+        `allocations` lists the channels sharing the order, each a dict with at least
+        a "quantity"; fills are split between them in proportion to that quantity.
+        """
+        allocations = allocations or [{"label": label, "quantity": int(quantity)}]
+        for allocation in allocations:
+            allocation.setdefault("filled", 0)
+            allocation.setdefault("sold", 0)
+            allocation.setdefault("closed", False)
+        with self._lock:
+            self._pending[order_id] = {
+                "trader": trader, "symbol": symbol, "strike": strike, "expiration": expiration,
+                "type": opt_type, "quantity": int(quantity), "stop_price": stop_price, "label": label,
+                "filled": 0, "stop_order_id": None, "stop_quantity": 0, "stop_failures": 0, "stop_stale": False,
+                "submitted_at": time.monotonic(), "cancel_requested": False, "allocations": allocations,
+            }
+
+    def track_exit(self, trader, order_id: str, symbol, strike, expiration, opt_type, quantity: int, label: str = ""):
+        """Registers a submitted trim or exit sell so it is re-priced if it does not fill."""
+        with self._lock:
+            self._exits[order_id] = {
+                "trader": trader, "symbol": symbol, "strike": strike, "expiration": expiration, "type": opt_type,
+                "quantity": int(quantity), "label": label, "sold": 0, "reprices": 0,
+                "submitted_at": time.monotonic(), "cancel_requested": False,
+            }
+
+    def reduce(self, trade_id: str, quantity: int = None) -> bool:
+        """
+        Records that a channel sold `quantity` contracts of a tracked entry (all of them, now
+        and from any later fills, when None). The caller has canceled the contract's open
+        orders, so the stop is re-placed next cycle over what the other channels still hold.
+        Returns False when no pending entry has an allocation for `trade_id`.
+        """
+        found = False
+        with self._lock:
+            for entry in self._pending.values():
+                for allocation in entry["allocations"]:
+                    if allocation.get("trade_id") != trade_id:
+                        continue
+                    if quantity is None:
+                        allocation["closed"] = True
+                    else:
+                        allocation["sold"] += int(quantity)
+                    entry["stop_stale"] = True
+                    found = True
+        return found
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending) + len(self._exits)
+
+    @staticmethod
+    def _protected_quantity(entry: dict) -> int:
+        """Contracts the stop should cover: every channel's filled share, less what it has sold since."""
+        return sum(max(allocation["filled"] - allocation["sold"], 0)
+                   for allocation in entry["allocations"] if not allocation["closed"])
+
+    def _place_stop(self, entry: dict, quantity: int) -> str:
+        """
+        Places (or cancels and re-places, to resize) the stop so it covers `quantity` contracts.
+        The stop only counts as placed once the broker returns an order ID; otherwise the
+        entry is left uncovered so the next cycle tries again.
+        """
+        trader = entry["trader"]
+        contract = f"{entry['symbol']} {entry['strike']}{entry['type']}"
+        previous = entry["stop_quantity"]
+        if entry["stop_order_id"]:
+            trader.cancel_option_order(entry["stop_order_id"])
+            entry["stop_order_id"] = None
+            entry["stop_quantity"] = 0
+        if quantity <= 0:
+            return f"ℹ️ [{entry['label']}] Nothing left to protect on {contract}, no stop placed."
+
+        stop_order = trader.place_option_stop_loss_order(
+            entry["symbol"], entry["strike"], entry["expiration"], entry["type"], quantity, entry["stop_price"])
+        stop_order_id = (stop_order or {}).get("id")
+        if not stop_order_id:
+            entry["stop_failures"] += 1
+            return (f"❌ [{entry['label']}] Stop for {quantity}x {contract} @ {entry['stop_price']} not accepted "
+                    f"(attempt {entry['stop_failures']}/{MAX_STOP_ATTEMPTS}): {stop_order}")
+        entry["stop_order_id"] = stop_order_id
+        entry["stop_quantity"] = quantity
+        entry["stop_failures"] = 0
+        if previous:
+            return f"🔁 [{entry['label']}] Resized stop on {contract} to {quantity} @ {entry['stop_price']}"
+        return (f"🛡️ [{entry['label']}] Filled {entry['filled']}/{entry['quantity']} {contract}, "
+                f"placed stop on {quantity} @ {entry['stop_price']}")
+
+    def _allocate(self, entry: dict, filled: int):
+        allocations = entry["allocations"]
+        shares = allocate_fills(filled, [allocation["quantity"] for allocation in allocations])
+        for allocation, share in zip(allocations, shares):
+            if share != allocation["filled"]:
+                allocation["filled"] = share
+                if self.on_fill:
+                    self.on_fill(allocation, share)
+
+    def poll(self) -> list[str]:
+        """Blocking: runs one status cycle over every pending entry and exit and returns event notes."""
+        with self._lock:
+            tracked = [(order_id, entry, self._check_entry) for order_id, entry in self._pending.items()]
+            tracked += [(order_id, sale, self._check_exit) for order_id, sale in self._exits.items()]
+        if not tracked:
+            return []
+
+        notes = []
+        orders_changed = False
+        by_trader = {}
+        for item in tracked:
+            by_trader.setdefault(id(item[1]["trader"]), (item[1]["trader"], []))[1].append(item)
+
+        for trader, items in by_trader.values():
+            try:
+                open_orders = {order["id"]: order for order in trader.get_all_open_option_orders() or []}
+            except Exception as e:
+                notes.append(f"❌ Order status check failed: {e}")
+                continue
+
+            for order_id, entry, check in items:
+                try:
+                    order = open_orders.get(order_id) or trader.get_option_order_info(order_id) or {}
+                    orders_changed |= check(order_id, entry, order, notes)
+                except Exception as e:
+                    notes.append(f"❌ [{entry['label']}] Error tracking order {order_id}: {e}")
+
+        if orders_changed and self.on_orders_changed:
+            self.on_orders_changed()
+        return notes
+
+    def _check_entry(self, order_id: str, entry: dict, order: dict, notes: list) -> bool:
+        """One cycle for an entry: allocates new fills, keeps the stop sized, and times out stale entries."""
+        trader = entry["trader"]
+        state = order.get("state", "")
+        filled = int(float(order.get("processed_quantity") or 0))
+        orders_changed = False
+
+        if filled > entry["filled"]:
+            self._allocate(entry, filled)
+        entry["filled"] = filled
+
+        with self._lock:
+            protected = self._protected_quantity(entry)
+            stale, entry["stop_stale"] = entry["stop_stale"], False
+        if protected > entry["stop_quantity"] or (stale and (protected or entry["stop_order_id"])):
+            notes.append(self._place_stop(entry, protected))
+            orders_changed = True
+
+        if entry["stop_quantity"] < protected and entry["stop_failures"] >= MAX_STOP_ATTEMPTS:
+            with self._lock:
+                self._pending.pop(order_id, None)
+            notes.append(f"🚨 [{entry['label']}] Gave up placing a stop on {entry['symbol']} {entry['strike']}{entry['type']} "
+                         f"after {MAX_STOP_ATTEMPTS} attempts: {protected} contract(s) are UNPROTECTED.")
+        elif state in TERMINAL_STATES and (entry["stop_quantity"] < protected or entry["stop_stale"]):
+            pass # Filled but not yet covered: keep tracking so the stop is retried next cycle
+        elif state in TERMINAL_STATES:
+            with self._lock:
+                self._pending.pop(order_id, None)
+            if state != "filled":
+                notes.append(f"ℹ️ [{entry['label']}] Entry {entry['symbol']} {entry['strike']}{entry['type']} {state} "
+                             f"with {filled}/{entry['quantity']} filled.")
+        elif not entry["cancel_requested"] and time.monotonic() - entry["submitted_at"] > self.fill_timeout:
+            trader.cancel_option_order(order_id)
+            entry["cancel_requested"] = True
+            orders_changed = True
+            notes.append(f"⌛ [{entry['label']}] Entry {entry['symbol']} {entry['strike']}{entry['type']} unfilled after "
+                         f"{self.fill_timeout:.0f}s ({filled}/{entry['quantity']} filled). Canceling the rest.")
+        return orders_changed
+
+    def _check_exit(self, order_id: str, sale: dict, order: dict, notes: list) -> bool:
+        """
+        One cycle for an exit sell. Past `exit_reprice_after` it is cancelled; once the cancel
+        settles the unsold rest is sent again at a fresh price, up to `exit_max_reprices` times.
+        """
+        trader = sale["trader"]
+        state = order.get("state", "")
+        filled = int(float(order.get("processed_quantity") or 0))
+        contract = f"{sale['symbol']} {sale['strike']}{sale['type']}"
+        remaining = sale["quantity"] - sale["sold"] - filled
+
+        if state in TERMINAL_STATES:
+            with self._lock:
+                self._exits.pop(order_id, None)
+            if remaining <= 0:
+                return False
+            if not sale["cancel_requested"]:
+                notes.append(f"ℹ️ [{sale['label']}] Exit of {contract} {state} with {remaining} unsold.")
+                return False
+            sell_order = trader.place_option_market_sell_order(sale["symbol"], sale["strike"], sale["expiration"], sale["type"], remaining)
+            new_order_id = (sell_order or {}).get("id")
+            if not new_order_id:
+                notes.append(f"❌ [{sale['label']}] Re-priced exit of {remaining}x {contract} not accepted: {sell_order}")
+                return False
+            sale.update(sold=sale["sold"] + filled, reprices=sale["reprices"] + 1,
+                        submitted_at=time.monotonic(), cancel_requested=False)
+            with self._lock:
+                self._exits[new_order_id] = sale
+            notes.append(f"🔁 [{sale['label']}] Re-priced exit of {remaining}x {contract} @ {(sell_order or {}).get('price')} "
+                         f"({sale['reprices']}/{self.exit_max_reprices}).")
+            return True
+
+        if sale["cancel_requested"] or time.monotonic() - sale["submitted_at"] <= self.exit_reprice_after:
+            return False
+        if sale["reprices"] >= self.exit_max_reprices:
+            with self._lock:
+                self._exits.pop(order_id, None)
+            notes.append(f"⚠️ [{sale['label']}] Exit of {contract} still unfilled after {sale['reprices']} re-prices "
+                         f"({remaining} left). Leaving the order working.")
+            return False
+        trader.cancel_option_order(order_id)
+        sale["cancel_requested"] = True
+        return True
+
+    async def run(self, loop, report):
+        """Background task: polls pending entries and exits every `poll_interval` seconds."""
+        while True:
+            try:
+                if self.pending_count():
+                    notes = await loop.run_in_executor(None, self.poll)
+                    if notes:
+                        await report("\n".join(notes))
+            except Exception as e:
+                print(f"❌ Order tracker cycle failed: {e}")
+            await asyncio.sleep(self.poll_interval)
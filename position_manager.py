@@ -4,6 +4,16 @@ import os
 from threading import Lock
 import uuid
 
+def sellable_quantity(position: dict, held: int) -> int:
+    """
+    Contracts a trim or exit may sell out of `held` on the broker: all of them, or for a
+    coalesced (shared) entry only this channel's fill less what it has already trimmed.
+    """
+    if position.get("shared_stop_price") is None:
+        return held
+    remaining = int(position.get("filled_quantity") or 0) - int(position.get("sold_quantity") or 0)
+    return max(0, min(held, remaining))
+
 class PositionManager:
     """
     A thread-safe class to manage and persist the state of multiple open trades 
@@ -75,6 +85,11 @@ class PositionManager:
                         trade["expiration"] == trade_data.get("expiration") and
                         trade["type"] == trade_data.get("type")):
                         return trade
+                # Only the ticker is known (e.g. "trim SPY"): the newest position in that ticker
+                if trade_data.get("strike") is None:
+                    for trade in reversed(active_trades):
+                        if trade.get("symbol") == trade_data.get("ticker"):
+                            return trade
             
             # If no details provided, return the last trade added
             return active_trades[-1]
@@ -95,4 +110,36 @@ class PositionManager:
                     print(f"✅ PositionManager: Cleared position {trade_id} for channel {channel_id_str}")
                 if not self._positions[channel_id_str]:
                     del self._positions[channel_id_str] # Clean up empty list
-                    self._save()
\ No newline at end of file
+                    self._save()
+
+    def count_positions(self) -> dict:
+        """Returns the number of open positions tracked for each channel."""
+        with self._lock:
+            return {channel_id_str: len(trades) for channel_id_str, trades in self._positions.items()}
+
+    def get_positions(self) -> dict:
+        """Returns a snapshot copy of all tracked positions, keyed by channel ID string."""
+        with self._lock:
+            return {channel_id_str: [dict(trade) for trade in trades] for channel_id_str, trades in self._positions.items()}
+
+    def record_sale(self, channel_id: int, trade_id: str, quantity: int) -> bool:
+        """Adds `quantity` to a position's sold_quantity. Returns False if the position no longer exists."""
+        channel_id_str = str(channel_id)
+        with self._lock:
+            for trade in self._positions.get(channel_id_str, []):
+                if trade.get("trade_id") == trade_id:
+                    trade["sold_quantity"] = int(trade.get("sold_quantity") or 0) + int(quantity)
+                    self._save()
+                    return True
+        return False
+
+    def update_position(self, channel_id: int, trade_id: str, updates: dict) -> bool:
+        """Merges `updates` into a tracked position. Returns False if the position no longer exists."""
+        channel_id_str = str(channel_id)
+        with self._lock:
+            for trade in self._positions.get(channel_id_str, []):
+                if trade.get("trade_id") == trade_id:
+                    trade.update(updates)
+                    self._save()
+                    return True
+        return False
\ No newline at end of file
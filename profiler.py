@@ -0,0 +1,142 @@
+# profiler.py
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Leaf frames (file name, function) where a thread is blocked rather than running Python code.
+# Only used to tell CPU from waiting where per-thread CPU clocks are unavailable (e.g. Windows).
+IDLE_FRAMES = {
+    ("threading.py", "wait"), ("threading.py", "_wait_for_tstate_lock"), ("threading.py", "join"),
+    ("queue.py", "get"), ("thread.py", "_worker"), ("selectors.py", "select"),
+    ("ssl.py", "read"), ("ssl.py", "recv_into"), ("socket.py", "readinto"),
+    ("connection.py", "create_connection"),
+}
+
+# Thread and event-loop plumbing that sits under every stack; left out of the inclusive summaries
+PLUMBING_FILES = {"threading.py", "thread.py", "base_events.py", "events.py", "runners.py"}
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _is_idle(frame) -> bool:
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+def _is_plumbing(label: str) -> bool:
+    return label.rsplit("(", 1)[-1].split(":", 1)[0] in PLUMBING_FILES
+
+def _thread_cpu_time(ident: int) -> float | None:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+class SamplingProfiler:
+    """
+    A low-overhead sampling profiler for every thread in the process: the event
+    loop and the trade executor threads alike. A daemon thread snapshots all
+    stacks with sys._current_frames() every `interval` seconds, so the code being
+    profiled is never instrumented. Each sample counts toward wall-clock time, and
+    toward CPU time in proportion to the CPU the thread burned since the previous
+    sample. Stacks are kept in collapsed form ("thread;outer;...;leaf count"),
+    which flamegraph.pl and speedscope read directly.
+    """
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks = Counter() # collapsed stack -> wall-clock samples
+        self.cpu_stacks = Counter() # collapsed stack -> CPU seconds
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        started = last_sample = time.perf_counter()
+        last_cpu = {}
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last_sample = now - last_sample, now
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                cpu_now = _thread_cpu_time(ident)
+                if cpu_now is None:
+                    cpu_used = 0.0 if _is_idle(frame) else elapsed
+                else:
+                    # A thread seen for the first time has no baseline yet, so it is not charged
+                    cpu_used = min(max(cpu_now - last_cpu.get(ident, cpu_now), 0.0), elapsed)
+                    last_cpu[ident] = cpu_now
+                labels = []
+                while frame is not None and len(labels) < self.max_depth:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(thread_names.get(ident, f"thread-{ident}"))
+                stack = ";".join(reversed(labels))
+                self.stacks[stack] += 1
+                if cpu_used:
+                    self.cpu_stacks[stack] += cpu_used
+            self.samples += 1
+        self.duration = time.perf_counter() - started
+
+    def write_collapsed(self, directory: str) -> str:
+        """Writes <name>.wall.folded (sample counts) and <name>.cpu.folded (CPU microseconds); returns the path prefix."""
+        os.makedirs(directory, exist_ok=True)
+        prefix = os.path.join(directory, f"profile_{datetime.now():%Y%m%d_%H%M%S}")
+        with open(f"{prefix}.wall.folded", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(f"{prefix}.cpu.folded", "w") as f:
+            for stack, seconds in self.cpu_stacks.most_common():
+                if round(seconds * 1e6):
+                    f.write(f"{stack} {round(seconds * 1e6)}\n")
+        return prefix
+
+    def summary(self, top: int = 10) -> str:
+        """Top functions by CPU time (self and inclusive), by wall-clock time, and each thread's CPU share."""
+        cpu_self, cpu_total, wall_total, thread_cpu = Counter(), Counter(), Counter(), Counter()
+        for stack, seconds in self.cpu_stacks.items():
+            thread, *frames = stack.split(";")
+            thread_cpu[thread] += seconds
+            if frames:
+                cpu_self[frames[-1]] += seconds
+                for frame in set(frames):
+                    if not _is_plumbing(frame):
+                        cpu_total[frame] += seconds
+        for stack, count in self.stacks.items():
+            for frame in set(stack.split(";")[1:]):
+                if not _is_plumbing(frame):
+                    wall_total[frame] += count
+
+        cpu = sum(thread_cpu.values())
+        thread_samples = sum(self.stacks.values())
+        lines = [f"{self.samples} samples over {self.duration:.1f}s (every {self.interval * 1e3:.0f} ms), "
+                 f"{cpu:.2f}s CPU across all threads"]
+        if cpu:
+            lines.append("\nTop self (CPU):")
+            lines += [f"{seconds:7.3f}s  {frame}" for frame, seconds in cpu_self.most_common(top) if seconds >= 0.0005]
+            lines.append("\nTop inclusive (CPU):")
+            lines += [f"{seconds:7.3f}s  {frame}" for frame, seconds in cpu_total.most_common(top) if seconds >= 0.0005]
+        if thread_samples:
+            lines.append("\nTop inclusive (wall, share of thread samples):")
+            lines += [f"{count / thread_samples:6.1%}  {frame}" for frame, count in wall_total.most_common(top)]
+        if self.duration:
+            lines.append("\nThreads (CPU / wall):")
+            lines += [f"{seconds / self.duration:6.1%}  {thread}" for thread, seconds in thread_cpu.most_common(top)]
+        return "\n".join(lines)
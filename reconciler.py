@@ -0,0 +1,191 @@
+# reconciler.py
+import asyncio
+import time
+from threading import Lock
+from trader import option_contract_key
+
+class BrokerReconciler:
+    """
+    Periodically syncs broker positions and open orders into an in-memory view,
+    diffs them against the previous sync and the PositionManager, and repairs drift.
+    Exit and trim decisions can then be made against this view instead of paying
+    for a full broker lookup on every trade.
+    """
+    def __init__(self, trader, position_manager, live_channel_ids, is_active, interval: float = 30.0, max_age: float = 60.0):
+        self.trader = trader
+        self.position_manager = position_manager
+        self.live_channel_ids = {str(channel_id) for channel_id in live_channel_ids}
+        self.is_active = is_active # Callable: only reconcile while live trading is enabled
+        self.interval = interval
+        self.max_age = max_age
+        self._lock = Lock()
+        self._positions = {}            # contract key -> broker position
+        self._orders_by_instrument = {} # instrument URL -> [open orders]
+        self._pending_contracts = set() # contract keys with an open order
+        self._suspected_drift = set()   # (channel ID, trade ID) seen missing on the last sync
+        self._synced_at = 0.0
+        self._dirty = False
+        self._dirty_generation = 0
+        self._loop = None
+        self._wakeup = None
+
+    # --- In-memory view ---
+    def is_fresh(self) -> bool:
+        """True if the view was synced recently and none of our own orders have changed it since."""
+        with self._lock:
+            return not self._dirty and (time.monotonic() - self._synced_at) <= self.max_age
+
+    def last_sync_age(self) -> float | None:
+        with self._lock:
+            return time.monotonic() - self._synced_at if self._synced_at else None
+
+    def find_position(self, symbol, strike, expiration, opt_type):
+        try:
+            key = option_contract_key(symbol, strike, expiration, opt_type)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            return self._positions.get(key)
+
+    def get_open_orders_for_contract(self, instrument_url) -> list:
+        with self._lock:
+            return list(self._orders_by_instrument.get(instrument_url, []))
+
+    def mark_dirty(self):
+        """
+        Called after we place or cancel orders. The view is not trusted again until
+        the next sync, which is triggered immediately. Safe to call from any thread.
+        """
+        with self._lock:
+            self._dirty = True
+            self._dirty_generation += 1
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- Sync & diff ---
+    @staticmethod
+    def _position_key(pos: dict) -> str:
+        return option_contract_key(pos['chain_symbol'], pos['strike_price'], pos['expiration_date'], pos['type'])
+
+    @staticmethod
+    def _order_key(order: dict) -> str | None:
+        leg = (order.get('legs') or [{}])[0]
+        if not all(leg.get(field) for field in ('strike_price', 'expiration_date', 'option_type')) or not order.get('chain_symbol'):
+            return None
+        return option_contract_key(order['chain_symbol'], leg['strike_price'], leg['expiration_date'], leg['option_type'])
+
+    def sync(self) -> list[str]:
+        """
+        Blocking: fetches broker state, swaps in the new view and returns a list of
+        human-readable drift/change notes (empty when nothing changed).
+        Nothing is fetched while live trading is off (SIM mode).
+        """
+        if not self.is_active():
+            self._invalidate()
+            return []
+        with self._lock:
+            started_generation = self._dirty_generation
+        positions = self.trader.get_open_option_positions() or []
+        orders = self.trader.get_all_open_option_orders() or []
+
+        new_positions = {}
+        for pos in positions:
+            if float(pos.get('quantity', 0)) > 0:
+                new_positions[self._position_key(pos)] = pos
+        orders_by_instrument, pending_contracts = {}, set()
+        for order in orders:
+            instrument_url = (order.get('legs') or [{}])[0].get('option')
+            orders_by_instrument.setdefault(instrument_url, []).append(order)
+            order_key = self._order_key(order)
+            if order_key:
+                pending_contracts.add(order_key)
+
+        with self._lock:
+            first_sync = not self._synced_at
+            previous = self._positions
+            self._positions = new_positions
+            self._orders_by_instrument = orders_by_instrument
+            self._pending_contracts = pending_contracts
+            self._synced_at = time.monotonic()
+            # Orders placed while we were fetching keep the view dirty until the next sync
+            self._dirty = self._dirty_generation != started_generation
+
+        notes = []
+        # Incremental diff against the previous sync
+        if not first_sync:
+            for key in new_positions.keys() - previous.keys():
+                notes.append(f"➕ Broker opened {key} x{int(float(new_positions[key]['quantity']))}")
+            for key in previous.keys() - new_positions.keys():
+                notes.append(f"➖ Broker closed {key}")
+            for key in new_positions.keys() & previous.keys():
+                old_qty, new_qty = float(previous[key]['quantity']), float(new_positions[key]['quantity'])
+                if old_qty != new_qty:
+                    notes.append(f"🔁 Broker quantity for {key}: {int(old_qty)} -> {int(new_qty)}")
+
+        notes.extend(self._repair_drift(new_positions, pending_contracts))
+        return notes
+
+    def _invalidate(self):
+        """Drops the view so it is not trusted, or diffed against, when live trading resumes."""
+        with self._lock:
+            self._positions = {}
+            self._orders_by_instrument = {}
+            self._pending_contracts = set()
+            self._synced_at = 0.0
+        self._suspected_drift = set()
+
+    def _repair_drift(self, broker_positions: dict, pending_contracts: set) -> list[str]:
+        """
+        Clears live-channel positions that exist in memory but not on the broker.
+        A position must be missing on two consecutive syncs before it is cleared,
+        so a buy placed mid-sync is never mistaken for drift.
+        """
+        notes = []
+        tracked_keys = set()
+        still_missing = set()
+        for channel_id_str, trades in self.position_manager.get_positions().items():
+            if channel_id_str not in self.live_channel_ids:
+                continue
+            for trade in trades:
+                try:
+                    key = option_contract_key(trade['symbol'], trade['strike'], trade['expiration'], trade['type'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                tracked_keys.add(key)
+                if key in broker_positions or key in pending_contracts:
+                    continue
+                marker = (channel_id_str, trade['trade_id'])
+                if marker in self._suspected_drift:
+                    self.position_manager.clear_position(int(channel_id_str), trade['trade_id'])
+                    notes.append(f"🧹 Drift repaired: {key} (channel {channel_id_str}) not on broker, cleared from memory.")
+                else:
+                    still_missing.add(marker)
+        self._suspected_drift = still_missing
+
+        for key in broker_positions.keys() - tracked_keys:
+            notes.append(f"⚠️ Untracked broker position: {key}")
+        return notes
+
+    async def run(self, loop, report):
+        """Background task: syncs every `interval` seconds, or sooner after mark_dirty()."""
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        reported_untracked = set()
+        while True:
+            try:
+                if self.is_active():
+                    notes = await loop.run_in_executor(None, self.sync)
+                else:
+                    notes = self.sync() # SIM mode: drops the view without touching the broker
+                # Untracked positions are reported once, not on every sync
+                fresh_notes = [note for note in notes if note not in reported_untracked]
+                reported_untracked.update(note for note in notes if note.startswith("⚠️ Untracked"))
+                if fresh_notes:
+                    await report("**Broker Reconciliation:**\n" + "\n".join(fresh_notes))
+            except Exception as e:
+                print(f"❌ Reconciliation failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,201 @@
+# signal_store.py
+import atexit
+import json
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    message_id   INTEGER PRIMARY KEY,
+    channel_id   INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    posted_at    REAL NOT NULL,
+    raw_msg      TEXT,
+    parse_outcome TEXT -- signal, no_signal or error; NULL until the message is parsed
+);
+CREATE INDEX IF NOT EXISTS idx_messages_channel_time ON messages (channel_name, posted_at);
+
+CREATE TABLE IF NOT EXISTS executions (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    message_id     INTEGER,
+    channel_name   TEXT NOT NULL,
+    ticker         TEXT,
+    action         TEXT NOT NULL,
+    strike         REAL,
+    opt_type       TEXT,
+    expiration     TEXT,
+    price,
+    size           TEXT,
+    mode           TEXT,
+    trade_id       TEXT,
+    order_id       TEXT,
+    result_summary TEXT,
+    parsed_json    TEXT,
+    created_at     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_executions_channel_time ON executions (channel_name, created_at);
+CREATE INDEX IF NOT EXISTS idx_executions_ticker_time ON executions (ticker, created_at);
+CREATE INDEX IF NOT EXISTS idx_executions_trade_id ON executions (trade_id);
+"""
+
+INSERT_MESSAGE = "INSERT OR IGNORE INTO messages (message_id, channel_id, channel_name, posted_at, raw_msg) VALUES (?, ?, ?, ?, ?)"
+UPDATE_PARSE_OUTCOME = "UPDATE messages SET parse_outcome = ? WHERE message_id = ?"
+INSERT_EXECUTION = """INSERT INTO executions (message_id, channel_name, ticker, action, strike, opt_type, expiration, price, size,
+    mode, trade_id, order_id, result_summary, parsed_json, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+_RANGE_PATTERN = re.compile(r"^(\d+)([hdw])$")
+_RANGE_UNITS = {"h": 3600, "d": 86400, "w": 7 * 86400}
+
+def parse_range(range_text: str | None) -> tuple[float, str]:
+    """
+    Converts a range like "today", "month", "7d", "12h", "4w" or "all" into a
+    (since_timestamp, label) pair. Defaults to the current month.
+    """
+    text = (range_text or "month").lower()
+    now = datetime.now(timezone.utc)
+    if text == "all":
+        return 0.0, "all time"
+    if text == "today":
+        return now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp(), "today"
+    if text in ("month", "mtd"):
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp(), "this month"
+    match = _RANGE_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Unknown range '{range_text}'. Use today, month, all, or e.g. 12h, 7d, 4w.")
+    amount, unit = int(match.group(1)), match.group(2)
+    return time.time() - amount * _RANGE_UNITS[unit], f"last {text}"
+
+
+class SignalStore:
+    """
+    An embedded, indexed SQLite store of every received message and parsed signal,
+    with its execution summary and broker order ID. Writes are queued and applied
+    in batches by a background thread so the trade threads never wait on disk.
+    """
+    def __init__(self, db_path: str = "signal_history.db", batch_size: int = 200, flush_interval: float = 0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._read_lock = threading.Lock()
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # Databases created before parse outcomes were recorded
+            if "parse_outcome" not in {row[1] for row in conn.execute("PRAGMA table_info(messages)")}:
+                conn.execute("ALTER TABLE messages ADD COLUMN parse_outcome TEXT")
+        self._read_conn = sqlite3.connect(self.db_path, check_same_thread=False)
+
+        self._writer = threading.Thread(target=self._writer_loop, name="signal-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # --- Writes (non-blocking) ---
+    def record_message(self, message_id: int, channel_id: int, channel_name: str, raw_msg: str, posted_at: float):
+        self._queue.put((INSERT_MESSAGE, (message_id, channel_id, channel_name, posted_at, raw_msg)))
+
+    def record_parse_outcome(self, message_id: int, outcome: str):
+        self._queue.put((UPDATE_PARSE_OUTCOME, (outcome, message_id)))
+
+    def record_execution(self, message_id, channel_name: str, trade_obj: dict, result_summary: str,
+                         mode: str, trade_id: str = None, order_id: str = None):
+        price = trade_obj.get("price")
+        self._queue.put((INSERT_EXECUTION, (
+            message_id, channel_name, trade_obj.get("ticker"), trade_obj.get("action", "null"),
+            trade_obj.get("strike"), trade_obj.get("type"), trade_obj.get("expiration"),
+            price if isinstance(price, (int, float, str)) else None, trade_obj.get("size"),
+            mode, trade_id, order_id, result_summary, json.dumps(trade_obj, default=str), time.time(),
+        )))
+
+    def _writer_loop(self):
+        conn = sqlite3.connect(self.db_path)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Drain whatever else is waiting so it lands in the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    next_item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    stop = True
+                    break
+                batch.append(next_item)
+            self._write_batch(conn, batch)
+            if stop:
+                break
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        # Consecutive writes of the same statement share an executemany; order is kept so an
+        # outcome update never runs before the insert of its message
+        grouped = []
+        for sql, params in batch:
+            if grouped and grouped[-1][0] == sql:
+                grouped[-1][1].append(params)
+            else:
+                grouped.append((sql, [params]))
+        try:
+            with conn:
+                for sql, rows in grouped:
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            print(f"❌ SignalStore: Failed to write batch of {len(batch)} rows: {e}")
+
+    def close(self):
+        """Flushes pending writes and stops the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+    # --- Reads (blocking; run them in an executor) ---
+    def _query(self, sql: str, params: tuple) -> list:
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    def get_stats(self, channel_name: str, since: float) -> dict:
+        """Signal counts by action, parse outcomes, and the return on closed trades for a channel."""
+        counts = dict(self._query(
+            "SELECT action, COUNT(*) FROM executions WHERE channel_name = ? AND created_at >= ? GROUP BY action",
+            (channel_name, since)))
+        outcomes = dict(self._query(
+            "SELECT COALESCE(parse_outcome, 'pending'), COUNT(*) FROM messages WHERE channel_name = ? AND posted_at >= ? GROUP BY 1",
+            (channel_name, since)))
+        # Pair each buy with the exit that closed the same tracked trade
+        closed = self._query(
+            """SELECT b.price, e.price FROM executions b
+               JOIN executions e ON e.trade_id = b.trade_id AND e.action IN ('exit', 'stop')
+               WHERE b.channel_name = ? AND b.action = 'buy' AND b.created_at >= ? AND b.trade_id IS NOT NULL""",
+            (channel_name, since))
+        returns = []
+        for entry_price, exit_price in closed:
+            if isinstance(exit_price, str) and exit_price.upper() == "BE":
+                returns.append(0.0)
+            elif isinstance(entry_price, (int, float)) and isinstance(exit_price, (int, float)) and entry_price > 0:
+                returns.append((exit_price - entry_price) / entry_price)
+        return {
+            "messages": sum(outcomes.values()),
+            "outcomes": outcomes,
+            "counts": counts,
+            "errors": outcomes.get("error", 0),
+            "closed_trades": len(returns),
+            "win_rate": sum(1 for r in returns if r > 0) / len(returns) if returns else None,
+            "avg_return": sum(returns) / len(returns) if returns else None,
+        }
+
+    def get_history(self, ticker: str, limit: int = 15) -> list[tuple]:
+        """Most recent signals for a ticker, newest first."""
+        return self._query(
+            """SELECT created_at, channel_name, action, strike, opt_type, expiration, price, mode, order_id, result_summary
+               FROM executions WHERE ticker = ? ORDER BY created_at DESC LIMIT ?""",
+            (ticker.replace('$', '').upper(), limit))
@@ -0,0 +1,72 @@
+# tests/test_base_parser.py
+import threading
+
+from channels.base_parser import BaseParser, _scan_early_fields
+
+
+def test_early_fields_wait_for_action_and_ticker():
+    assert _scan_early_fields('{"action": "buy", "ticker": "SP') is None
+    assert _scan_early_fields('{"action": "buy", "ticker": "SPY"') == {"action": "buy", "ticker": "SPY"}
+    assert _scan_early_fields('[{"ticker": "QQQ", "action": "trim"}]') == {"ticker": "QQQ", "action": "trim"}
+
+def test_early_fields_stay_inside_the_first_signal():
+    reply = '{"signals": [{"action": "exit", "ticker": null, "strike": 1}, {"action": "buy", "ticker": "SPY"}]}'
+    for end in range(len(reply) + 1):
+        assert _scan_early_fields(reply[:end]) is None
+
+def test_early_fields_ignore_braces_inside_strings():
+    assert _scan_early_fields('{"action": "buy", "note": "a } \\" {", "ticker": "SPY"') == {"action": "buy", "ticker": "SPY"}
+
+class _Chunk:
+    def __init__(self, text):
+        self.choices = [type("Choice", (), {"delta": type("Delta", (), {"content": text, "refusal": None})()})()]
+
+class _FakeStream:
+    def __init__(self, chunks, stall=False):
+        self.chunks = chunks
+        self.stall = stall
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield chunk
+        if self.stall:
+            self.closed.wait(5)
+            raise ConnectionError("stream closed")
+
+    def close(self):
+        self.closed.set()
+
+class _FakeClient:
+    def __init__(self, streams):
+        self.streams = iter(streams)
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        return next(self.streams)
+
+class _Parser(BaseParser):
+    def build_prompt(self) -> str:
+        return "prompt"
+
+def _hedged_parser(streams, **hedge):
+    config = {"hedge": {"enabled": True, "default_budget_seconds": 0.05, **hedge}}
+    return _Parser(_FakeClient(streams), 1, "Test", config)
+
+def test_hedge_winner_aborts_the_slow_request():
+    slow = _FakeStream([_Chunk('{"action": ')], stall=True)
+    fast = _FakeStream([_Chunk('{"action": "buy", "ticker": "SPY"}')])
+    parser = _hedged_parser([slow, fast])
+
+    assert parser.parse_message({})[0]["ticker"] == "SPY"
+    assert slow.closed.wait(1)
+
+def test_first_slow_request_can_hedge():
+    slow = _FakeStream([], stall=True)
+    fast = _FakeStream([_Chunk('{"action": "exit", "ticker": "QQQ"}')])
+    parser = _hedged_parser([slow, fast], max_extra_fraction=0.10)
+
+    assert parser.parse_message({})[0]["action"] == "exit"
+    assert parser._hedges_sent == 1
+    assert not parser._reserve_hedge() # 1 hedge in 1 request: the seeded budget is spent
@@ -0,0 +1,56 @@
+# tests/test_order_aggregator.py
+import threading
+
+from order_aggregator import OrderAggregator
+
+
+class FakeTracker:
+    def __init__(self):
+        self.entries = []
+
+    def track_entry(self, trader, order_id, *args, **kwargs):
+        self.entries.append((order_id, args, kwargs))
+
+
+class FakeTrader:
+    def __init__(self):
+        self.buys = []
+        self.lock = threading.Lock()
+
+    def place_option_buy_order(self, symbol, strike, expiration, opt_type, quantity, limit_price):
+        with self.lock:
+            self.buys.append((quantity, limit_price))
+            return {"id": f"buy-{len(self.buys)}"}
+
+
+def submit(aggregator, trader, label, quantity, limit_price, stop_price, **kwargs):
+    return aggregator.submit_buy(trader, "SPY", 500.0, "2026-12-18", "call", quantity, limit_price, stop_price,
+                                 allocation={"label": label, "trade_id": label}, **kwargs)
+
+def test_buys_within_the_window_become_one_order():
+    trader, tracker = FakeTrader(), FakeTracker()
+    aggregator = OrderAggregator(tracker, window=0.05)
+    results, done = [], threading.Event()
+    def on_result(result):
+        results.append(result)
+        if len(results) == 2:
+            done.set()
+
+    assert submit(aggregator, trader, "Ryan", 2, 1.00, 0.50, on_result=on_result) is None
+    assert submit(aggregator, trader, "Eva", 3, 1.10, 0.60, on_result=on_result) is None
+    assert done.wait(2)
+    assert trader.buys == [(5, 1.10)]
+    assert results[0] is results[1]
+    assert [a["label"] for a in results[0]["allocations"]] == ["Ryan", "Eva"]
+    assert results[0]["stop_price"] == 0.60
+    assert all(a["shared"] and a["stop_price"] == 0.60 for a in results[0]["allocations"])
+    assert len(tracker.entries) == 1
+
+def test_blocking_submit_without_window():
+    trader, tracker = FakeTrader(), FakeTracker()
+    aggregator = OrderAggregator(tracker, window=0)
+    result = submit(aggregator, trader, "Ryan", 2, 1.00, 0.50)
+    assert result["order_id"] == "buy-1"
+    assert not result["allocations"][0]["shared"]
+    result = submit(aggregator, trader, "Eva", 1, 1.00, 0.50)
+    assert result["order_id"] == "buy-2" # The first batch was already submitted
@@ -0,0 +1,189 @@
+# tests/test_order_tracker.py
+import itertools
+
+from order_tracker import MAX_STOP_ATTEMPTS, OrderTracker, allocate_fills
+
+
+class FakeTrader:
+    """Just enough of the trader for the tracker: order states are set by the test."""
+    def __init__(self):
+        self.orders = {}
+        self.stops = [] # (order ID, quantity, stop price) for every accepted stop
+        self.cancelled = []
+        self.sells = [] # (order ID, quantity) for every re-priced exit
+        self.reject_stops = False
+        self._ids = itertools.count(1)
+
+    def fill(self, order_id, filled, state="queued"):
+        self.orders[order_id] = {"id": order_id, "state": state, "processed_quantity": str(filled)}
+
+    def get_all_open_option_orders(self):
+        return [order for order in self.orders.values() if order["state"] not in ("filled", "cancelled")]
+
+    def get_option_order_info(self, order_id):
+        return self.orders.get(order_id)
+
+    def place_option_stop_loss_order(self, symbol, strike, expiration, opt_type, quantity, stop_price):
+        if self.reject_stops:
+            return {"detail": "Not enough shares to sell."}
+        stop_id = f"stop-{next(self._ids)}"
+        self.stops.append((stop_id, quantity, stop_price))
+        return {"id": stop_id}
+
+    def place_option_market_sell_order(self, symbol, strike, expiration, opt_type, quantity):
+        sell_id = f"sell-{next(self._ids)}"
+        self.sells.append((sell_id, quantity))
+        return {"id": sell_id, "price": "1.00"}
+
+    def cancel_option_order(self, order_id):
+        self.cancelled.append(order_id)
+        return {}
+
+
+def make_tracker(**kwargs):
+    fills = []
+    tracker = OrderTracker(on_fill=lambda allocation, share: fills.append((allocation["label"], share)), **kwargs)
+    return tracker, fills
+
+def track(tracker, trader, quantity=4, allocations=None):
+    tracker.track_entry(trader, "entry-1", "SPY", 500.0, "2026-12-18", "call", quantity, 1.0,
+                        label="Ryan", allocations=allocations)
+
+
+def test_allocate_fills_sums_to_filled():
+    assert allocate_fills(5, [2, 2, 1]) == [2, 2, 1]
+    assert allocate_fills(3, [2, 2, 1]) == [1, 1, 1]
+    assert allocate_fills(1, [3, 1]) == [1, 0]
+    assert allocate_fills(0, [3, 1]) == [0, 0]
+    assert allocate_fills(4, []) == []
+    for filled in range(8):
+        assert sum(allocate_fills(filled, [3, 2, 2])) == filled
+
+def test_partial_fill_places_then_resizes_stop():
+    trader = FakeTrader()
+    tracker, fills = make_tracker()
+    track(tracker, trader, allocations=[{"label": "Ryan", "quantity": 2}, {"label": "Eva", "quantity": 2}])
+
+    trader.fill("entry-1", 1)
+    notes = tracker.poll()
+    assert trader.stops == [("stop-1", 1, 1.0)]
+    assert "placed stop" in notes[0]
+    assert fills == [("Ryan", 1)]
+
+    trader.fill("entry-1", 4, state="filled")
+    notes = tracker.poll()
+    assert trader.cancelled == ["stop-1"]
+    assert trader.stops[-1] == ("stop-2", 4, 1.0)
+    assert "Resized stop" in notes[0]
+    assert fills == [("Ryan", 1), ("Ryan", 2), ("Eva", 2)]
+    assert tracker.pending_count() == 0
+
+def test_unfilled_entry_is_cancelled_after_timeout():
+    trader = FakeTrader()
+    tracker, _ = make_tracker(fill_timeout=0.0)
+    track(tracker, trader)
+    trader.fill("entry-1", 0)
+
+    notes = tracker.poll()
+    assert trader.cancelled == ["entry-1"]
+    assert "Canceling the rest" in notes[0]
+    tracker.poll() # The cancel is only sent once
+    assert trader.cancelled == ["entry-1"]
+
+    trader.fill("entry-1", 0, state="cancelled")
+    tracker.poll()
+    assert tracker.pending_count() == 0
+    assert trader.stops == []
+
+def test_rejected_stop_keeps_entry_pending_and_retries():
+    trader = FakeTrader()
+    tracker, _ = make_tracker()
+    track(tracker, trader)
+    trader.reject_stops = True
+    trader.fill("entry-1", 4, state="filled")
+
+    notes = tracker.poll()
+    assert notes[0].startswith("❌")
+    assert tracker.pending_count() == 1
+
+    trader.reject_stops = False
+    notes = tracker.poll()
+    assert trader.stops == [("stop-1", 4, 1.0)]
+    assert "placed stop" in notes[0]
+    assert tracker.pending_count() == 0
+
+def test_stop_gives_up_after_max_attempts():
+    trader = FakeTrader()
+    tracker, _ = make_tracker()
+    track(tracker, trader)
+    trader.reject_stops = True
+    trader.fill("entry-1", 4, state="filled")
+
+    for _ in range(MAX_STOP_ATTEMPTS):
+        notes = tracker.poll()
+    assert "UNPROTECTED" in notes[-1]
+    assert tracker.pending_count() == 0
+
+def test_exit_drops_the_channels_share_from_the_stop():
+    trader = FakeTrader()
+    tracker, _ = make_tracker()
+    track(tracker, trader, allocations=[{"label": "Ryan", "trade_id": "r1", "quantity": 2},
+                                        {"label": "Eva", "trade_id": "e1", "quantity": 2}])
+    trader.fill("entry-1", 2)
+    tracker.poll()
+    assert trader.stops == [("stop-1", 2, 1.0)]
+
+    assert tracker.reduce("r1") # Ryan's 1 contract is exited while the entry is still filling
+    assert not tracker.reduce("unknown")
+    trader.fill("entry-1", 4, state="filled")
+    notes = tracker.poll()
+    assert trader.stops[-1] == ("stop-2", 2, 1.0) # Eva's 2 only; Ryan's later fills are not covered
+    assert "Resized stop" in notes[0]
+    assert tracker.pending_count() == 0
+
+def test_trim_resizes_stop_and_full_exit_cancels_it():
+    trader = FakeTrader()
+    tracker, _ = make_tracker()
+    track(tracker, trader, allocations=[{"label": "Ryan", "trade_id": "r1", "quantity": 4}])
+    trader.fill("entry-1", 4)
+    tracker.poll()
+
+    tracker.reduce("r1", 1)
+    tracker.poll()
+    assert trader.stops[-1] == ("stop-2", 3, 1.0)
+
+    tracker.reduce("r1")
+    notes = tracker.poll()
+    assert trader.cancelled[-1] == "stop-2"
+    assert len(trader.stops) == 2
+    assert "Nothing left to protect" in notes[0]
+
+    trader.fill("entry-1", 4, state="cancelled")
+    tracker.poll()
+    assert tracker.pending_count() == 0
+
+def test_unfilled_exit_is_repriced_for_the_unsold_rest():
+    trader = FakeTrader()
+    tracker, _ = make_tracker(exit_reprice_after=0.0, exit_max_reprices=1)
+    tracker.track_exit(trader, "exit-1", "SPY", 500.0, "2026-12-18", "call", 4, label="Ryan")
+    trader.fill("exit-1", 1)
+
+    tracker.poll()
+    assert trader.cancelled == ["exit-1"]
+    trader.fill("exit-1", 1, state="cancelled")
+    notes = tracker.poll()
+    assert trader.sells == [("sell-1", 3)]
+    assert "Re-priced exit of 3x" in notes[0]
+
+    trader.fill("sell-1", 0)
+    notes = tracker.poll() # Out of re-prices: the last order is left working
+    assert "still unfilled" in notes[0]
+    assert tracker.pending_count() == 0
+
+def test_filled_exit_stops_being_tracked():
+    trader = FakeTrader()
+    tracker, _ = make_tracker()
+    tracker.track_exit(trader, "exit-1", "SPY", 500.0, "2026-12-18", "call", 2)
+    trader.fill("exit-1", 2, state="filled")
+    assert tracker.poll() == []
+    assert tracker.pending_count() == 0
@@ -0,0 +1,39 @@
+# tests/test_position_manager.py
+from position_manager import PositionManager, sellable_quantity
+
+TRADE = {"ticker": "SPY", "strike": 500.0, "type": "call", "expiration": "2026-12-18", "price": 1.0}
+
+
+def test_trim_then_exit_of_shared_entry_sells_only_own_share(tmp_path):
+    manager = PositionManager(str(tmp_path / "positions.json"))
+    ryan = manager.add_position(1, TRADE)["trade_id"]
+    eva = manager.add_position(2, TRADE)["trade_id"]
+    for channel_id, trade_id in ((1, ryan), (2, eva)):
+        manager.update_position(channel_id, trade_id, {"filled_quantity": 4, "shared_stop_price": 0.5})
+    held = 8
+
+    # Ryan trims 1
+    trim_qty = max(1, sellable_quantity(manager.find_position(1, TRADE), held) // 4)
+    assert trim_qty == 1
+    manager.record_sale(1, ryan, trim_qty)
+    held -= trim_qty
+
+    # Ryan exits: the 3 left, never Eva's contracts
+    exit_qty = sellable_quantity(manager.find_position(1, TRADE), held)
+    assert exit_qty == 3
+    manager.clear_position(1, ryan)
+    held -= exit_qty
+    assert sellable_quantity(manager.find_position(2, TRADE), held) == 4
+
+def test_unshared_position_sells_the_broker_quantity(tmp_path):
+    manager = PositionManager(str(tmp_path / "positions.json"))
+    manager.add_position(1, TRADE)
+    assert sellable_quantity(manager.find_position(1, TRADE), 5) == 5
+    assert not manager.record_sale(1, "missing", 1)
+
+def test_ticker_only_lookup_finds_the_newest_position_in_that_ticker(tmp_path):
+    manager = PositionManager(str(tmp_path / "positions.json"))
+    spy = manager.add_position(1, TRADE)["trade_id"]
+    manager.add_position(1, {**TRADE, "ticker": "QQQ"})
+    assert manager.find_position(1, {"ticker": "SPY"})["trade_id"] == spy
+    assert manager.find_position(1, {"ticker": "IWM"})["symbol"] == "QQQ" # No match: newest position, as before
@@ -0,0 +1,32 @@
+# tests/test_reconciler.py
+from reconciler import BrokerReconciler
+
+
+class FakeTrader:
+    def __init__(self):
+        self.fetches = 0
+
+    def get_open_option_positions(self):
+        self.fetches += 1
+        return [{"chain_symbol": "SPY", "strike_price": "500.0000", "expiration_date": "2026-10-23", "type": "call", "quantity": "2.0000"}]
+
+    def get_all_open_option_orders(self):
+        return []
+
+class FakePositionManager:
+    def get_positions(self):
+        return {}
+
+
+def test_sim_mode_skips_the_broker_fetch():
+    active = [True]
+    trader = FakeTrader()
+    reconciler = BrokerReconciler(trader, FakePositionManager(), [], is_active=lambda: active[0])
+    reconciler.sync()
+    assert trader.fetches == 1 and reconciler.is_fresh()
+
+    active[0] = False
+    assert reconciler.sync() == []
+    assert trader.fetches == 1
+    assert not reconciler.is_fresh()
+    assert reconciler.find_position("SPY", 500, "2026-10-23", "call") is None
@@ -0,0 +1,26 @@
+# tests/test_signal_store.py
+import sqlite3
+
+from signal_store import SignalStore
+
+
+def test_stats_count_every_parse_outcome(tmp_path):
+    db_path = str(tmp_path / "signals.db")
+    # A database from before parse outcomes were recorded is migrated in place
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE messages (message_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, "
+                     "channel_name TEXT NOT NULL, posted_at REAL NOT NULL, raw_msg TEXT)")
+        conn.execute("INSERT INTO messages VALUES (1, 10, 'Ryan', 100.0, 'old')")
+
+    store = SignalStore(db_path)
+    for message_id, outcome in ((2, "signal"), (3, "no_signal"), (4, "error"), (5, "error")):
+        store.record_message(message_id, 10, "Ryan", "msg", 200.0)
+        store.record_parse_outcome(message_id, outcome)
+    store.record_execution(2, "Ryan", {"action": "buy", "ticker": "SPY"}, "❌ BUY not accepted by broker: None", mode="LIVE")
+    store.close()
+
+    stats = SignalStore(db_path).get_stats("Ryan", 0.0)
+    assert stats["messages"] == 5
+    assert stats["outcomes"] == {"pending": 1, "signal": 1, "no_signal": 1, "error": 2}
+    assert stats["errors"] == 2
+    assert stats["counts"] == {"buy": 1}
@@ -0,0 +1,52 @@
+# tests/test_traders.py
+import asyncio
+
+import robin_stocks.robinhood.helper as rh_helper
+import robin_stocks.robinhood.orders as rh_orders
+
+from async_trader import AsyncRobinhoodTrader
+from trader import RobinhoodTrader, marketable_exit_price
+
+QUOTE = [[{"bid_price": "1.23", "ask_price": "1.30"}]]
+# Fields that identify the account, instrument or request rather than the order itself
+IGNORED = {"account", "legs", "ref_id"}
+
+
+def test_marketable_exit_price_steps_under_the_bid():
+    assert marketable_exit_price(QUOTE) == 1.10 # 1.20 on the $0.05 grid, two ticks down
+    assert marketable_exit_price([[{"bid_price": "4.37"}]]) == 4.10
+    assert marketable_exit_price([[{"bid_price": "0.05"}]]) == 0.01
+    assert marketable_exit_price([[None]]) == 0.01
+
+def test_sync_and_async_traders_send_the_same_exit_order(monkeypatch):
+    sent = {}
+    monkeypatch.setattr(rh_helper, "LOGGED_IN", True)
+    monkeypatch.setattr(rh_orders, "id_for_option", lambda *args: "option-1")
+    monkeypatch.setattr(rh_orders, "load_account_profile", lambda **kwargs: "account-url")
+    monkeypatch.setattr(rh_orders, "request_post", lambda url, payload, **kwargs: sent.setdefault("sync", payload))
+    sync_trader = RobinhoodTrader.__new__(RobinhoodTrader) # Skips the login
+    monkeypatch.setattr(sync_trader, "get_option_market_data", lambda *args: QUOTE)
+    sync_trader.place_option_market_sell_order("SPY", 500.0, "2026-12-18", "call", 3)
+
+    async_trader = AsyncRobinhoodTrader()
+    async def get_option_market_data(*args):
+        return QUOTE
+    async def get_option_id(*args):
+        return "option-1"
+    async def get_account_url():
+        return "account-url"
+    async def post(url, payload=None):
+        sent["async"] = payload
+        return {}
+    monkeypatch.setattr(async_trader, "get_option_market_data", get_option_market_data)
+    monkeypatch.setattr(async_trader, "_get_option_id", get_option_id)
+    monkeypatch.setattr(async_trader, "_get_account_url", get_account_url)
+    monkeypatch.setattr(async_trader, "_post", post)
+    asyncio.run(async_trader.place_option_market_sell_order("SPY", 500.0, "2026-12-18", "call", 3))
+
+    sync_order = {k: v for k, v in sent["sync"].items() if k not in IGNORED}
+    async_order = {k: v for k, v in sent["async"].items() if k not in IGNORED}
+    assert sync_order == async_order
+    assert sync_order["type"] == "limit" and sync_order["time_in_force"] == "gfd" and sync_order["price"] == 1.10
+    assert [{k: v for k, v in leg.items() if k != "option"} for leg in sent["sync"]["legs"]] == \
+           [{k: v for k, v in leg.items() if k != "option"} for leg in sent["async"]["legs"]]
@@ -1,11 +1,100 @@
 # trader.py
 import os
+import functools
+import math
+import threading
+import uuid
 import robin_stocks.robinhood as r
+from robin_stocks.robinhood import helper as rh_helper
 from dotenv import load_dotenv
+from metrics import BROKER_LATENCY
+from circuit_breaker import robinhood_breaker
 
 load_dotenv()
 ROBINHOOD_USER = os.getenv("ROBINHOOD_USER")
 ROBINHOOD_PASS = os.getenv("ROBINHOOD_PASS")
+# Optional: send every Robinhood request to another host, e.g. the local fake server in benchmarks/fake_robinhood.py
+ROBINHOOD_API_BASE = (os.getenv("ROBINHOOD_API_BASE") or "https://api.robinhood.com").rstrip('/')
+_ROBINHOOD_DEFAULT_BASE = "https://api.robinhood.com"
+# Keep sessions for another host out of the real session pickle
+_LOGIN_KWARGS = {"expiresIn": 31536000, "store_session": True,
+                 "pickle_name": "" if ROBINHOOD_API_BASE == _ROBINHOOD_DEFAULT_BASE else "_local"}
+
+def option_contract_key(symbol, strike, expiration, opt_type) -> str:
+    """A consistent key identifying one option contract across the broker, simulator and memory."""
+    return f"{str(symbol).upper()}_{str(float(strike))}_{str(expiration)}_{str(opt_type).lower()}"
+
+# Per-call HTTP timeouts (seconds). Reads fail fast; order submissions get a little longer.
+ROBINHOOD_TIMEOUTS = {
+    "default": 10.0,
+    "get_option_market_data": 5.0,
+    "place_option_buy_order": 15.0,
+    "place_option_stop_loss_order": 15.0,
+    "place_option_market_sell_order": 15.0,
+}
+# HTTP statuses that count as upstream failures for the circuit breaker
+_BREAKER_FAILURE_STATUSES = {429, 500, 502, 503, 504}
+# Trims and exits are sent as a day limit this many ticks under the bid (marketable, but never an
+# open-ended market order); the order tracker re-prices any that stay unfilled.
+EXIT_PRICE_TICKS = 2
+
+def marketable_exit_price(market_data) -> float:
+    """The sell limit for an exit: EXIT_PRICE_TICKS under the bid, on the $0.05 (under $3) / $0.10 tick grid."""
+    quote = market_data[0][0] if market_data and market_data[0] else None
+    bid = float((quote or {}).get("bid_price") or 0)
+    tick = 0.05 if bid < 3 else 0.10
+    price = math.floor(round(bid / tick, 6)) * tick - EXIT_PRICE_TICKS * tick
+    return round(max(price, 0.01), 2)
+
+_call_context = threading.local() # Timeout for the broker call running on this thread
+
+def _broker_call(func):
+    """Records the latency of a Robinhood API call under the method's name and applies its timeout."""
+    timeout = ROBINHOOD_TIMEOUTS.get(func.__name__, ROBINHOOD_TIMEOUTS["default"])
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(_call_context, "timeout", None)
+        _call_context.timeout = timeout
+        try:
+            with BROKER_LATENCY.time(call=func.__name__):
+                return func(*args, **kwargs)
+        finally:
+            _call_context.timeout = previous
+    return wrapper
+
+def _install_session_guard(session):
+    """
+    Wraps the robin_stocks session so every HTTP request carries a timeout and
+    goes through the Robinhood circuit breaker. robin_stocks never passes a
+    timeout on GETs, so without this a hung request blocks its thread forever.
+    robin_stocks hardcodes its URLs, so they are also redirected to ROBINHOOD_API_BASE here.
+    """
+    if getattr(session, "_rhtb_guarded", False):
+        return
+    send = session.request
+    def guarded_request(method, url, **kwargs):
+        if ROBINHOOD_API_BASE != _ROBINHOOD_DEFAULT_BASE and url.startswith(_ROBINHOOD_DEFAULT_BASE):
+            url = ROBINHOOD_API_BASE + url[len(_ROBINHOOD_DEFAULT_BASE):]
+        timeout = getattr(_call_context, "timeout", None)
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        else:
+            kwargs.setdefault("timeout", ROBINHOOD_TIMEOUTS["default"])
+        robinhood_breaker.check()
+        try:
+            response = send(method, url, **kwargs)
+        except Exception:
+            robinhood_breaker.record_failure()
+            raise
+        if response.status_code in _BREAKER_FAILURE_STATUSES:
+            robinhood_breaker.record_failure()
+        else:
+            robinhood_breaker.record_success()
+        return response
+    session.request = guarded_request
+    session._rhtb_guarded = True
+
+_install_session_guard(rh_helper.SESSION)
 
 class RobinhoodTrader:
     def __init__(self):
@@ -13,19 +102,25 @@ class RobinhoodTrader:
 
     def login(self):
         try:
-            r.login(ROBINHOOD_USER, ROBINHOOD_PASS, expiresIn=31536000, store_session=True)
-            print("✅ Robinhood login successful.")
+            # robin_stocks reports a failed login by returning None rather than raising
+            if r.login(ROBINHOOD_USER, ROBINHOOD_PASS, **_LOGIN_KWARGS):
+                print("✅ Robinhood login successful.")
+            else:
+                print("❌ Robinhood login failed: no session returned.")
         except Exception as e:
             print(f"❌ Robinhood login failed: {e}")
 
     def reconnect(self):
         print("⚙️ Attempting to reconnect to Robinhood...")
         try:
-            r.login(ROBINHOOD_USER, ROBINHOOD_PASS, expiresIn=31536000, store_session=True)
-            print("✅ Reconnected to Robinhood successfully.")
+            if r.login(ROBINHOOD_USER, ROBINHOOD_PASS, **_LOGIN_KWARGS):
+                print("✅ Reconnected to Robinhood successfully.")
+            else:
+                print("❌ Failed to reconnect to Robinhood: no session returned.")
         except Exception as e:
             print(f"❌ Failed to reconnect to Robinhood: {e}")
 
+    @_broker_call
     def get_portfolio_value(self) -> float:
         try:
             profile = r.load_portfolio_profile()
@@ -34,18 +129,26 @@ class RobinhoodTrader:
             print(f"❌ Error fetching portfolio value: {e}")
             return 0.0
 
+    @_broker_call
     def get_open_option_positions(self):
         return r.get_open_option_positions()
 
+    @_broker_call
     def get_all_open_option_orders(self):
         return r.get_all_open_option_orders()
 
+    @_broker_call
     def cancel_option_order(self, order_id):
         return r.cancel_option_order(order_id)
+
+    @_broker_call
+    def get_option_order_info(self, order_id):
+        return r.get_option_order_info(order_id)
         
-    def find_open_option_position(self, symbol, strike, expiration, opt_type):
+    def find_open_option_position(self, symbol, strike, expiration, opt_type, positions=None):
+        """Searches `positions` when a recent snapshot is supplied, otherwise fetches from the broker."""
         try:
-            open_positions = self.get_open_option_positions()
+            open_positions = positions if positions is not None else self.get_open_option_positions()
             for pos in open_positions:
                 if (pos['chain_symbol'].upper() == str(symbol).upper() and
                         float(pos['strike_price']) == float(strike) and
@@ -65,6 +168,7 @@ class RobinhoodTrader:
             print(f"❌ Error fetching open orders for instrument {instrument_url}: {e}")
             return []
             
+    @_broker_call
     def place_option_buy_order(self, symbol, strike, expiration, opt_type, quantity, limit_price):
         return r.order_buy_option_limit(
             positionEffect='open', creditOrDebit='debit', price=round(limit_price, 2),
@@ -72,20 +176,26 @@ class RobinhoodTrader:
             strike=strike, optionType=opt_type, timeInForce='gtc'
         )
 
+    @_broker_call
     def place_option_stop_loss_order(self, symbol, strike, expiration, opt_type, quantity, stop_price):
-        return r.order_sell_option_stop_loss(
-            positionEffect='close', price=round(stop_price, 2), symbol=symbol,
-            quantity=quantity, expirationDate=expiration, strike=strike,
-            optionType=opt_type, timeInForce='gtc'
+        # robin_stocks has no plain option stop-loss order; a stop-limit at the stop price is the closest equivalent.
+        return r.order_sell_option_stop_limit(
+            positionEffect='close', creditOrDebit='credit', limitPrice=round(stop_price, 2),
+            stopPrice=round(stop_price, 2), symbol=symbol, quantity=quantity,
+            expirationDate=expiration, strike=strike, optionType=opt_type, timeInForce='gtc'
         )
 
+    @_broker_call
     def place_option_market_sell_order(self, symbol, strike, expiration, opt_type, quantity):
-        return r.order_sell_option_market(
-            positionEffect='close', symbol=symbol, quantity=quantity,
-            expirationDate=expiration, strike=strike, optionType=opt_type,
-            timeInForce='gtc'
+        # robin_stocks has no option market order; a day limit just under the bid is the marketable equivalent.
+        market_data = self.get_option_market_data(symbol, expiration, strike, opt_type)
+        return r.order_sell_option_limit(
+            positionEffect='close', creditOrDebit='credit', price=marketable_exit_price(market_data),
+            symbol=symbol, quantity=quantity, expirationDate=expiration,
+            strike=strike, optionType=opt_type, timeInForce='gfd'
         )
 
+    @_broker_call
     def get_option_market_data(self, symbol, expiration, strike, opt_type):
         return r.get_option_market_data(symbol, expiration, strike, opt_type)
 
@@ -94,6 +204,7 @@ class SimulatedTrader(RobinhoodTrader):
     def __init__(self):
         print("✅ Initialized SimulatedTrader.")
         self.simulated_positions = {} # Use a dictionary for unique positions
+        self.simulated_orders = {} # Order ID -> order; simulated orders fill immediately
 
     def login(self):
         pass
@@ -104,10 +215,10 @@ class SimulatedTrader(RobinhoodTrader):
     def get_portfolio_value(self) -> float:
         return 100000.0
 
-    def find_open_option_position(self, symbol, strike, expiration, opt_type):
+    def find_open_option_position(self, symbol, strike, expiration, opt_type, positions=None):
         print(f"[SIMULATED] Searching for position: {symbol} {strike}{opt_type}")
         # Use a consistent key to find the position
-        pos_key = f"{str(symbol).upper()}_{str(float(strike))}_{str(expiration)}_{str(opt_type).lower()}"
+        pos_key = option_contract_key(symbol, strike, expiration, opt_type)
         position = self.simulated_positions.get(pos_key)
         if position:
             print(f"[SIMULATED] Found position: {position}")
@@ -119,10 +230,26 @@ class SimulatedTrader(RobinhoodTrader):
         print(f"[SIMULATED] Getting open orders for {instrument_url}")
         return []
 
+    def get_all_open_option_orders(self):
+        return []
+
+    def get_option_order_info(self, order_id):
+        return self.simulated_orders.get(order_id, {})
+
+    def cancel_option_order(self, order_id):
+        print(f"[SIMULATED] Cancel order {order_id}")
+        return {}
+
+    def _record_order(self, quantity, detail) -> dict:
+        order = {"id": str(uuid.uuid4()), "state": "filled", "quantity": str(float(quantity)),
+                 "processed_quantity": str(float(quantity)), "detail": detail}
+        self.simulated_orders[order["id"]] = order
+        return order
+
     def place_option_buy_order(self, symbol, strike, expiration, opt_type, quantity, limit_price):
         summary = f"[SIMULATED] BUY {quantity}x {symbol} {expiration} {strike}{opt_type} @ {limit_price:.2f}"
         
-        pos_key = f"{str(symbol).upper()}_{str(float(strike))}_{str(expiration)}_{str(opt_type).lower()}"
+        pos_key = option_contract_key(symbol, strike, expiration, opt_type)
         
         if pos_key in self.simulated_positions:
             # Average down logic
@@ -149,16 +276,16 @@ class SimulatedTrader(RobinhoodTrader):
             self.simulated_positions[pos_key] = new_pos
             print(f"[SIMULATED] Added to internal state: {new_pos}")
             
-        return {"detail": summary}
+        return self._record_order(quantity, summary)
 
     def place_option_stop_loss_order(self, symbol, strike, expiration, opt_type, quantity, stop_price):
         summary = f"[SIMULATED] STOP-LOSS for {quantity}x {symbol} @ {stop_price}"
         print(summary)
-        return {"detail": summary}
+        return {"id": str(uuid.uuid4()), "state": "confirmed", "detail": summary}
 
     def place_option_market_sell_order(self, symbol, strike, expiration, opt_type, quantity):
         summary = f"[SIMULATED] SELL {quantity}x {symbol} at market"
-        pos_key = f"{str(symbol).upper()}_{str(float(strike))}_{str(expiration)}_{str(opt_type).lower()}"
+        pos_key = option_contract_key(symbol, strike, expiration, opt_type)
         
         if pos_key in self.simulated_positions:
             current_qty = float(self.simulated_positions[pos_key]['quantity'])